@@ -0,0 +1,5 @@
+from django.contrib import admin
+from .models import UploadedFile, FeedSource
+
+admin.site.register(UploadedFile)
+admin.site.register(FeedSource)
@@ -0,0 +1,497 @@
+"""
+Streaming ingestion of uploaded XML listing feeds.
+
+A feed is a sequence of ``<listing>`` elements anywhere in the document::
+
+    <listings source="acme-realty" missing="unpublish">
+      <listing id="A-1001">
+        <title>Sea View Apartment</title>
+        <property_type>apartment</property_type>
+        <listing_type>rent</listing_type>
+        <price>1500.00</price>
+        ...
+        <owner_email>agent@example.com</owner_email>
+        <amenities><amenity>WiFi</amenity><amenity>Pool</amenity></amenities>
+        <images><image primary="true">properties/a1001-front.jpg</image></images>
+      </listing>
+    </listings>
+
+The document is read with ``iterparse`` and each listing is detached once it
+has been mapped, so memory stays flat however large the feed is. Valid
+listings are written with ``bulk_create`` in batches, each in its own
+transaction. Invalid ones are skipped and reported, one line each, in
+``UploadedFile.processing_errors``.
+
+When the root element names a ``source`` the feed is that partner's full
+inventory and is synced rather than appended. Listings are keyed by their
+``id`` within the source, and a hash of each record's content is stored on
+the row. Records whose hash is unchanged are skipped without being parsed.
+Changed records are written with ``bulk_update`` on the fields that
+differ. Rows of the source missing from the feed are unpublished, or
+deleted with ``missing="delete"``. Missing rows are only handled once the
+whole feed has been read. The counts end up in ``UploadedFile.feed_summary``.
+
+Feeds uploaded by a partner account rather than staff list that partner's
+own inventory: every listing is owned by the uploader, and an
+``owner_email`` naming anyone else fails the record. Partners may only use
+amenities that already exist; staff feeds and commands create missing ones.
+
+Images are named by storage path, and only media already uploaded through
+the image or chunked upload endpoints is accepted: the path must be a
+stored blob under ``properties/``. A partner may only name images already
+on its own listings. Anything else fails the record, so a feed cannot
+attach (and a later sync cannot delete) someone else's file.
+
+The ``source`` attribute is not trusted on its own. An uploaded feed may only
+sync a source registered as a ``FeedSource``, a partner only its own, and
+``missing="delete"`` is refused unless the uploader is the source's partner.
+A refused feed fails before anything is written.
+"""
+import copy
+import hashlib
+import json
+import logging
+from collections import Counter, defaultdict
+
+from defusedxml.ElementTree import iterparse
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from properties import blobs, covers, derivatives, geo, tasks
+from properties.bulk import PropertyChanges
+from properties.models import Amenity, MediaBlob, Property, PropertyImage
+
+from .models import FeedSource, UploadedFile
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+LISTING_TAG = 'listing'
+MISSING_UNPUBLISH, MISSING_DELETE = 'unpublish', 'delete'
+IMAGE_DIRECTORY = 'properties/'
+
+# Child elements copied onto Property fields
+LISTING_FIELDS = (
+    'title', 'description', 'property_type', 'listing_type', 'price', 'bedrooms',
+    'bathrooms', 'area', 'address', 'city', 'country', 'latitude', 'longitude',
+    'is_featured', 'is_published',
+)
+# Columns a changed record may rewrite; the slug stays put so URLs keep working
+SYNCED_FIELDS = (*LISTING_FIELDS, 'owner_id', 'geo_cell', 'amenity_mask', 'feed_hash')
+
+
+class RecordError(Exception):
+    """A listing that cannot be imported; the message is reported per record."""
+
+
+def _local(tag):
+    """Element name without its namespace."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _text(element):
+    return (element.text or '').strip()
+
+
+def iter_listings(source, on_root=None):
+    """
+    Yield every ``<listing>`` element of the XML document in ``source``,
+    detaching it from the tree afterwards so memory use stays constant.
+    ``on_root`` is called with the root element as soon as it is opened.
+    """
+    parents = []
+    for event, element in iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if not parents and on_root is not None:
+                on_root(element)
+            parents.append(element)
+            continue
+        parents.pop()
+        if _local(element.tag) == LISTING_TAG:
+            yield element
+            element.clear()
+            if parents:
+                parents[-1].remove(element)
+
+
+def read_listing(element):
+    """The raw values of one listing: ``(fields, amenity names, images)``."""
+    values, amenity_names, images = {}, [], []
+    for child in element:
+        name = _local(child.tag)
+        if name in LISTING_FIELDS or name == 'owner_email':
+            values[name] = _text(child)
+        elif name == 'amenities':
+            amenity_names = [_text(item) for item in child if _text(item)]
+        elif name == 'images':
+            images = [
+                (_text(item), item.get('primary', '').lower() in ('1', 'true', 'yes'))
+                for item in child if _text(item)
+            ]
+    return values, amenity_names, images
+
+
+def content_hash(record):
+    """Digest of a listing's raw values; amenity order does not count."""
+    values, amenity_names, images = record
+    canonical = [sorted(values.items()), sorted(name.lower() for name in amenity_names), images]
+    return hashlib.sha256(json.dumps(canonical, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class FeedImporter:
+    """Maps listing elements to Property/PropertyImage rows and writes them in batches."""
+
+    def __init__(self, batch_size=None, uploader=None):
+        self.batch_size = batch_size or BATCH_SIZE
+        # None for trusted callers (commands); otherwise the uploading account
+        self.uploader = uploader
+        self.errors = []
+        self.imported = 0
+        self.batch = []
+        self.updates = []
+        self.owners = {}
+        self.amenities = {}
+        self.image_problems = {}
+        self.changes = PropertyChanges()
+        self.default_owner_email = getattr(settings, 'LISTING_FEED_OWNER_EMAIL', '')
+        # Sync mode, see the module docstring
+        self.source = ''
+        self.missing = MISSING_UNPUBLISH
+        self.existing = {}
+        self.seen = set()
+        self.summary = Counter()
+
+    def start(self, root):
+        """Switch to sync mode when the root element names a source."""
+        self.source = root.get('source', '').strip()
+        if not self.source:
+            return
+        self.missing = root.get('missing', MISSING_UNPUBLISH).strip().lower()
+        if self.missing not in (MISSING_UNPUBLISH, MISSING_DELETE):
+            raise ValueError(f"missing must be '{MISSING_UNPUBLISH}' or '{MISSING_DELETE}'")
+        self.authorize()
+        rows = Property.objects.filter(feed_source=self.source, external_id__isnull=False)
+        self.existing = {
+            external_id: (pk, digest)
+            for external_id, pk, digest in rows.values_list('external_id', 'pk', 'feed_hash')
+        }
+
+    def authorize(self):
+        """Refuse a sync the uploader may not run; trusted callers pass no uploader."""
+        if self.uploader is None:
+            return
+        registered = FeedSource.objects.filter(slug=self.source).first()
+        if registered is None:
+            raise PermissionError(f'source {self.source} is not registered')
+        owns = registered.partner_id == self.uploader.pk
+        if not owns and not self.uploader.is_staff:
+            raise PermissionError(f'source {self.source} belongs to another partner')
+        if self.missing == MISSING_DELETE and not owns:
+            raise PermissionError(f'missing="delete" is only accepted from the partner of {self.source}')
+
+    def run(self, source):
+        for position, element in enumerate(iter_listings(source, on_root=self.start), start=1):
+            reference = element.get('id') or ''
+            try:
+                self.add(reference, read_listing(element))
+            except RecordError as error:
+                label = f'listing {position}' + (f' ({reference})' if reference else '')
+                self.errors.append(f'{label}: {error}')
+                self.summary['failed'] += 1
+            if len(self.batch) + len(self.updates) >= self.batch_size:
+                self.flush()
+        self.flush()
+        if self.source:
+            self.remove_missing()
+
+    def add(self, reference, record):
+        if not self.source:
+            self.batch.append(self.parse(record))
+            return
+        if not reference:
+            raise RecordError('id: listings of a synced feed need an id')
+        if reference in self.seen:
+            raise RecordError(f'id: {reference} appears more than once')
+        # Marked before parsing, so a listing that fails validation keeps its row
+        self.seen.add(reference)
+
+        digest = content_hash(record)
+        pk, stored_digest = self.existing.get(reference, (None, None))
+        if digest == stored_digest:
+            self.summary['unchanged'] += 1
+            return
+        property, amenities, images = self.parse(record)
+        property.feed_source, property.external_id, property.feed_hash = self.source, reference, digest
+        if pk is None:
+            self.batch.append((property, amenities, images))
+        else:
+            self.updates.append((pk, property, amenities, images))
+
+    def parse(self, record):
+        """Build an unsaved Property plus its amenities and image data from raw values."""
+        values, amenity_names, images = record
+        values = dict(values)
+        property = Property(owner=self.owner(values.pop('owner_email', '')))
+        for name, raw in values.items():
+            field = Property._meta.get_field(name)
+            if raw == '' and field.null:
+                continue
+            try:
+                setattr(property, name, field.to_python(raw))
+            except ValidationError as error:
+                raise RecordError(f'{name}: {" ".join(error.messages)}')
+        try:
+            property.clean_fields(exclude=['slug', 'owner'])
+        except ValidationError as error:
+            raise RecordError('; '.join(
+                f'{field}: {" ".join(messages)}' for field, messages in error.message_dict.items()
+            ))
+        try:
+            property.clean()
+        except ValidationError as error:
+            raise RecordError(' '.join(error.messages))
+        for path, _ in images:
+            self.check_image(path)
+        property.geo_cell = geo.cell_for(property.latitude, property.longitude)
+        amenities = [self.amenity(name) for name in amenity_names]
+        property.amenity_mask = 0
+        for amenity in amenities:
+            if amenity.bit is not None:
+                property.amenity_mask |= 1 << amenity.bit
+        return property, amenities, images
+
+    @property
+    def trusted(self):
+        """Commands and staff; partner uploads are held to their own listings."""
+        return self.uploader is None or self.uploader.is_staff
+
+    def owner(self, email):
+        if not self.trusted:
+            if email and email.strip().lower() != self.uploader.email.lower():
+                raise RecordError(f'owner_email: partner feeds can only list their own properties ({email})')
+            return self.uploader
+        email = (email or self.default_owner_email).strip().lower()
+        if not email:
+            raise RecordError('owner_email: no owner given and LISTING_FEED_OWNER_EMAIL is not set')
+        if email not in self.owners:
+            self.owners[email] = User.objects.filter(email__iexact=email).first()
+        if self.owners[email] is None:
+            raise RecordError(f'owner_email: no user with email {email}')
+        return self.owners[email]
+
+    def amenity(self, name):
+        key = name.lower()
+        if key not in self.amenities:
+            amenity = Amenity.objects.filter(name__iexact=name).first()
+            if amenity is None and self.trusted:
+                amenity = Amenity.objects.create(name=name)
+            self.amenities[key] = amenity
+        if self.amenities[key] is None:
+            raise RecordError(f'amenities: no amenity named {name}')
+        return self.amenities[key]
+
+    def check_image(self, path):
+        if path not in self.image_problems:
+            self.image_problems[path] = self.image_problem(path)
+        if self.image_problems[path]:
+            raise RecordError(f'image: {self.image_problems[path]} ({path})')
+
+    def image_problem(self, path):
+        """Why ``path`` may not be used as a listing image, or None."""
+        if '://' in path:
+            return 'remote images are not fetched'
+        if not path.startswith(IMAGE_DIRECTORY) or not MediaBlob.objects.filter(name=path).exists():
+            return 'not an uploaded property image'
+        if not self.trusted and not PropertyImage.objects.filter(image=path, property__owner=self.uploader).exists():
+            return 'not an image of your own listings'
+        return None
+
+    def flush(self):
+        if not self.batch and not self.updates:
+            return
+        records, self.batch = self.batch, []
+        updates, self.updates = self.updates, []
+        with transaction.atomic():
+            if records:
+                self.insert(records)
+            if updates:
+                self.update(updates)
+            self.changes.apply()
+
+    def insert(self, records):
+        properties = [property for property, _, _ in records]
+        for property, slug in zip(properties, unique_slugs([p.title for p in properties])):
+            property.slug = slug
+        Property.objects.bulk_create(properties)
+
+        links, images = [], []
+        for property, amenities, image_rows in records:
+            amenity_ids = sorted({amenity.pk for amenity in amenities})
+            links.extend(_links(property.pk, amenity_ids))
+            images.extend(_images(property, image_rows))
+            self.changes.created(property, amenity_ids)
+        Property.amenities.through.objects.bulk_create(links)
+        self.add_images(images)
+        self.imported += len(records)
+        self.summary['created'] += len(records)
+
+    def update(self, updates):
+        """Write changed records over their rows, touching only what differs."""
+        pks = [pk for pk, _, _, _ in updates]
+        rows = Property.objects.in_bulk(pks)
+        linked = _amenity_ids(pks)
+        stored_images = defaultdict(list)
+        for property_id, path, primary in PropertyImage.objects.filter(
+            property_id__in=pks
+        ).order_by('id').values_list('property_id', 'image', 'is_primary'):
+            stored_images[property_id].append((path, primary))
+
+        now = timezone.now()
+        fields, changed = {'updated_at'}, []
+        relinked, links, reimaged, images = [], [], [], []
+        for pk, new, amenities, image_rows in updates:
+            row = rows.get(pk)
+            if row is None:
+                # Deleted since the feed started; the next sync recreates it
+                continue
+            previous = copy.copy(row)
+            for name in SYNCED_FIELDS:
+                value = getattr(new, name)
+                if getattr(row, name) != value:
+                    setattr(row, name, value)
+                    fields.add(name)
+            row.updated_at = now
+            amenity_ids = sorted({amenity.pk for amenity in amenities})
+            if amenity_ids != linked[pk]:
+                relinked.append(pk)
+                links.extend(_links(pk, amenity_ids))
+            if image_rows != stored_images[pk]:
+                reimaged.append(pk)
+                images.extend(_images(row, image_rows))
+            changed.append(row)
+            self.changes.changed(previous, row, linked[pk], amenity_ids)
+
+        Property.objects.bulk_update(changed, sorted(fields))
+        through = Property.amenities.through
+        through.objects.filter(property_id__in=relinked).delete()
+        through.objects.bulk_create(links)
+        PropertyImage.objects.filter(property_id__in=reimaged).delete()
+        self.add_images(images)
+        self.imported += len(changed)
+        self.summary['updated'] += len(changed)
+
+    def add_images(self, images):
+        PropertyImage.objects.bulk_create(images)
+        # Feeds name files already in storage; count the ones that are shared blobs
+        blobs.retain([image.image.name for image in images])
+        covers.refresh_properties({image.property_id for image in images})
+        if images:
+            # bulk_create skips the post_save that queues derivatives
+            tasks.enqueue(
+                derivatives.generate_many, PropertyImage._meta.label, [image.pk for image in images]
+            )
+
+    def remove_missing(self):
+        """Unpublish or delete the rows of the source the feed no longer lists."""
+        missing = [pk for reference, (pk, _) in self.existing.items() if reference not in self.seen]
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            with transaction.atomic():
+                if self.missing == MISSING_DELETE:
+                    # The per-row delete signals do the bookkeeping
+                    _, deleted = Property.objects.filter(pk__in=chunk).delete()
+                    self.summary['deleted'] += deleted.get(Property._meta.label, 0)
+                    continue
+                rows = list(Property.objects.filter(pk__in=chunk, is_published=True))
+                linked = _amenity_ids([row.pk for row in rows])
+                now = timezone.now()
+                for row in rows:
+                    previous = copy.copy(row)
+                    # A cleared hash makes the listing count as changed if it comes back
+                    row.is_published, row.feed_hash, row.updated_at = False, '', now
+                    self.changes.changed(previous, row, linked[row.pk], linked[row.pk])
+                Property.objects.bulk_update(rows, ['is_published', 'feed_hash', 'updated_at'])
+                self.changes.apply()
+                self.summary['unpublished'] += len(rows)
+
+    def summarize(self):
+        """Counts of the run for ``UploadedFile.feed_summary``."""
+        summary = {
+            key: self.summary[key]
+            for key in ('created', 'updated', 'unchanged', 'unpublished', 'deleted', 'failed')
+        }
+        summary['source'] = self.source or None
+        return summary
+
+
+def _links(property_id, amenity_ids):
+    through = Property.amenities.through
+    return [through(property_id=property_id, amenity_id=pk) for pk in amenity_ids]
+
+
+def _images(property, image_rows):
+    return [PropertyImage(property=property, image=path, is_primary=primary) for path, primary in image_rows]
+
+
+def _amenity_ids(pks):
+    """Sorted amenity ids linked to each of ``pks``."""
+    linked = defaultdict(list)
+    for property_id, amenity_id in Property.amenities.through.objects.filter(
+        property_id__in=pks
+    ).order_by('amenity_id').values_list('property_id', 'amenity_id'):
+        linked[property_id].append(amenity_id)
+    return linked
+
+
+def unique_slugs(titles):
+    """Slugs for new properties that clash neither with each other nor with the table."""
+    bases = [slugify(title)[:240] or 'listing' for title in titles]
+    clashing = set(Property.objects.filter(slug__in=set(bases)).values_list('slug', flat=True))
+    clashing.update(base for index, base in enumerate(bases) if base in bases[:index])
+    taken = set()
+    if clashing:
+        query = Q()
+        for base in clashing:
+            query |= Q(slug=base) | Q(slug__startswith=f'{base}-')
+        taken = set(Property.objects.filter(query).values_list('slug', flat=True))
+
+    slugs, counters = [], {}
+    for base in bases:
+        slug = base
+        while slug in taken:
+            counters[base] = counters.get(base, 0) + 1
+            slug = f'{base}-{counters[base]}'
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def ingest_uploaded_file(file_id):
+    """Import the listings of an uploaded feed and record the outcome on it."""
+    uploaded = UploadedFile.objects.select_related('uploaded_by').get(pk=file_id)
+    importer = FeedImporter(uploader=uploaded.uploaded_by)
+    try:
+        if uploaded.uploaded_by is None:
+            raise PermissionError('the uploading account no longer exists')
+        with uploaded.file.open('rb') as source:
+            importer.run(source)
+    except Exception as error:
+        # Malformed XML or storage errors end the run. Finished batches stay;
+        # a synced feed unpublishes and deletes nothing.
+        logger.exception('Feed %s failed after %s listings', file_id, importer.imported)
+        importer.errors.append(f'feed: {error}')
+    summary = importer.summarize()
+    logger.info('Feed %s: %s', file_id, summary)
+    UploadedFile.objects.filter(pk=file_id).update(
+        processed=True,
+        processing_errors='\n'.join(importer.errors) or None,
+        feed_summary=summary,
+    )
+    return importer
@@ -0,0 +1,68 @@
+import io
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.feeds import FeedImporter
+from properties.management.synthetic import CITIES, WORDS, benchmark_owner, rolled_back
+
+LISTING = (
+    '<listing id="{ref}"><title>{title}</title><description>{description}</description>'
+    '<property_type>{property_type}</property_type><listing_type>{listing_type}</listing_type>'
+    '<price>{price}</price><bedrooms>{bedrooms}</bedrooms><bathrooms>2</bathrooms>'
+    '<area>{area}</area><address>{number} Feed Street</address><city>{city}</city>'
+    '<country>{country}</country><latitude>{latitude}</latitude><longitude>{longitude}</longitude>'
+    '<owner_email>{owner}</owner_email><amenities><amenity>WiFi</amenity></amenities>'
+    '<images><image primary="true">properties/{ref}.jpg</image></images></listing>'
+)
+
+
+def synthetic_feed(owner, rows, changed=(), seed=42):
+    """A synced feed of ``rows`` listings; those in ``changed`` get a new price."""
+    rng = random.Random(seed)
+    parts = ['<?xml version="1.0"?><listings source="benchmark">']
+    for number in range(rows):
+        city, country, latitude, longitude = rng.choice(CITIES)
+        price = rng.randint(300, 900000)
+        parts.append(LISTING.format(
+            ref=f'B-{number}',
+            title=' '.join(rng.sample(WORDS, 3)).title(),
+            description=' '.join(rng.choices(WORDS, k=30)),
+            property_type=rng.choice(['house', 'apartment', 'villa']),
+            listing_type=rng.choice(['sale', 'rent']),
+            price=f'{price + (1 if number in changed else 0)}.00',
+            bedrooms=rng.randint(1, 6),
+            area=f'{rng.randint(30, 900)}.00',
+            number=number,
+            city=city, country=country,
+            latitude=f'{latitude:.6f}', longitude=f'{longitude:.6f}',
+            owner=owner.email,
+        ))
+    parts.append('</listings>')
+    return ''.join(parts).encode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Times a full re-sync of a synthetic partner feed in which a fraction of listings changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--changed', type=float, default=0.01, help='Fraction of listings changed')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        changed = set(random.Random(7).sample(range(rows), int(rows * options['changed'])))
+
+        with rolled_back():
+            owner = benchmark_owner()
+            initial = synthetic_feed(owner, rows)
+            resent = synthetic_feed(owner, rows, changed)
+            self.stdout.write(f'Feed of {rows} listings, {len(initial) / 2 ** 20:.1f} MB')
+
+            for label, document in (('initial import', initial), ('re-sync', resent)):
+                importer = FeedImporter()
+                start = time.perf_counter()
+                importer.run(io.BytesIO(document))
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{label:<16} {elapsed:>7.2f}s  {importer.summarize()}')
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadedFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("file", models.FileField(upload_to="uploads/xml/")),
+                ("original_filename", models.CharField(max_length=255)),
+                ("file_size", models.PositiveIntegerField()),
+                ("mime_type", models.CharField(max_length=100)),
+                ("uploaded_at", models.DateTimeField(auto_now_add=True)),
+                ("processed", models.BooleanField(default=False)),
+                ("processing_errors", models.TextField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Uploaded File",
+                "verbose_name_plural": "Uploaded Files",
+                "ordering": ["-uploaded_at"],
+            },
+        ),
+    ]
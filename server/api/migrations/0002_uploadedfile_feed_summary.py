@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:49
+
+from django.db import migrations, models
+import properties.blobs
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadedfile",
+            name="feed_summary",
+            field=models.JSONField(
+                blank=True,
+                help_text="Listings created, updated, unchanged, unpublished, deleted and failed",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="uploadedfile",
+            name="file",
+            field=models.FileField(
+                storage=properties.blobs.content_addressed_storage,
+                upload_to="uploads/xml/",
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("api", "0002_uploadedfile_feed_summary"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="uploadedfile",
+            options={
+                "ordering": ["-uploaded_at"],
+                "permissions": [("upload_feed", "Can upload listing feeds")],
+                "verbose_name": "Uploaded File",
+                "verbose_name_plural": "Uploaded Files",
+            },
+        ),
+        migrations.AddField(
+            model_name="uploadedfile",
+            name="uploaded_by",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Account the feed is imported on behalf of",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="uploaded_files",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("api", "0003_uploadedfile_uploaded_by"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedSource",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "slug",
+                    models.CharField(
+                        help_text="The source attribute of the feed",
+                        max_length=100,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "partner",
+                    models.ForeignKey(
+                        help_text='Only this account may sync the source with missing="delete"',
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_sources",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
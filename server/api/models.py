@@ -1,14 +1,25 @@
+from django.conf import settings
 from django.db import models
 
+from properties.blobs import content_addressed_storage
+
 class UploadedFile(models.Model):
     """Model to store uploaded XML files and their processing status."""
-    file = models.FileField(upload_to='uploads/xml/')
+    file = models.FileField(upload_to='uploads/xml/', storage=content_addressed_storage)
     original_filename = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField()
     mime_type = models.CharField(max_length=100)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)
     processing_errors = models.TextField(blank=True, null=True)
+    feed_summary = models.JSONField(
+        blank=True, null=True,
+        help_text='Listings created, updated, unchanged, unpublished, deleted and failed'
+    )
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='uploaded_files', help_text='Account the feed is imported on behalf of'
+    )
 
     def __str__(self):
         return f"{self.original_filename} ({'Processed' if self.processed else 'Pending'})"
@@ -17,3 +28,16 @@ class UploadedFile(models.Model):
         ordering = ['-uploaded_at']
         verbose_name = 'Uploaded File'
         verbose_name_plural = 'Uploaded Files'
+        permissions = [('upload_feed', 'Can upload listing feeds')]
+
+
+class FeedSource(models.Model):
+    """A partner feed that may be synced, and the account it belongs to (see feeds.py)."""
+    slug = models.CharField(max_length=100, unique=True, help_text='The source attribute of the feed')
+    partner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_sources',
+        help_text='Only this account may sync the source with missing="delete"'
+    )
+
+    def __str__(self):
+        return self.slug
@@ -0,0 +1,9 @@
+from rest_framework import permissions
+
+
+class CanUploadFeeds(permissions.BasePermission):
+    """Staff, or feed partners given the ``api.upload_feed`` permission."""
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_staff or user.has_perm('api.upload_feed')))
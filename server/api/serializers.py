@@ -10,11 +10,11 @@ class UploadedFileSerializer(serializers.ModelSerializer):
         model = UploadedFile
         fields = [
             'id', 'file', 'original_filename', 'file_size',
-            'mime_type', 'uploaded_at', 'processed', 'processing_errors'
+            'mime_type', 'uploaded_at', 'processed', 'processing_errors', 'feed_summary'
         ]
         read_only_fields = [
             'id', 'original_filename', 'file_size', 'mime_type',
-            'uploaded_at', 'processed', 'processing_errors'
+            'uploaded_at', 'processed', 'processing_errors', 'feed_summary'
         ]
     
     def get_file_size(self, obj):
@@ -26,9 +26,9 @@ class UploadedFileSerializer(serializers.ModelSerializer):
             return None
 
     def validate_file(self, value):
-        max_size = 10 * 1024 * 1024  # 10MB
+        max_size = 100 * 1024 * 1024  # 100MB, a full partner inventory
         if value.size > max_size:
-            raise serializers.ValidationError("File size should not exceed 10MB.")
+            raise serializers.ValidationError("File size should not exceed 100MB.")
         
         # Check file extension
         valid_extensions = ['.xml']
@@ -47,7 +47,8 @@ class UploadedFileSerializer(serializers.ModelSerializer):
             file=file_obj,
             original_filename=file_obj.name,
             file_size=file_obj.size,
-            mime_type=file_obj.content_type or 'application/octet-stream'
+            mime_type=file_obj.content_type or 'application/octet-stream',
+            uploaded_by=validated_data.get('uploaded_by'),
         )
         
         # Save the instance
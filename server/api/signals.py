@@ -0,0 +1,5 @@
+from properties import blobs
+
+from .models import UploadedFile
+
+blobs.track_references(UploadedFile, 'file')
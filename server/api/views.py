@@ -1,22 +1,43 @@
-from rest_framework import status, generics, permissions
+from rest_framework import status, generics
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from properties import tasks
+
+from .feeds import ingest_uploaded_file
 from .models import UploadedFile
+from .permissions import CanUploadFeeds
 from .serializers import UploadedFileSerializer
 
+
+class UploaderFilesMixin:
+    """Staff see every uploaded file; feed partners only their own."""
+    permission_classes = [CanUploadFeeds]
+
+    def get_queryset(self):
+        queryset = UploadedFile.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(uploaded_by=self.request.user)
+        return queryset
+
+
 class FileUploadView(APIView):
     """
     API endpoint that allows files to be uploaded.
+    Listing feeds are imported in the background once the upload is saved;
+    poll the file detail for ``processed`` / ``processing_errors``.
+    Only staff and feed partners (``api.upload_feed``) may upload, since the
+    import creates listings.
     """
     parser_classes = (MultiPartParser, FormParser)
-    permission_classes = [permissions.AllowAny]  # For development only
+    permission_classes = [CanUploadFeeds]
     
     def post(self, request, format=None):
         serializer = UploadedFileSerializer(data=request.data)
         
         if serializer.is_valid():
-            file_obj = serializer.save()
+            file_obj = serializer.save(uploaded_by=request.user)
+            tasks.enqueue(ingest_uploaded_file, file_obj.pk)
             return Response(
                 {
                     'id': file_obj.id,
@@ -36,20 +57,16 @@ class FileUploadView(APIView):
         )
 
 
-class FileListView(generics.ListAPIView):
+class FileListView(UploaderFilesMixin, generics.ListAPIView):
     """
-    API endpoint that lists all uploaded files.
+    API endpoint that lists uploaded files.
     """
-    queryset = UploadedFile.objects.all()
     serializer_class = UploadedFileSerializer
-    permission_classes = [permissions.AllowAny]  # For development only
 
 
-class FileDetailView(generics.RetrieveAPIView):
+class FileDetailView(UploaderFilesMixin, generics.RetrieveAPIView):
     """
     API endpoint that retrieves a specific uploaded file.
     """
-    queryset = UploadedFile.objects.all()
     serializer_class = UploadedFileSerializer
-    permission_classes = [permissions.AllowAny]  # For development only
     lookup_field = 'id'
@@ -305,6 +305,19 @@ if os.getenv('USE_S3', 'False') == 'True':
     MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/{PUBLIC_MEDIA_LOCATION}/'
     DEFAULT_FILE_STORAGE = 'config.storage_backends.MediaStorage'
 
+# Uploads are hashed as they arrive for content-addressed storage (properties/blobs.py)
+FILE_UPLOAD_HANDLERS = [
+    'properties.blobs.HashingMemoryFileUploadHandler',
+    'properties.blobs.HashingTemporaryFileUploadHandler',
+]
+
+# Resumable chunked uploads (properties/uploads.py): where parts are assembled
+# (shared by all app servers; defaults to the system temp dir), the largest
+# chunk accepted and how long an idle upload is kept
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', '')
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024))
+CHUNKED_UPLOAD_EXPIRY_HOURS = int(os.getenv('CHUNKED_UPLOAD_EXPIRY_HOURS', 24))
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -376,6 +389,34 @@ BLOG_POSTS_PER_PAGE = 10
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'webp']
 
+# Background work (search/similarity refreshes, imports) runs on a small
+# thread pool after commit; set eager to run it inline, e.g. in tests
+BACKGROUND_TASKS_EAGER = os.getenv('BACKGROUND_TASKS_EAGER', 'False') == 'True'
+BACKGROUND_TASK_WORKERS = int(os.getenv('BACKGROUND_TASK_WORKERS', 2))
+
+# Lifetime of cached anonymous property list/detail responses (seconds)
+PROPERTY_RESPONSE_CACHE_TIMEOUT = int(os.getenv('PROPERTY_RESPONSE_CACHE_TIMEOUT', 300))
+
+# How long a room stay quote is kept (seconds); bookings are priced from it (properties/quotes.py).
+# Quotes live in the default cache. LocMemCache is per process, so with several
+# workers use a shared backend (Redis, Memcached) for quotes to be reused across
+# them; a booking that finds no quote is priced again, never refused.
+BOOKING_QUOTE_TTL = int(os.getenv('BOOKING_QUOTE_TTL', 300))
+
+# Times a booking create is retried while its room type's row is locked (properties/reservations.py)
+BOOKING_CREATE_RETRIES = int(os.getenv('BOOKING_CREATE_RETRIES', 5))
+
+# Pending bookings hold their rooms this long before the sweeper expires them,
+# which runs at most every BOOKING_HOLD_SWEEP_SECONDS (properties/holds.py)
+BOOKING_HOLD_TTL_MINUTES = int(os.getenv('BOOKING_HOLD_TTL_MINUTES', 30))
+BOOKING_HOLD_SWEEP_SECONDS = int(os.getenv('BOOKING_HOLD_SWEEP_SECONDS', 60))
+
+# Owner of imported feed listings that carry no <owner_email>
+LISTING_FEED_OWNER_EMAIL = os.getenv('LISTING_FEED_OWNER_EMAIL', '')
+
+# Render property/booking lists with the compiled FastListSerializer
+FAST_LIST_SERIALIZATION = os.getenv('FAST_LIST_SERIALIZATION', 'True') == 'True'
+
 # Google Maps API Key
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', '')
 
@@ -125,72 +125,45 @@ def get_agent_dashboard_data(user):
 
 def get_hotel_manager_dashboard_data(user):
     """Get dashboard data for hotel manager users."""
-    from properties.models import Room, Booking
-    
-    # Get hotel managed by this user
-    from properties.models import Hotel
-    try:
-        hotel = Hotel.objects.get(manager=user)
-    except Hotel.DoesNotExist:
-        return {
-            'total_rooms': 0,
-            'available_rooms': 0,
-            'occupancy_rate': 0,
-            'total_properties': 0,
-            'active_listings': 0,
-            'total_bookings': 0,
-            'total_revenue': 0,
-            'upcoming_bookings': [],
-            'recent_activities': []
-        }
-    
-    # Room stats
-    total_rooms = Room.objects.filter(hotel=hotel).count()
-    
-    # Get bookings for the next 30 days
+    from properties.models import Hotel, RoomType
+    from properties.occupancy import build_calendar
+
+    # Every hotel managed by this user
+    hotels = Hotel.objects.filter(manager=user)
+    room_types = list(RoomType.objects.filter(hotel__in=hotels, is_active=True).order_by('pk'))
+    total_rooms = sum(room_type.quantity for room_type in room_types)
+
+    # Exact occupancy over the next 30 days, from every overlapping booking
     today = datetime.now().date()
     thirty_days_later = today + timedelta(days=30)
-    
+    calendar = build_calendar(room_types, today, thirty_days_later, statuses=('confirmed', 'completed'))
+    occupancy_rate = calendar.occupancy_rate()
+
+    # Units still free tonight
+    available_rooms = int(calendar.available[:, 0].sum())
+
     upcoming_bookings = Booking.objects.filter(
-        room__hotel=hotel,
+        room_type__hotel__in=hotels,
         check_in_date__lte=thirty_days_later,
         check_out_date__gte=today,
         status__in=['confirmed', 'completed']
     ).order_by('check_in_date')[:10].values(
         'id', 'user__email', 'check_in_date', 'check_out_date', 'total_price', 'status'
     )
-    
-    # Calculate occupancy rate for the next 30 days
-    total_nights = 30 * total_rooms
-    if total_nights > 0:
-        booked_nights = sum(
-            (min(booking['check_out_date'], thirty_days_later) - 
-             max(booking['check_in_date'], today)).days
-            for booking in upcoming_bookings
-        )
-        occupancy_rate = (booked_nights / total_nights) * 100
-    else:
-        occupancy_rate = 0
-    
-    # Available rooms (simplified)
-    available_rooms = Room.objects.filter(
-        hotel=hotel,
-        is_available=True
-    ).count()
-    
+
     # Booking stats
-    hotel_bookings = Booking.objects.filter(room__hotel=hotel)
+    hotel_bookings = Booking.objects.filter(room_type__hotel__in=hotels)
     total_bookings = hotel_bookings.count()
     total_revenue = hotel_bookings.aggregate(
         total=Sum('total_price')
     )['total'] or 0
-    
+
     return {
         'total_rooms': total_rooms,
         'available_rooms': available_rooms,
-        'occupancy_rate': round(occupancy_rate, 2),
-        'total_properties': 1,  # The hotel itself
-        'active_listings': 1 if hotel.is_published else 0,
+        'occupancy_rate': occupancy_rate,
+        'total_properties': hotels.count(),
+        'active_listings': hotels.filter(is_active=True).count(),
         'total_bookings': total_bookings,
         'total_revenue': total_revenue,
         'upcoming_bookings': list(upcoming_bookings),
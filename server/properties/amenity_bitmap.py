@@ -0,0 +1,129 @@
+"""
+Per-row amenity bitmaps for Property, Hotel and RoomType.
+
+Every amenity is given a bit (``Amenity.bit``, 0-62 so masks stay positive in
+a signed 64-bit column), and each model with an ``amenities`` relation keeps
+the OR of its amenities' bits in ``amenity_mask``. Amenity filters then become
+a single predicate on that column, ``mask & wanted = wanted`` for all-of and
+``mask & wanted > 0`` for any-of, with no join over the M2M table and no
+DISTINCT.
+
+Masks are maintained from ``m2m_changed`` (see signals.py). Amenities created
+after all bits are taken have no bit; filters on them fall back to a subquery
+on the through table.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Amenity, Hotel, Property, RoomType
+
+MASK_FIELD = 'amenity_mask'
+MATCH_ALL, MATCH_ANY = 'all', 'any'
+BITS = Amenity.BITMAP_BITS
+
+# Models whose ``amenities`` relation is mirrored into ``amenity_mask``
+BITMAP_MODELS = (Property, Hotel, RoomType)
+
+
+def parse_amenity_ids(values):
+    """Amenity ids from repeated and/or comma separated query values."""
+    try:
+        return sorted({int(part) for value in values for part in str(value).split(',') if part.strip()})
+    except ValueError:
+        raise ValidationError({'amenities': 'Expected amenity ids.'})
+
+
+def parse_match(value):
+    value = (value or MATCH_ANY).lower()
+    if value not in (MATCH_ALL, MATCH_ANY):
+        raise ValidationError({'amenities_match': f"Expected '{MATCH_ALL}' or '{MATCH_ANY}'."})
+    return value
+
+
+def mask_for(amenity_ids):
+    """Return ``(mask, unmapped_ids)``: the bits of the amenities that have one, and the rest."""
+    bits = dict(Amenity.objects.filter(pk__in=amenity_ids).values_list('pk', 'bit'))
+    mask, unmapped = 0, []
+    for amenity_id in amenity_ids:
+        bit = bits.get(amenity_id)
+        if bit is None:
+            unmapped.append(amenity_id)
+        else:
+            mask |= 1 << bit
+    return mask, unmapped
+
+
+def _through(model):
+    field = model._meta.get_field('amenities')
+    return field.remote_field.through, f'{field.m2m_field_name()}_id'
+
+
+def filter_amenities(queryset, amenity_ids, match=MATCH_ANY):
+    """Rows having all (or any) of ``amenity_ids``."""
+    if not amenity_ids:
+        return queryset
+    mask, unmapped = mask_for(amenity_ids)
+    through, owner_column = _through(queryset.model)
+
+    def linked_to(ids):
+        return Q(pk__in=through.objects.filter(amenity_id__in=ids).values(owner_column))
+
+    if mask:
+        queryset = queryset.alias(amenity_match=F(MASK_FIELD).bitand(mask))
+    if match == MATCH_ANY:
+        condition = Q(amenity_match__gt=0) if mask else Q()
+        if unmapped:
+            condition |= linked_to(unmapped)
+        return queryset.filter(condition)
+
+    if mask:
+        queryset = queryset.filter(amenity_match=mask)
+    for amenity_id in unmapped:
+        queryset = queryset.filter(linked_to([amenity_id]))
+    return queryset
+
+
+def filter_from_params(queryset, params):
+    """Apply ``?amenities=`` (ids) and ``?amenities_match=all|any`` (default any)."""
+    amenities = params.getlist('amenities')
+    if not amenities:
+        return queryset
+    return filter_amenities(
+        queryset, parse_amenity_ids(amenities), parse_match(params.get('amenities_match'))
+    )
+
+
+def refresh_masks(model, pks):
+    """Recompute ``amenity_mask`` of the given rows from the through table."""
+    pks = list(pks)
+    if not pks:
+        return
+    through, owner_column = _through(model)
+    masks = defaultdict(int)
+    for pk, bit in through.objects.filter(
+        **{f'{owner_column}__in': pks}, amenity__bit__isnull=False
+    ).values_list(owner_column, 'amenity__bit'):
+        masks[pk] |= 1 << bit
+    groups = defaultdict(list)
+    for pk in pks:
+        groups[masks[pk]].append(pk)
+    for mask, group in groups.items():
+        model.objects.filter(pk__in=group).update(**{MASK_FIELD: mask})
+
+
+def set_bit(queryset, bit):
+    queryset.update(**{MASK_FIELD: F(MASK_FIELD).bitor(1 << bit)})
+
+
+def clear_bit(queryset, bit):
+    queryset.update(**{MASK_FIELD: F(MASK_FIELD).bitand(~(1 << bit))})
+
+
+def rebuild_masks(model):
+    """Recompute every ``amenity_mask`` of ``model``, e.g. after a bulk import."""
+    model.objects.update(**{MASK_FIELD: 0})
+    pks = list(model.objects.filter(amenities__isnull=False).values_list('pk', flat=True).distinct())
+    for start in range(0, len(pks), 500):
+        refresh_masks(model, pks[start:start + 500])
@@ -0,0 +1,80 @@
+"""
+Hotel search by free rooms: ``?check_in=&check_out=&guests=`` on the hotel list.
+
+A room type can take the stay when it is active, ``max_guests >= guests``,
+and no night of the stay is too full for ``guests`` more units in the
+``RoomNight`` ledger (see inventory.py, where each guest takes one unit).
+Nights without a ledger row have nothing booked.
+
+The whole search is one SQL statement. Hotels are kept when some room type
+can take the stay, and are annotated with ``cheapest_price``, the lowest
+``price_per_night`` among those room types. Both come from one correlated
+subquery, and the ledger check is a ``NOT EXISTS`` probe on the
+``(room_type, date)`` unique index. Nothing is evaluated per hotel in Python,
+and the result still paginates, filters and orders like any hotel queryset.
+"""
+from datetime import date
+
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import RoomNight, RoomType
+
+MAX_NIGHTS = 60
+MAX_GUESTS = 50
+
+
+def parse_date(value, param):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValidationError({param: 'Expected a date as YYYY-MM-DD.'})
+
+
+def parse_stay(params):
+    """``(check_in, check_out, guests)`` from the query string."""
+    check_in = parse_date(params.get('check_in'), 'check_in')
+    check_out = parse_date(params.get('check_out'), 'check_out')
+    if check_in < timezone.now().date():
+        raise ValidationError({'check_in': 'Cannot be in the past.'})
+    nights = (check_out - check_in).days
+    if nights < 1:
+        raise ValidationError({'check_out': 'Must be after check_in.'})
+    if nights > MAX_NIGHTS:
+        raise ValidationError({'check_out': f'Stays are limited to {MAX_NIGHTS} nights.'})
+    try:
+        guests = int(params.get('guests') or 1)
+    except ValueError:
+        raise ValidationError({'guests': 'Expected a number.'})
+    if not 1 <= guests <= MAX_GUESTS:
+        raise ValidationError({'guests': f'Must be between 1 and {MAX_GUESTS}.'})
+    return check_in, check_out, guests
+
+
+def available_room_types(check_in, check_out, guests):
+    """Room types with ``guests`` free units on every night from ``check_in`` to ``check_out``."""
+    full_night = RoomNight.objects.filter(
+        room_type=OuterRef('pk'),
+        date__gte=check_in,
+        date__lt=check_out,
+        booked__gt=OuterRef('quantity') - guests,
+    )
+    return RoomType.objects.filter(
+        is_active=True, max_guests__gte=guests, quantity__gte=guests
+    ).filter(~Exists(full_night))
+
+
+def filter_available(queryset, check_in, check_out, guests):
+    """Hotels of ``queryset`` with a room type that can take the stay, with ``cheapest_price``."""
+    cheapest = available_room_types(check_in, check_out, guests).filter(
+        hotel=OuterRef('pk')
+    ).order_by('price_per_night').values('price_per_night')[:1]
+    return queryset.annotate(cheapest_price=Subquery(cheapest)).filter(cheapest_price__isnull=False)
+
+
+def filter_from_params(queryset, params):
+    """Apply ``?check_in=&check_out=`` (and optional ``?guests=``) when given."""
+    if not params.get('check_in') and not params.get('check_out'):
+        return queryset
+    return filter_available(queryset, *parse_stay(params))
@@ -0,0 +1,198 @@
+"""
+Content-addressed storage for uploaded media and feed files.
+
+Upload fields use ``content_addressed_storage()``. A file is stored under the
+SHA-256 of its bytes, ``<upload_to>/<hh>/<sha256><ext>``. Saving content
+that is already stored writes nothing and returns the existing name, so
+a photo attached to twenty listings is kept (and pushed to S3) once.
+
+The digest is computed while the request body is received: the upload
+handlers below hash each chunk as it passes and set ``content_hash`` on
+the uploaded file. Content from elsewhere is hashed when it is saved.
+
+Every stored file has a ``MediaBlob`` row counting the model rows that point
+at it. ``save()`` counts the reference it hands out itself, with the blob
+row locked, so a concurrent delete of the last other reference cannot
+remove the file in between. Other counts are kept by ``track_references``
+receivers, and by ``retain`` / ``release`` for bulk writes. Files stored
+before blobs existed got theirs, counted, from migration 0016. ``delete()``
+checks the count under the same lock and only removes a file once nothing
+references it, together with its image renditions (derivatives.py). That
+is also what makes django_cleanup safe, since it deletes the old file
+whenever a row is deleted or its file is replaced.
+"""
+import hashlib
+import posixpath
+from collections import Counter
+
+from django.core.files.storage import storages
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class HashingUploadHandlerMixin:
+    """Hashes an uploaded file while it is received and sets ``content_hash`` on it."""
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.content_hash = self.hasher.hexdigest()
+        return uploaded
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def file_digest(content):
+    """SHA-256 of a file, from the upload handler when it was received through one."""
+    digest = getattr(content, 'content_hash', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        hasher.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+def blob_name(name, digest):
+    """Where content with ``digest`` is kept, in the directory ``name`` would have used."""
+    directory = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(directory, digest[:2], f'{digest}{extension}')
+
+
+class ContentAddressedStorageMixin:
+    """Storage mixin storing each distinct content once, see the module docstring."""
+
+    def save(self, name, content, max_length=None):
+        from .models import MediaBlob
+
+        if name is None:
+            name = content.name
+        digest = file_digest(content)
+        name = blob_name(name, digest)
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                if not self.exists(name):
+                    name = super().save(name, content, max_length=max_length)
+                blob, _ = MediaBlob.objects.get_or_create(
+                    name=name, defaults={'sha256': digest, 'size': content.size}
+                )
+            # The caller's reference, see track_references
+            MediaBlob.objects.filter(pk=blob.pk).update(references=F('references') + 1)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # A taken name already holds the same bytes
+        return name
+
+    def delete(self, name):
+        from . import derivatives
+        from .models import MediaBlob
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None:
+                if blob.references > 0:
+                    return
+                blob.delete()
+            super().delete(name)
+        derivatives.discard(name)
+
+
+def _build_storage():
+    backend = storages.backends['default']
+    storage_class = import_string(backend['BACKEND'])
+    content_addressed = type(
+        f'ContentAddressed{storage_class.__name__}', (ContentAddressedStorageMixin, storage_class), {}
+    )
+    return content_addressed(**backend.get('OPTIONS', {}))
+
+
+_storage = SimpleLazyObject(_build_storage)
+
+
+def content_addressed_storage():
+    """The default storage, content-addressed; pass as ``storage=`` to FileFields."""
+    return _storage
+
+
+def _change_references(names, delta):
+    from .models import MediaBlob
+
+    counts = Counter(name for name in names if name)
+    by_count = {}
+    for name, count in counts.items():
+        by_count.setdefault(count, []).append(name)
+    for count, group in by_count.items():
+        blobs = MediaBlob.objects.filter(name__in=group)
+        if delta < 0:
+            blobs = blobs.filter(references__gte=count)
+        blobs.update(references=F('references') + delta * count)
+
+
+def retain(names):
+    """Count one more reference to each blob in ``names`` (e.g. rows bulk-created with them)."""
+    _change_references(names, 1)
+
+
+def release(names):
+    """Count one reference less to each blob in ``names``."""
+    _change_references(names, -1)
+
+
+def track_references(model, field_name):
+    """Keep blob reference counts in step with ``model.<field_name>``."""
+    uid = f'blob_references_{model._meta.label_lower}_{field_name}'
+
+    def skipped(raw, update_fields):
+        return raw or (update_fields is not None and field_name not in update_fields)
+
+    def remember_previous(sender, instance, raw, update_fields, **kwargs):
+        instance._blob_previous = None
+        # An uncommitted file is stored during this save, and the storage counts it
+        field_file = getattr(instance, field_name)
+        instance._blob_stored = bool(field_file) and not field_file._committed
+        if not skipped(raw, update_fields) and instance.pk is not None:
+            instance._blob_previous = model.objects.filter(pk=instance.pk).values_list(
+                field_name, flat=True
+            ).first()
+
+    def count_saved(sender, instance, raw, update_fields, **kwargs):
+        if skipped(raw, update_fields):
+            return
+        previous, current = getattr(instance, '_blob_previous', None), getattr(instance, field_name).name
+        if getattr(instance, '_blob_stored', False):
+            # Counted by the storage, also when the same content was saved again
+            release([previous])
+        elif previous != current:
+            retain([current])
+            release([previous])
+
+    def count_deleted(sender, instance, **kwargs):
+        release([getattr(instance, field_name).name])
+
+    pre_save.connect(remember_previous, sender=model, weak=False, dispatch_uid=f'{uid}_pre_save')
+    post_save.connect(count_saved, sender=model, weak=False, dispatch_uid=f'{uid}_post_save')
+    post_delete.connect(count_deleted, sender=model, weak=False, dispatch_uid=f'{uid}_post_delete')
@@ -0,0 +1,61 @@
+"""
+Side effects for Property rows written in bulk.
+
+``bulk_create`` and ``bulk_update`` skip model signals, so the search index,
+the facet, stats and response caches and the similarity index never hear about
+those rows. Bulk writers record what they wrote on a ``PropertyChanges`` and
+call ``apply()`` after each batch. That makes the same updates signals.py
+would have made, batched.
+"""
+from . import facets, response_cache, search, similarity, stats
+
+
+class PropertyChanges:
+    """Collects bulk-written properties and replays their side effects."""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.saved_ids = set()
+        # Rows whose similarity features changed
+        self.stale_ids = set()
+        self.slugs = set()
+        self.facet_changes = []
+        self.stats_snapshots = []
+
+    def created(self, property, amenity_ids):
+        """Record a property inserted with ``amenity_ids`` linked."""
+        self.saved_ids.add(property.pk)
+        self.stale_ids.add(property.pk)
+        self.slugs.add(property.slug)
+        self.facet_changes.append((None, facets.snapshot(property, amenity_ids)))
+        self.stats_snapshots.append(stats.snapshot(property))
+
+    def changed(self, previous, property, previous_amenity_ids, amenity_ids):
+        """Record an update of ``previous`` (the row as it was loaded) to ``property``."""
+        self.saved_ids.add(property.pk)
+        if similarity.features_changed(previous, property) or previous_amenity_ids != amenity_ids:
+            self.stale_ids.add(property.pk)
+        self.slugs.add(property.slug)
+        self.facet_changes.append((
+            facets.snapshot(previous, previous_amenity_ids),
+            facets.snapshot(property, amenity_ids),
+        ))
+        old, new = stats.snapshot(previous), stats.snapshot(property)
+        if old != new:
+            self.stats_snapshots.extend([old, new])
+
+    def apply(self):
+        """Update everything derived from the recorded rows, then start over."""
+        if not self.saved_ids:
+            return
+        search.index_properties(self.saved_ids)
+        facets.apply_changes(self.facet_changes)
+        stats.invalidate_snapshots(self.stats_snapshots)
+        response_cache.invalidate_lists()
+        response_cache.invalidate_details(self.slugs)
+        if self.stale_ids:
+            similarity.mark_stale(self.stale_ids)
+            similarity.schedule_refresh()
+        self._reset()
@@ -0,0 +1,69 @@
+"""
+Conditional GET support (ETag / Last-Modified) for detail endpoints.
+
+The validator of an object is the newest of its own ``updated_at`` and the
+``updated_at`` of the related rows listed in ``conditional_related_stamps``
+(e.g. amenities, whose names are embedded in the response). Changes that leave
+no stamp of their own — images added or removed, amenities or tags attached or
+detached, tags renamed — touch the parent's ``updated_at`` instead, see
+``touch`` and signals.py.
+
+The validator is read with one aggregate query over the lookup, so a
+revalidation that ends in 304 never loads or serializes the object.
+"""
+import hashlib
+
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def touch(queryset):
+    """Bump ``updated_at`` on the rows of ``queryset`` without firing save signals."""
+    queryset.update(updated_at=timezone.now())
+
+
+class ConditionalRetrieveMixin:
+    """
+    Answers ``If-None-Match`` / ``If-Modified-Since`` on ``retrieve`` with 304
+    and sets ``ETag`` / ``Last-Modified`` on full responses. The ETag also
+    covers the query string and renderer, which change the body.
+    """
+    conditional_related_stamps = ()
+
+    def get_last_modified(self):
+        """Newest change stamp of the requested object, or None if it is not visible."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        stamps = {'updated_at': Max('updated_at')}
+        for index, lookup in enumerate(self.conditional_related_stamps):
+            stamps[f'related_{index}'] = Max(lookup)
+        stamps = queryset.order_by().aggregate(**stamps)
+        if stamps['updated_at'] is None:
+            return None
+        return max(stamp for stamp in stamps.values() if stamp is not None)
+
+    def get_etag(self, request, last_modified):
+        renderer = getattr(request, 'accepted_renderer', None)
+        variant = f"{last_modified.isoformat()}|{request.get_full_path()}|{getattr(renderer, 'format', '')}"
+        return f'W/{quote_etag(hashlib.md5(variant.encode("utf-8")).hexdigest())}'
+
+    def retrieve(self, request, *args, **kwargs):
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            # Let the normal lookup produce the 404
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = self.get_etag(request, last_modified)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
@@ -0,0 +1,109 @@
+"""
+Denormalised cover image of properties, room types and hotels.
+
+Cards show one image per row. Rather than looking it up in the image tables
+for every row rendered, ``Property``, ``RoomType`` and ``Hotel`` carry it in
+``cover_image`` (a storage name) with ``cover_width`` / ``cover_height``:
+
+- a property's cover is its primary image,
+- a room type's is its primary image, or its first image if none is primary,
+- a hotel's is the cover of its first room type that has one.
+
+The card rendition is used once it exists (see derivatives.py). Until then
+the cover is the original and the dimensions are unknown, since reading them
+would mean opening the file. Image saves and deletes refresh the covers
+through signals.py, and generating the renditions saves the image, so the
+cover moves to the card rendition by itself. Bulk writers call
+``refresh_properties`` themselves.
+"""
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from . import derivatives
+
+COVER_FIELDS = ('cover_image', 'cover_width', 'cover_height')
+EMPTY_COVER = {'cover_image': '', 'cover_width': None, 'cover_height': None}
+BATCH_SIZE = 1000
+
+
+def cover_of(image):
+    """Cover fields for ``image`` (a PropertyImage or RoomImage), or empty ones for None."""
+    if image is None or not image.image:
+        return dict(EMPTY_COVER)
+    if derivatives.is_current(image.derivatives, image.image) and 'renditions' in image.derivatives:
+        card = image.derivatives['renditions']['card']
+        return {'cover_image': card['jpeg'], 'cover_width': card['width'], 'cover_height': card['height']}
+    return {'cover_image': image.image.name, 'cover_width': None, 'cover_height': None}
+
+
+def cover_url(request, obj):
+    """Absolute URL of ``obj``'s cover, or None."""
+    if not obj.cover_image:
+        return None
+    return request.build_absolute_uri(default_storage.url(obj.cover_image))
+
+
+def _image_covers(image_model, parent_field, ids, primary_only):
+    images = image_model.objects.filter(**{f'{parent_field}__in': ids})
+    if primary_only:
+        images = images.filter(is_primary=True)
+    chosen = {}
+    for image in images.order_by('-is_primary', 'pk').only(parent_field, 'image', 'derivatives', 'is_primary'):
+        chosen.setdefault(getattr(image, parent_field), image)
+    return {pk: cover_of(chosen.get(pk)) for pk in ids}
+
+
+def _hotel_covers(room_type_model, ids):
+    covers = {pk: dict(EMPTY_COVER) for pk in ids}
+    seen = set()
+    room_types = room_type_model.objects.filter(hotel_id__in=ids).exclude(cover_image='')
+    for hotel_id, *cover in room_types.order_by('pk').values_list('hotel_id', *COVER_FIELDS):
+        if hotel_id not in seen:
+            seen.add(hotel_id)
+            covers[hotel_id] = dict(zip(COVER_FIELDS, cover))
+    return covers
+
+
+def _store(model, covers):
+    """Write the covers that differ from the stored ones; returns the ids written."""
+    current = {
+        pk: dict(zip(COVER_FIELDS, cover))
+        for pk, *cover in model.objects.filter(pk__in=list(covers)).values_list('pk', *COVER_FIELDS)
+    }
+    now = timezone.now()
+    changed = [
+        model(pk=pk, updated_at=now, **cover)
+        for pk, cover in covers.items() if pk in current and current[pk] != cover
+    ]
+    # updated_at too: the cover is part of the row's responses and ETag
+    model.objects.bulk_update(changed, [*COVER_FIELDS, 'updated_at'], batch_size=BATCH_SIZE)
+    return [row.pk for row in changed]
+
+
+def refresh_properties(ids):
+    from .models import Property, PropertyImage
+
+    ids = {pk for pk in ids if pk is not None}
+    if ids:
+        _store(Property, _image_covers(PropertyImage, 'property_id', ids, primary_only=True))
+
+
+def refresh_hotels(ids):
+    from .models import Hotel, RoomType
+
+    ids = {pk for pk in ids if pk is not None}
+    if ids:
+        _store(Hotel, _hotel_covers(RoomType, ids))
+
+
+def refresh_room_types(ids):
+    """Refresh room type covers, and the hotels whose first room type cover changed with them."""
+    from .models import RoomType, RoomImage
+
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return
+    changed = _store(RoomType, _image_covers(RoomImage, 'room_type_id', ids, primary_only=False))
+    if changed:
+        hotel_ids = RoomType.objects.filter(pk__in=changed).values_list('hotel_id', flat=True)
+        refresh_hotels(set(hotel_ids))
@@ -0,0 +1,204 @@
+"""
+Resized renditions of uploaded images.
+
+Uploads are stored as sent, often 8-12 MB phone photos. For every image in
+``SOURCES`` a background task (see signals.py) writes a ``thumb``, ``card``
+and ``full`` rendition, each as JPEG and WebP. It records them on the row:
+
+    {"source": "properties/front.jpg",
+     "renditions": {"card": {"width": 800, "height": 600,
+                             "jpeg": "derivatives/properties/front/card.jpg",
+                             "webp": "derivatives/properties/front/card.webp"}, ...}}
+
+``source`` ties the renditions to the file they were made from, so a
+replaced image is regenerated. Until then the serializers keep using the
+original. File names are derived from the source name, and files already
+in storage are reused rather than rendered again, so the backfill command
+(``generate_image_derivatives``) can be rerun safely. Rows sharing a
+content-addressed source share its renditions too; they are deleted with
+the source file once its last reference goes (see blobs.py).
+
+JPEGs are decoded at reduced scale (``Image.draft``) when the largest
+rendition allows it. Smaller renditions are cut from the ``full`` one rather
+than the original.
+"""
+import io
+import logging
+import posixpath
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_PREFIX = 'derivatives'
+
+# name -> (width, height, crop). Cropped renditions fill the box exactly,
+# the others fit inside it. Ordered largest first.
+RENDITIONS = {
+    'full': (1920, 1920, False),
+    'card': (800, 600, True),
+    'thumb': (320, 240, True),
+}
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+# model label -> (image field, derivatives field)
+SOURCES = {
+    'properties.PropertyImage': ('image', 'derivatives'),
+    'properties.RoomImage': ('image', 'derivatives'),
+    'properties.BlogPost': ('featured_image', 'featured_image_derivatives'),
+}
+
+
+def derivative_name(source_name, rendition, extension):
+    stem = posixpath.splitext(source_name)[0]
+    return f'{DERIVATIVES_PREFIX}/{stem}/{rendition}.{extension}'
+
+
+def is_current(derivatives, field_file):
+    """True when ``derivatives`` were made from the file now in ``field_file``."""
+    return bool(field_file) and bool(derivatives) and derivatives.get('source') == field_file.name
+
+
+def _box(size, width, height, crop):
+    """Rendition size for a ``size`` image: never larger than the source."""
+    source_width, source_height = size
+    if crop:
+        scale = min(1.0, source_width / width, source_height / height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    scale = min(1.0, width / source_width, height / source_height)
+    return max(1, round(source_width * scale)), max(1, round(source_height * scale))
+
+
+def _resize(image, rendition):
+    width, height, crop = RENDITIONS[rendition]
+    box = _box(image.size, width, height, crop)
+    if crop:
+        return ImageOps.fit(image, box, Image.LANCZOS)
+    if box == image.size:
+        return image
+    return image.resize(box, Image.LANCZOS)
+
+
+def _encode(image, image_format):
+    pil_format, _, options = FORMATS[image_format]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def _stored(source_name):
+    """Renditions whose files are all in storage already, with their sizes."""
+    renditions = {}
+    for rendition in RENDITIONS:
+        names = {
+            image_format: derivative_name(source_name, rendition, extension)
+            for image_format, (_, extension, _) in FORMATS.items()
+        }
+        if not all(default_storage.exists(name) for name in names.values()):
+            return None
+        with default_storage.open(names['jpeg'], 'rb') as stored, Image.open(stored) as image:
+            renditions[rendition] = {'width': image.width, 'height': image.height, **names}
+    return renditions
+
+
+def discard(source_name):
+    """Delete the rendition files made from ``source_name``, once the source itself is gone."""
+    for rendition in RENDITIONS:
+        for _, extension, _ in FORMATS.values():
+            name = derivative_name(source_name, rendition, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+
+
+def render(field_file):
+    """Write every rendition of ``field_file`` to storage and describe them."""
+    renditions = {}
+    width, height, _ = RENDITIONS['full']
+    with field_file.open('rb') as source, Image.open(source) as original:
+        # Let the JPEG decoder scale down by up to 8x while staying above the full box
+        original.draft('RGB', _box(original.size, width, height, False))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    full = _resize(image, 'full')
+    for rendition in RENDITIONS:
+        resized = full if rendition == 'full' else _resize(full, rendition)
+        entry = {'width': resized.width, 'height': resized.height}
+        for image_format, (_, extension, _) in FORMATS.items():
+            name = derivative_name(field_file.name, rendition, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            entry[image_format] = default_storage.save(name, ContentFile(_encode(resized, image_format)))
+        renditions[rendition] = entry
+    return renditions
+
+
+def generate(label, pk, force=False):
+    """
+    Make the renditions of one row's image unless current ones exist.
+    Returns True when the row was updated.
+    """
+    model = apps.get_model(label)
+    image_field, derivatives_field = SOURCES[label]
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return False
+    field_file = getattr(instance, image_field)
+    if not field_file or (not force and is_current(getattr(instance, derivatives_field), field_file)):
+        return False
+
+    derivatives = {'source': field_file.name}
+    try:
+        renditions = None if force else _stored(field_file.name)
+        derivatives['renditions'] = renditions or render(field_file)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as error:
+        # Recorded so the row is not retried on every save
+        logger.warning('No derivatives for %s %s (%s): %s', label, pk, field_file.name, error)
+        derivatives['error'] = str(error)
+
+    setattr(instance, derivatives_field, derivatives)
+    update_fields = [derivatives_field]
+    if any(field.name == 'updated_at' for field in model._meta.fields):
+        update_fields.append('updated_at')
+    # Through save() so the usual signals drop cached responses
+    instance.save(update_fields=update_fields)
+    return True
+
+
+def generate_many(label, pks, force=False):
+    return sum(generate(label, pk, force=force) for pk in pks)
+
+
+def needs_derivatives(instance, label):
+    image_field, derivatives_field = SOURCES[label]
+    field_file = getattr(instance, image_field)
+    return bool(field_file) and not is_current(getattr(instance, derivatives_field), field_file)
+
+
+def srcset(request, derivatives, field_file):
+    """
+    ``{rendition: {width, height, url, webp}}`` for current derivatives, or
+    None while they are pending or could not be made.
+    """
+    if not is_current(derivatives, field_file) or 'renditions' not in derivatives:
+        return None
+    return {
+        rendition: {
+            'width': entry['width'],
+            'height': entry['height'],
+            'url': request.build_absolute_uri(default_storage.url(entry['jpeg'])),
+            'webp': request.build_absolute_uri(default_storage.url(entry['webp'])),
+        }
+        for rendition, entry in derivatives['renditions'].items()
+    }
+
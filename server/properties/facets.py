@@ -0,0 +1,185 @@
+"""
+Facet counts for the property search sidebar.
+
+Counts for the closed-domain facets (property and listing type) come from a
+single conditional aggregation; bedrooms, city and amenities are grouped
+counts. Results for the public (published-only) queryset are cached for the
+unfiltered case and for a single exact filter on a cached facet, and those
+cache entries are patched in place by the Property / amenity signals instead
+of being recomputed. A timeout bounds any drift between processes.
+"""
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Property
+
+FACET_CACHE_PREFIX = 'property-facets'
+FACET_CACHE_TIMEOUT = 60 * 10
+
+# Single filters whose cached facet entries are kept up to date
+CACHEABLE_FILTERS = ('property_type', 'listing_type', 'bedrooms')
+
+# Query parameters that do not change which rows are counted
+IGNORED_PARAMS = {'ordering', 'page', 'page_size', 'pagination', 'cursor', 'format', 'fields', 'expand'}
+
+GROUPED_FACETS = ('bedrooms', 'city')
+
+
+def compute_facets(queryset):
+    """Return facet counts for every row in ``queryset``."""
+    queryset = queryset.order_by()
+    aggregates = {'total': Count('id')}
+    for field in ('property_type', 'listing_type'):
+        for value, _ in Property._meta.get_field(field).choices:
+            aggregates[f'{field}:{value}'] = Count('id', filter=Q(**{field: value}))
+    counts = queryset.aggregate(**aggregates)
+
+    facets = {'total': counts.pop('total')}
+    for key, count in counts.items():
+        field, value = key.split(':', 1)
+        if count:
+            facets.setdefault(field, {})[value] = count
+    for field in ('property_type', 'listing_type'):
+        facets.setdefault(field, {})
+
+    for field in GROUPED_FACETS:
+        rows = queryset.values(field).annotate(count=Count('id')).values_list(field, 'count')
+        facets[field] = {str(value): count for value, count in rows}
+
+    through = Property.amenities.through
+    rows = through.objects.filter(property__in=queryset.values('id')).values(
+        'amenity_id'
+    ).annotate(count=Count('id')).values_list('amenity_id', 'count')
+    facets['amenities'] = {str(amenity_id): count for amenity_id, count in rows}
+    return facets
+
+
+def normalize_filter(field, value):
+    """Match the lookups get_queryset uses (iexact types, exact bedrooms)."""
+    if field == 'bedrooms':
+        try:
+            return str(int(value))
+        except (TypeError, ValueError):
+            return None
+    return str(value).lower()
+
+
+def cache_key(field=None, value=None):
+    if field is None:
+        return f'{FACET_CACHE_PREFIX}:all'
+    return f'{FACET_CACHE_PREFIX}:{field}={value}'
+
+
+def cache_key_for_params(params):
+    """
+    Cache key for the request parameters, or None when the combination is not
+    one of the maintained cases.
+    """
+    filters = {key: params.getlist(key) for key in params if key not in IGNORED_PARAMS}
+    filters = {key: values for key, values in filters.items() if any(values)}
+    if not filters:
+        return cache_key()
+    if len(filters) != 1:
+        return None
+    (field, values), = filters.items()
+    if field not in CACHEABLE_FILTERS or len(values) != 1:
+        return None
+    value = normalize_filter(field, values[0])
+    return cache_key(field, value) if value is not None else None
+
+
+def get_facets(queryset, params, public=True):
+    """Facet counts for the filtered queryset, served from cache when possible."""
+    key = cache_key_for_params(params) if public else None
+    if key is None:
+        return compute_facets(queryset)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
+
+
+def snapshot(property, amenity_ids=None):
+    """
+    The facet values a property contributes to the public counts, or None if
+    it is not visible to the public.
+    """
+    if property is None or not property.is_published:
+        return None
+    if amenity_ids is None:
+        amenity_ids = list(property.amenities.values_list('id', flat=True)) if property.pk else []
+    return {
+        'property_type': property.property_type,
+        'listing_type': property.listing_type,
+        'bedrooms': property.bedrooms,
+        'city': property.city,
+        'amenities': sorted(amenity_ids),
+    }
+
+
+def _contributions(snap):
+    counter = Counter()
+    if snap is None:
+        return counter
+    counter[('total', None)] += 1
+    for field in ('property_type', 'listing_type', 'bedrooms', 'city'):
+        counter[(field, str(snap[field]))] += 1
+    for amenity_id in snap['amenities']:
+        counter[('amenities', str(amenity_id))] += 1
+    return counter
+
+
+def _patch(facets, delta):
+    for (field, value), change in delta.items():
+        if field == 'total':
+            facets['total'] += change
+            continue
+        bucket = facets.setdefault(field, {})
+        count = bucket.get(value, 0) + change
+        if count > 0:
+            bucket[value] = count
+        else:
+            bucket.pop(value, None)
+
+
+def apply_change(old, new):
+    """
+    Patch the cached facet entries a property touches, given its snapshot
+    before and after a change. Entries not in the cache are left alone and
+    will be computed on the next request.
+    """
+    apply_changes([(old, new)])
+
+
+def apply_changes(changes):
+    """Patch the cache for many ``(old, new)`` snapshot pairs at once."""
+    deltas = defaultdict(Counter)
+    for old, new in changes:
+        if old == new:
+            continue
+        # Every maintained entry whose filter the old or new row satisfies
+        entries = {cache_key(): (old, new)}
+        for field in CACHEABLE_FILTERS:
+            for snap in (old, new):
+                if snap is not None:
+                    value = normalize_filter(field, snap[field])
+                    entries[cache_key(field, value)] = (
+                        old if old is not None and normalize_filter(field, old[field]) == value else None,
+                        new if new is not None and normalize_filter(field, new[field]) == value else None,
+                    )
+        for key, (entry_old, entry_new) in entries.items():
+            deltas[key].update(_contributions(entry_new))
+            deltas[key].subtract(_contributions(entry_old))
+
+    if not deltas:
+        return
+    cached = cache.get_many(list(deltas))
+    updates = {}
+    for key, facets in cached.items():
+        _patch(facets, {k: v for k, v in deltas[key].items() if v})
+        updates[key] = facets
+    if updates:
+        cache.set_many(updates, FACET_CACHE_TIMEOUT)
@@ -0,0 +1,216 @@
+"""
+Compiled, read-only serialization for list responses.
+
+``Serializer.to_representation`` resolves every field of every row through
+``get_attribute``, ``SkipField`` handling and per-field dispatch. For a list
+the field layout is the same on every row, so ``compile_serializer`` works it
+out once: plain model columns of a row are read in a single
+``operator.attrgetter`` call into a tuple and zipped with precomputed
+converters, and nested serializers are compiled the same way. Anything the
+compiler does not recognise falls back to DRF's own per-field logic, so the
+output is identical to the serializer it was compiled from.
+"""
+import datetime
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+
+def _datetime_converter(field):
+    """
+    DateTimeField.to_representation with the timezone looked up once rather
+    than per value. Anything but an aware datetime in ISO 8601 output takes
+    the field's own path.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not isinstance(value, datetime.datetime) or not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _converter(field):
+    # Same results as the field's to_representation, without the call
+    if type(field) is serializers.CharField:
+        return str
+    if type(field) is serializers.IntegerField:
+        return int
+    if type(field) is serializers.DateTimeField:
+        return _datetime_converter(field)
+    return field.to_representation
+
+
+def _model_field(serializer, source):
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return None
+    try:
+        return model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+
+
+def _generic(field):
+    """DRF's own per-field handling, for fields the compiler does not know."""
+    def get(obj, row):
+        try:
+            attribute = field.get_attribute(obj)
+        except SkipField:
+            return
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        row[field.field_name] = None if check_for_none is None else field.to_representation(attribute)
+    return get
+
+
+def _related_rows(obj, source):
+    """The rows of a to-many relation, straight from the prefetch cache if filled."""
+    try:
+        return obj._prefetched_objects_cache[source]
+    except (AttributeError, KeyError):
+        return getattr(obj, source).all()
+
+
+def _nested(name, source, build):
+    # Rows of one list share foreign keys (e.g. one owner for many
+    # listings), so each related row is rendered once and copied.
+    rendered = {}
+
+    def get(obj, row):
+        value = getattr(obj, source)
+        if value is None:
+            row[name] = None
+            return
+        if value.pk not in rendered:
+            rendered[value.pk] = build(value)
+        row[name] = dict(rendered[value.pk])
+    return get
+
+
+def _nested_many(name, source, build):
+    def get(obj, row):
+        row[name] = [build(item) for item in _related_rows(obj, source)]
+    return get
+
+
+def _pk_many(name, source):
+    def get(obj, row):
+        row[name] = [item.pk for item in _related_rows(obj, source)]
+    return get
+
+
+def _method(name, method):
+    def get(obj, row):
+        row[name] = method(obj)
+    return get
+
+
+def compile_serializer(serializer):
+    """
+    Return a function mapping one instance to the same dict
+    ``serializer.to_representation`` would produce.
+    """
+    # (position, name, converter) for plain model columns, read together per row
+    columns = []
+    sources = []
+    # (position, getter) for everything else, in field order
+    others = []
+    for position, field in enumerate(serializer._readable_fields):
+        name, source = field.field_name, field.source
+        model_field = _model_field(serializer, source) if '.' not in source and source != '*' else None
+
+        if isinstance(field, serializers.SerializerMethodField):
+            getter = _method(name, getattr(serializer, field.method_name))
+        elif isinstance(field, serializers.ListSerializer) and model_field is not None:
+            getter = _nested_many(name, source, compile_serializer(field.child))
+        elif isinstance(field, serializers.BaseSerializer) and model_field is not None:
+            getter = _nested(name, source, compile_serializer(field))
+        elif (isinstance(field, serializers.ManyRelatedField) and model_field is not None
+              and isinstance(field.child_relation, serializers.PrimaryKeyRelatedField)):
+            getter = _pk_many(name, source)
+        elif (type(field) is serializers.PrimaryKeyRelatedField and field.pk_field is None
+              and model_field is not None and model_field.many_to_one):
+            columns.append((position, name, lambda value: value))
+            sources.append(model_field.attname)
+            continue
+        elif (model_field is not None and not model_field.is_relation
+              and not isinstance(field, (serializers.RelatedField, serializers.BaseSerializer))):
+            columns.append((position, name, _converter(field)))
+            sources.append(source)
+            continue
+        else:
+            getter = _generic(field)
+        others.append((position, getter))
+
+    read_columns = attrgetter(*sources) if sources else None
+    if len(sources) == 1:
+        single = read_columns
+        read_columns = lambda obj: (single(obj),)
+
+    # Merge both lists back into field order once, up front
+    steps = sorted(
+        [(position, 'column', (index, name, convert)) for index, (position, name, convert) in enumerate(columns)]
+        + [(position, 'other', getter) for position, getter in others],
+        key=lambda step: step[0],
+    )
+
+    def build(obj):
+        values = read_columns(obj) if read_columns else ()
+        row = {}
+        for _, kind, step in steps:
+            if kind == 'column':
+                index, name, convert = step
+                value = values[index]
+                row[name] = None if value is None else convert(value)
+            else:
+                step(obj, row)
+        return row
+    return build
+
+
+class FastListSerializer(serializers.ListSerializer):
+    """
+    A read-only ListSerializer that renders rows with a compiled builder.
+    It takes no input data, so it can never be validated or saved.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if 'data' in kwargs or len(args) > 1:
+            raise ImproperlyConfigured('FastListSerializer is read-only; it does not accept data.')
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        build = compile_serializer(self.child)
+        return [build(item) for item in iterable]
+
+
+class FastListMixin:
+    """
+    Serializes ``fast_list_actions`` with FastListSerializer. Set
+    ``FAST_LIST_SERIALIZATION = False`` to fall back to the plain serializers.
+    """
+    fast_list_actions = ('list',)
+
+    def get_serializer(self, *args, **kwargs):
+        if (kwargs.get('many') and self.action in self.fast_list_actions
+                and getattr(settings, 'FAST_LIST_SERIALIZATION', True)):
+            kwargs.pop('many')
+            kwargs.setdefault('context', self.get_serializer_context())
+            child = self.get_serializer_class()(context=kwargs['context'])
+            return FastListSerializer(*args, child=child, **kwargs)
+        return super().get_serializer(*args, **kwargs)
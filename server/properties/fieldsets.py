@@ -0,0 +1,176 @@
+"""
+Sparse fieldsets and relation expansion for read endpoints.
+
+``?fields=title,price,city`` limits a response to the named fields and
+``?expand=owner`` renders the named relations as nested objects. As soon as
+either parameter is given, relations that are not expanded are rendered as
+primary keys; without both the response keeps its full, nested shape.
+
+The selection also trims the queryset: only the columns behind the selected
+fields are loaded, foreign keys are joined only when expanded, and
+to-many relations are prefetched as bare ids unless expanded.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def _parse_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+class Fieldset:
+    """The fields and expanded relations one request asked for."""
+
+    def __init__(self, fields, expand):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request, serializer_class):
+        """
+        Parse ``?fields=`` / ``?expand=``. Returns None when neither is given,
+        so callers can keep their default loading and output.
+        """
+        params = request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+        available = list(serializer_class().fields)
+        expandable = getattr(serializer_class, 'expandable_fields', ())
+
+        fields = _parse_list(params.get('fields'))
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}."})
+        expand = _parse_list(params.get('expand'))
+        unknown = [name for name in expand if name not in expandable]
+        if unknown:
+            raise ValidationError({'expand': f"Cannot expand: {', '.join(unknown)}."})
+
+        selected = set(fields) if fields else set(available)
+        # Expanding a relation selects it too
+        selected.update(expand)
+        return cls([name for name in available if name in selected], set(expand))
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Applies the ``fieldset`` from the serializer context: unselected fields
+    are dropped and unexpanded relations in ``expandable_fields`` become
+    primary keys.
+
+    ``expandable_fields`` names the nested relations; ``field_dependencies``
+    maps computed fields to the relations they read, and ``expand_prefetches``
+    maps relations to the extra lookups their nested serializer needs.
+    """
+    expandable_fields = ()
+    field_dependencies = {}
+    expand_prefetches = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = self.context.get('fieldset')
+        if fieldset is None:
+            return
+        for name in list(self.fields):
+            if name not in fieldset.fields:
+                self.fields.pop(name)
+            elif name in self.expandable_fields and name not in fieldset.expand:
+                nested = self.fields[name]
+                kwargs = {'many': isinstance(nested, serializers.ListSerializer), 'read_only': True}
+                if nested.source != name:
+                    kwargs['source'] = nested.source
+                self.fields[name] = serializers.PrimaryKeyRelatedField(**kwargs)
+
+
+def apply_fieldset(queryset, serializer_class, fieldset, always=('id',)):
+    """
+    Restrict ``queryset`` to what the fieldset needs: ``only()`` the selected
+    columns plus ``always``, ``select_related`` expanded foreign keys and
+    prefetch to-many relations (full rows when expanded, ids otherwise).
+    """
+    model = queryset.model
+    declared = serializer_class().fields
+    columns = set(always)
+    joins = []
+    # lookup -> whether full rows are needed
+    prefetches = {}
+
+    def load(source, expanded):
+        try:
+            field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            # Annotations and computed values
+            return
+        if not field.is_relation:
+            columns.add(source)
+        elif field.many_to_one or (field.one_to_one and field.concrete):
+            columns.add(source)
+            if expanded:
+                joins.append(source)
+        else:
+            prefetches[source] = prefetches.get(source, False) or expanded
+
+    for name in fieldset.fields:
+        source = declared[name].source
+        if source == '*':
+            continue
+        load(source, name in fieldset.expand)
+        for dependency in serializer_class.field_dependencies.get(name, ()):
+            load(dependency, True)
+
+    lookups = []
+    for source, full in prefetches.items():
+        if full:
+            lookups.append(source)
+            continue
+        field = model._meta.get_field(source)
+        related = field.related_model
+        only = [related._meta.pk.name]
+        if field.one_to_many:
+            # The reverse foreign key is needed to attach rows to their owner
+            only.append(field.field.attname)
+        lookups.append(Prefetch(source, queryset=related.objects.only(*only)))
+    for source in joins + [source for source, full in prefetches.items() if full]:
+        lookups.extend(serializer_class.expand_prefetches.get(source, ()))
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if joins:
+        queryset = queryset.select_related(*joins)
+    return queryset.only(*columns).prefetch_related(*lookups)
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin that reads ``?fields=`` / ``?expand=`` on ``list`` and
+    ``retrieve``, trims the queryset and passes the selection to the
+    serializer. Views call ``self.with_fieldset(queryset, default)`` at the
+    end of ``get_queryset``.
+    """
+    fieldset_actions = ('list', 'retrieve')
+    # Columns loaded whatever is selected (lookup and cursor fields)
+    fieldset_always_load = ('id',)
+
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = None
+            if self.request is not None and self.action in self.fieldset_actions:
+                self._fieldset = Fieldset.from_request(self.request, self.get_serializer_class())
+        return self._fieldset
+
+    def with_fieldset(self, queryset, default=None):
+        """``queryset`` trimmed to the fieldset, or ``default(queryset)`` without one."""
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return default(queryset) if default else queryset
+        always = set(self.fieldset_always_load) | {self.lookup_field}
+        always.update(getattr(self, 'cursor_ordering_fields', ()))
+        return apply_fieldset(queryset, self.get_serializer_class(), fieldset, always=always)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            context['fieldset'] = fieldset
+        return context
@@ -1,6 +1,8 @@
 import django_filters
 from django.db import models
+from rest_framework import filters
 from .models import Property
+from . import search
 
 class PropertyFilter(django_filters.FilterSet):
     """
@@ -29,3 +31,30 @@ class PropertyFilter(django_filters.FilterSet):
     class Meta:
         model = Property
         fields = []  # We're defining all fields explicitly above
+
+
+class PropertySearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that answers ?search= from the FTS5 index, ranked by BM25.
+    Falls back to the regular multi-column icontains search when the index
+    is not available on the current database.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms or not search.search_index_available(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+        return search.search_properties(queryset, search_terms)
+
+
+class PropertyOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that only honours ?ordering=distance when the queryset
+    carries a distance annotation, i.e. when ?near= was given.
+    """
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        valid = super().remove_invalid_fields(queryset, fields, view, request)
+        if 'distance' in queryset.query.annotations:
+            return valid
+        return [term for term in valid if term.lstrip('-') != 'distance']
@@ -0,0 +1,138 @@
+"""
+Grid-cell spatial index for property coordinates.
+
+The globe is cut into fixed CELL_DEGREES squares numbered row by row, so the
+cells a bounding box covers form one contiguous id range per row. Viewport and
+radius queries become a handful of indexed range scans on ``geo_cell``,
+followed by the exact coordinate / distance check on the remaining rows.
+No GDAL or PostGIS is required.
+"""
+import math
+
+from django.db.models import FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+
+CELL_DEGREES = 0.1
+GRID_COLUMNS = int(round(360 / CELL_DEGREES))
+GRID_ROWS = int(round(180 / CELL_DEGREES))
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Past this many grid rows the cell ranges stop being selective and a plain
+# latitude/longitude comparison is cheaper to plan.
+MAX_CELL_ROWS = 64
+
+
+def _row(latitude):
+    return min(max(int(math.floor((float(latitude) + 90) / CELL_DEGREES)), 0), GRID_ROWS - 1)
+
+
+def _column(longitude):
+    return min(max(int(math.floor((float(longitude) + 180) / CELL_DEGREES)), 0), GRID_COLUMNS - 1)
+
+
+def cell_for(latitude, longitude):
+    """Return the grid cell id for a coordinate pair, or None if either is missing."""
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude) * GRID_COLUMNS + _column(longitude)
+
+
+def cell_ranges(south, west, north, east):
+    """
+    Cell id ranges covering a bounding box, one per grid row (two when the
+    box crosses the antimeridian). Returns None for boxes too tall to help.
+    """
+    first_row, last_row = _row(south), _row(north)
+    if last_row - first_row + 1 > MAX_CELL_ROWS:
+        return None
+    if west <= east:
+        column_spans = [(_column(west), _column(east))]
+    else:
+        column_spans = [(_column(west), GRID_COLUMNS - 1), (0, _column(east))]
+    return [
+        (row * GRID_COLUMNS + first, row * GRID_COLUMNS + last)
+        for row in range(first_row, last_row + 1)
+        for first, last in column_spans
+    ]
+
+
+def filter_bbox(queryset, south, west, north, east):
+    """Restrict a Property queryset to rows inside the bounding box."""
+    ranges = cell_ranges(south, west, north, east)
+    if ranges:
+        cells = Q()
+        for first, last in ranges:
+            cells |= Q(geo_cell__range=(first, last))
+        queryset = queryset.filter(cells)
+    queryset = queryset.filter(latitude__gte=south, latitude__lte=north)
+    if west <= east:
+        return queryset.filter(longitude__gte=west, longitude__lte=east)
+    return queryset.filter(Q(longitude__gte=west) | Q(longitude__lte=east))
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in kilometres from the given point to each row."""
+    lat1, lng1 = math.radians(latitude), math.radians(longitude)
+    lat2 = Radians(Cast('latitude', FloatField()))
+    lng2 = Radians(Cast('longitude', FloatField()))
+    a = (
+        Power(Sin((lat2 - lat1) / 2), 2)
+        + math.cos(lat1) * Cos(lat2) * Power(Sin((lng2 - lng1) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a, output_field=FloatField()))
+
+
+def filter_near(queryset, latitude, longitude, radius_km):
+    """
+    Restrict a Property queryset to rows within ``radius_km`` of the point and
+    annotate each with ``distance`` (km).
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    south, north = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180 or south <= -90 or north >= 90:
+        west, east = -180.0, 180.0
+    else:
+        lng_delta = radius_km / (KM_PER_DEGREE * cos_lat)
+        west = (longitude - lng_delta + 540) % 360 - 180
+        east = (longitude + lng_delta + 540) % 360 - 180
+    queryset = filter_bbox(queryset, south, west, north, east)
+    return queryset.annotate(
+        distance=distance_expression(latitude, longitude)
+    ).filter(distance__lte=radius_km)
+
+
+def parse_point(value):
+    """Parse a ``lat,lng`` query parameter."""
+    try:
+        latitude, longitude = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValidationError({'near': 'Expected "lat,lng".'})
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValidationError({'near': 'Coordinates out of range.'})
+    return latitude, longitude
+
+
+def parse_bbox(value):
+    """Parse a ``west,south,east,north`` query parameter (GeoJSON order)."""
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValidationError({'bbox': 'Expected "west,south,east,north".'})
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValidationError({'bbox': 'Coordinates out of range.'})
+    return south, west, north, east
+
+
+def parse_radius(value, default=10.0):
+    if not value:
+        return default
+    try:
+        radius = float(value)
+    except ValueError:
+        raise ValidationError({'radius_km': 'Expected a number.'})
+    if radius <= 0:
+        raise ValidationError({'radius_km': 'Must be positive.'})
+    return radius
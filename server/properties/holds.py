@@ -0,0 +1,87 @@
+"""
+Expiry of pending bookings.
+
+A pending booking holds its nights in the ``RoomNight`` ledger
+(inventory.py). A checkout that is abandoned would otherwise hold them
+forever. ``expire_holds`` moves every booking pending for longer than
+``BOOKING_HOLD_TTL_MINUTES`` to ``expired``, which holds nothing.
+
+The sweep works in batches, each in one transaction:
+
+1. Read the ids and stays of the oldest stale holds. This is a range scan of
+   the ``(status, created_at)`` index, locked ``FOR UPDATE SKIP LOCKED``
+   where the database supports it, so a booking being confirmed right now is
+   left for the next sweep.
+2. Mark them all with a single ``UPDATE``, still conditional on
+   ``status='pending'``. Without row locks (SQLite) a booking can be
+   confirmed or cancelled after it was read; it is left alone, and if the
+   row count falls short the batch is narrowed to the rows that changed.
+3. Give their nights back with ``inventory.release_many``. It issues one
+   UPDATE per room type and amount, not one per booking.
+
+Bookings are never loaded as models or saved. ``Booking.save``,
+``full_clean`` and the per-booking ledger updates are all skipped, so a sweep
+of thousands of holds costs a handful of statements.
+
+Sweeps run from the ``expire_booking_holds`` command (cron, or ``--every``
+as a long-running sweeper). ``schedule_sweep`` also queues one in the
+background after a booking is made, at most every
+``BOOKING_HOLD_SWEEP_SECONDS``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import inventory, tasks
+from .models import Booking
+
+BATCH_SIZE = 500
+SWEEP_CACHE_KEY = 'booking-holds:sweep-scheduled'
+
+
+def hold_ttl():
+    return timedelta(minutes=getattr(settings, 'BOOKING_HOLD_TTL_MINUTES', 30))
+
+
+def stale_holds(now=None):
+    """Pending bookings created before the hold TTL, oldest first."""
+    cutoff = (now or timezone.now()) - hold_ttl()
+    return Booking.objects.filter(status='pending', created_at__lt=cutoff).order_by('created_at')
+
+
+def expire_holds(now=None, batch_size=BATCH_SIZE):
+    """Expire stale pending bookings and free their nights. Returns how many."""
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            read = list(
+                stale_holds(now).select_for_update(skip_locked=True).values_list(
+                    'pk', 'room_type_id', 'check_in_date', 'check_out_date', 'guest_count'
+                )[:batch_size]
+            )
+            if not read:
+                break
+            pks = [row[0] for row in read]
+            batch = read
+            updated = Booking.objects.filter(pk__in=pks, status='pending').update(status='expired', updated_at=now)
+            if updated < len(read):
+                # Some left 'pending' since the read; release only the rows expired here
+                changed = set(
+                    Booking.objects.filter(pk__in=pks, status='expired', updated_at=now).values_list('pk', flat=True)
+                )
+                batch = [row for row in read if row[0] in changed]
+            inventory.release_many(row[1:] for row in batch)
+        expired += len(batch)
+        if len(read) < batch_size:
+            break
+    return expired
+
+
+def schedule_sweep():
+    """Queue ``expire_holds`` in the background unless one was queued recently."""
+    if cache.add(SWEEP_CACHE_KEY, True, getattr(settings, 'BOOKING_HOLD_SWEEP_SECONDS', 60)):
+        tasks.enqueue(expire_holds)
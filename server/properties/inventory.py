@@ -0,0 +1,143 @@
+"""
+Per-night room inventory.
+
+``RoomNight`` holds, for each room type and date, how many units are booked.
+A stay is available when every night of it has ``booked + units <= quantity``.
+That check reads one row per night, however many bookings overlap the stay.
+
+``reserve`` books the nights with a single conditional UPDATE:
+
+    UPDATE room_night SET booked = booked + units
+     WHERE room_type_id = %s AND date IN (...) AND booked <= quantity - units
+
+If fewer rows match than there are nights, a night is full and the
+transaction is rolled back. The condition is checked by the database while
+it holds the row locks, so two concurrent bookings cannot both take the last
+room. There is no read-check-write window.
+
+Pending and confirmed bookings hold inventory (``HOLDING_STATUSES``).
+``Booking.save`` calls ``booking_saved`` in the same transaction as the row
+write. It reserves or releases nights when a booking is created, changes
+status, or moves to other dates, room type or guest count. Deletes release
+through signals.py. As in the availability check this replaces, each guest
+takes one unit of ``RoomType.quantity``.
+"""
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+HOLDING_STATUSES = ('pending', 'confirmed')
+BATCH_SIZE = 1000
+
+
+class Unavailable(ValidationError):
+    """Some night of the stay has fewer free units than requested."""
+
+    def __init__(self, message='Not enough rooms available for the selected dates.'):
+        super().__init__(message, code='unavailable')
+
+
+def nights(check_in, check_out):
+    """Dates of the nights of a stay: check-in up to, not including, check-out."""
+    return [check_in + timedelta(days=offset) for offset in range((check_out - check_in).days)]
+
+
+def units(booking):
+    return booking.guest_count
+
+
+def holds(booking):
+    return booking is not None and booking.status in HOLDING_STATUSES
+
+
+def is_available(room_type, check_in, check_out, requested=1):
+    """Whether every night of the stay has ``requested`` free units, one row read per night."""
+    from .models import RoomNight
+
+    stay = nights(check_in, check_out)
+    if requested > room_type.quantity:
+        return False
+    full = RoomNight.objects.filter(
+        room_type=room_type, date__in=stay, booked__gt=room_type.quantity - requested
+    )
+    return bool(stay) and not full.exists()
+
+
+def reserve(room_type, check_in, check_out, requested):
+    """Take ``requested`` units on every night of the stay, or raise ``Unavailable``."""
+    from .models import RoomNight
+
+    stay = nights(check_in, check_out)
+    if requested > room_type.quantity:
+        raise Unavailable()
+    with transaction.atomic():
+        RoomNight.objects.bulk_create(
+            [RoomNight(room_type=room_type, date=date) for date in stay], ignore_conflicts=True
+        )
+        taken = RoomNight.objects.filter(
+            room_type=room_type, date__in=stay, booked__lte=room_type.quantity - requested
+        ).update(booked=F('booked') + requested)
+        if taken != len(stay):
+            # Leaving the block with an error rolls back the nights that did fit
+            raise Unavailable()
+
+
+def release(room_type_id, check_in, check_out, released):
+    """Give back ``released`` units on every night of the stay."""
+    from .models import RoomNight
+
+    RoomNight.objects.filter(
+        room_type_id=room_type_id, date__in=nights(check_in, check_out), booked__gte=released
+    ).update(booked=F('booked') - released)
+
+
+def release_many(stays):
+    """
+    Give back the nights of many ``(room_type_id, check_in, check_out, units)``
+    stays. Units are summed per night first, then one UPDATE is issued per room
+    type and amount, however many stays share it.
+    """
+    from .models import RoomNight
+
+    released = {}
+    for room_type_id, check_in, check_out, count in stays:
+        for date in nights(check_in, check_out):
+            released[room_type_id, date] = released.get((room_type_id, date), 0) + count
+    dates = {}
+    for (room_type_id, date), count in released.items():
+        dates.setdefault((room_type_id, count), []).append(date)
+    for (room_type_id, count), group in dates.items():
+        for start in range(0, len(group), BATCH_SIZE):
+            RoomNight.objects.filter(
+                room_type_id=room_type_id, date__in=group[start:start + BATCH_SIZE], booked__gte=count
+            ).update(booked=F('booked') - count)
+
+
+def _stay(booking):
+    return booking.room_type_id, booking.check_in_date, booking.check_out_date, units(booking)
+
+
+def booking_saved(booking):
+    """
+    Bring the ledger in step with ``booking`` before it is written. Must run
+    in the transaction that saves the booking; raises ``Unavailable`` when
+    the new stay does not fit.
+    """
+    from .models import Booking
+
+    previous = None
+    if booking.pk is not None:
+        previous = Booking.objects.select_for_update().filter(pk=booking.pk).first()
+    if holds(previous) and holds(booking) and _stay(previous) == _stay(booking):
+        return
+    if holds(previous):
+        release(*_stay(previous))
+    if holds(booking):
+        reserve(booking.room_type, booking.check_in_date, booking.check_out_date, units(booking))
+
+
+def booking_deleted(booking):
+    if holds(booking):
+        release(*_stay(booking))
@@ -0,0 +1,24 @@
+"""
+Batch loading helpers for property serialization.
+
+The serializers read related rows through ``.all()`` so that the caches filled
+here are reused, keeping a page of properties to a fixed number of queries no
+matter how many rows it holds.
+"""
+from django.contrib.auth.models import Group
+from django.db.models import Prefetch
+
+
+def property_owner_prefetches():
+    """Prefetches the nested owner serializer needs (groups for its role)."""
+    return [Prefetch('owner__groups', queryset=Group.objects.only('id', 'name'))]
+
+
+def property_page_prefetches():
+    """Prefetches needed to serialize a page of properties."""
+    return ['images', 'amenities'] + property_owner_prefetches()
+
+
+def with_page_relations(queryset):
+    """Attach owners, images, amenities and owner roles to a property queryset."""
+    return queryset.select_related('owner').prefetch_related(*property_page_prefetches())
@@ -0,0 +1,124 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from properties import quotes
+from properties.management.synthetic import benchmark_owner
+from properties.models import Booking, Hotel, RoomType
+from properties.views import BookingViewSet
+
+
+class Command(BaseCommand):
+    help = 'Hammers one room type with booking creates from many threads and reports bookings/sec and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=25, help='Creates per thread')
+        parser.add_argument('--quantity', type=int, default=200, help='Units of the room type')
+        parser.add_argument('--nights', type=int, default=3, help='Distinct check-in days the stays spread over')
+        parser.add_argument('--retries', type=int, default=5, help='BOOKING_CREATE_RETRIES for the run')
+        parser.add_argument(
+            '--resend', type=float, default=0.1,
+            help='Share of creates sent again with the same Idempotency-Key'
+        )
+
+    def handle(self, *args, **options):
+        # Worker threads use their own connections, so the rows are committed
+        # and removed at the end rather than rolled back
+        owner = benchmark_owner()
+        hotel = Hotel.objects.create(
+            name='Benchmark Hotel', slug=f'benchmark-hotel-{uuid.uuid4().hex[:8]}', description='Synthetic hotel',
+            address='Benchmark road', city='Nairobi', country='Kenya', star_rating=3, manager=owner,
+        )
+        room_type = RoomType.objects.create(
+            hotel=hotel, name='Flash sale', description='Synthetic room', max_guests=2,
+            price_per_night='99.00', quantity=options['quantity'],
+        )
+        try:
+            with override_settings(BOOKING_CREATE_RETRIES=options['retries']):
+                self.run(owner, room_type, options)
+        finally:
+            Booking.objects.filter(room_type=room_type).delete()
+            hotel.delete()
+            owner.delete()
+
+    def run(self, owner, room_type, options):
+        check_in = timezone.now().date() + timedelta(days=30)
+        stays = [
+            {
+                'room_type': room_type.pk, 'check_in': check_in + timedelta(days=day),
+                'check_out': check_in + timedelta(days=day + 2), 'guests': 1,
+            }
+            for day in range(options['nights'])
+        ]
+        quotes.quote_stays(stays)
+
+        factory = APIRequestFactory()
+        view = BookingViewSet.as_view({'post': 'create'})
+        latencies, codes = [], {}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'])
+        resend_every = round(1 / options['resend']) if options['resend'] > 0 else 0
+
+        def post(stay, key):
+            request = factory.post('/bookings/', {
+                'room_type': stay['room_type'], 'check_in_date': stay['check_in'],
+                'check_out_date': stay['check_out'], 'guest_count': 1,
+            }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+            force_authenticate(request, user=owner)
+            start = time.perf_counter()
+            response = view(request)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                codes[response.status_code] = codes.get(response.status_code, 0) + 1
+
+        def worker(index):
+            barrier.wait()
+            try:
+                for number in range(options['requests']):
+                    key = f'{index}-{number}'
+                    stay = stays[(index + number) % len(stays)]
+                    post(stay, key)
+                    if resend_every and number % resend_every == 0:
+                        post(stay, key)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        booked = Booking.objects.filter(room_type=room_type).count()
+        fullest = max(
+            Booking.objects.filter(
+                room_type=room_type, check_in_date__lte=night, check_out_date__gt=night
+            ).count()
+            for night in (check_in + timedelta(days=day) for day in range(options['nights'] + 1))
+        )
+        self.stdout.write(
+            f"{options['threads']} threads x {options['requests']} creates on one room type "
+            f"({options['quantity']} units, {options['retries']} retries) in {elapsed:.2f}s"
+        )
+        self.stdout.write(f"Responses: {', '.join(f'{code}: {count}' for code, count in sorted(codes.items()))}")
+        self.stdout.write(
+            f"Bookings/sec: {booked / elapsed:.1f}  p50: {self.percentile(latencies, 50) * 1000:.1f}ms  "
+            f"p99: {self.percentile(latencies, 99) * 1000:.1f}ms  max: {latencies[-1] * 1000:.1f}ms"
+        )
+        self.stdout.write(f"Bookings: {booked}, fullest night: {fullest} of {options['quantity']} units")
+
+    def percentile(self, ordered, percent):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
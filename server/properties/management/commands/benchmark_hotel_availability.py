@@ -0,0 +1,123 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from properties import inventory
+from properties.availability import filter_available
+from properties.management.synthetic import CITIES, WORDS, benchmark_owner, rolled_back
+from properties.models import Hotel, RoomNight, RoomType
+
+
+class Command(BaseCommand):
+    help = 'Times the set-wise hotel availability search against per-room-type checks on synthetic hotels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotels', type=int, default=5_000)
+        parser.add_argument('--room-types', type=int, default=20, help='Room types per hotel')
+        parser.add_argument('--days', type=int, default=21, help='Days of booked nights to generate')
+        parser.add_argument('--occupancy', type=float, default=0.6, help='Share of room nights with bookings')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--naive-sample', type=int, default=100,
+            help='Hotels to check one room type at a time, extrapolated to all hotels'
+        )
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            start = time.perf_counter()
+            hotel_ids = self.make_hotels(options)
+            self.stdout.write(
+                f"Created {len(hotel_ids)} hotels x {options['room_types']} room types and "
+                f"{RoomNight.objects.count()} booked room nights in {time.perf_counter() - start:.1f}s"
+            )
+            today = timezone.now().date()
+            hotels = Hotel.objects.filter(is_active=True).order_by('-created_at')
+
+            self.stdout.write(
+                f"{'stay':<22} {'queries':>7} {'page ms':>8} {'count ms':>9} {'all ms':>7} "
+                f"{'hotels':>7} {'naive s':>8} {'speed-up':>9}"
+            )
+            for offset, nights, guests in ((1, 1, 1), (2, 3, 2), (3, 7, 2), (5, 5, 4)):
+                check_in = today + timedelta(days=offset)
+                check_out = check_in + timedelta(days=nights)
+                queryset = filter_available(hotels, check_in, check_out, guests)
+                with CaptureQueriesContext(connection) as queries:
+                    list(queryset[:12])
+                page = self.best(lambda: list(queryset[:12]), options['repeat'])
+                count = self.best(queryset.count, options['repeat'])
+                every = self.best(lambda: list(queryset.values_list('pk', 'cheapest_price')), options['repeat'])
+                matches = queryset.count()
+                naive = self.naive(hotel_ids[:options['naive_sample']], check_in, check_out, guests)
+                naive_total = naive * len(hotel_ids) / max(1, min(len(hotel_ids), options['naive_sample']))
+                self.stdout.write(
+                    f"{f'+{offset}d {nights}n {guests}g':<22} {len(queries):>7} {page * 1000:>8.1f} "
+                    f"{count * 1000:>9.1f} {every * 1000:>7.1f} {matches:>7} {naive_total:>8.1f} "
+                    f"{naive_total / every if every else 0:>8.0f}x"
+                )
+                reset_queries()
+
+    def make_hotels(self, options, seed=42):
+        rng = random.Random(seed)
+        manager = benchmark_owner()
+        hotels = [
+            Hotel(
+                name=' '.join(rng.sample(WORDS, 2)).title(), slug=f'synthetic-hotel-{seed}-{index}',
+                description='Synthetic hotel', address='Benchmark road', city=city, country=country,
+                star_rating=rng.randint(1, 5), manager=manager,
+            )
+            for index, (city, country, _, _) in enumerate(rng.choice(CITIES) for _ in range(options['hotels']))
+        ]
+        Hotel.objects.bulk_create(hotels, batch_size=2000)
+        hotel_ids = list(Hotel.objects.filter(manager=manager).order_by('pk').values_list('pk', flat=True))
+
+        room_types = [
+            RoomType(
+                hotel_id=hotel_id, name=f'Room {number}', description='Synthetic room',
+                max_guests=rng.randint(1, 4), price_per_night=Decimal(rng.randrange(2_000, 60_000)) / 100,
+                quantity=rng.randint(1, 10),
+            )
+            for hotel_id in hotel_ids for number in range(options['room_types'])
+        ]
+        RoomType.objects.bulk_create(room_types, batch_size=2000)
+
+        today = timezone.now().date()
+        batch = []
+        for room_type_id, quantity in RoomType.objects.filter(hotel__manager=manager).values_list('pk', 'quantity'):
+            for day in range(options['days']):
+                if rng.random() < options['occupancy']:
+                    batch.append(RoomNight(
+                        room_type_id=room_type_id, date=today + timedelta(days=day),
+                        booked=rng.randint(1, quantity),
+                    ))
+            if len(batch) >= 5000:
+                RoomNight.objects.bulk_create(batch)
+                batch = []
+        RoomNight.objects.bulk_create(batch)
+        return hotel_ids
+
+    def naive(self, hotel_ids, check_in, check_out, guests):
+        """Per hotel, per room type: the requests a client had to make before."""
+        start = time.perf_counter()
+        for hotel_id in hotel_ids:
+            prices = [
+                room_type.price_per_night
+                for room_type in RoomType.objects.filter(hotel_id=hotel_id, is_active=True)
+                if room_type.max_guests >= guests and inventory.is_available(room_type, check_in, check_out, guests)
+            ]
+            min(prices, default=None)
+        return time.perf_counter() - start
+
+    def best(self, run, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
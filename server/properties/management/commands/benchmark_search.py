@@ -0,0 +1,69 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from properties.filters import PropertySearchFilter
+from properties.management.synthetic import (
+    benchmark_owner, make_synthetic_properties, rolled_back
+)
+from properties.models import Property
+from properties.search import rebuild_search_index, search_index_available
+from properties.views import PropertyViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compares the FTS5 property search with the icontains SearchFilter on synthetic listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--query', action='append', dest='queries',
+            help='Search string to time (may be given several times)'
+        )
+
+    def handle(self, *args, **options):
+        if not search_index_available():
+            self.stderr.write('The FTS5 search index is not available on this database.')
+            return
+        queries = options['queries'] or ['villa', 'ocean view', 'lux', 'penthouse nairobi', 'no-such-word']
+        view = SimpleNamespace(search_fields=PropertyViewSet.search_fields)
+        factory = APIRequestFactory()
+
+        with rolled_back():
+            self.stdout.write(f"Creating {options['listings']} synthetic listings...")
+            make_synthetic_properties(benchmark_owner(), options['listings'])
+            rebuild_search_index()
+            base = Property.objects.filter(is_published=True).order_by('-created_at')
+
+            self.stdout.write(f"{'query':<20} {'icontains ms':>13} {'fts5 ms':>9} {'speed-up':>9} {'matches':>8}")
+            for query in queries:
+                request = Request(factory.get('/', {'search': query}))
+                icontains = self.time_query(
+                    lambda: filters.SearchFilter().filter_queryset(request, base, view), options['repeat']
+                )
+                fts, matches = self.time_query(
+                    lambda: PropertySearchFilter().filter_queryset(request, base, view), options['repeat'],
+                    count=True
+                )
+                self.stdout.write(
+                    f'{query:<20} {icontains * 1000:>13.1f} {fts * 1000:>9.1f} '
+                    f'{icontains / fts if fts else 0:>8.1f}x {matches:>8}'
+                )
+
+    def time_query(self, build, repeat, count=False):
+        """Best wall time for fetching the first page plus the match count."""
+        best = None
+        matches = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset = build()
+            list(queryset[:12])
+            matches = queryset.count()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return (best, matches) if count else best
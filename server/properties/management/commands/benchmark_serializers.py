@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from properties.fast_serializers import FastListSerializer
+from properties.loaders import with_page_relations
+from properties.management.synthetic import (
+    benchmark_owner, make_synthetic_properties, rolled_back
+)
+from properties.models import Property
+from properties.serializers import PropertySerializer
+
+
+class Command(BaseCommand):
+    help = 'Compares PropertySerializer(many=True) with the compiled FastListSerializer per 1,000 rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        context = {'request': Request(APIRequestFactory().get('/'))}
+
+        with rolled_back():
+            self.stdout.write(f"Creating {options['rows']} synthetic listings...")
+            make_synthetic_properties(benchmark_owner(), options['rows'])
+            # Load once so only serialization is timed
+            rows = list(with_page_relations(Property.objects.order_by('id')))
+
+            slow = self.time(
+                lambda: PropertySerializer(rows, many=True, context=context).data, options['repeat']
+            )
+            fast = self.time(
+                lambda: FastListSerializer(rows, child=PropertySerializer(context=context), context=context).data,
+                options['repeat']
+            )
+            per_thousand = 1000 / max(len(rows), 1)
+            self.stdout.write(f"{'serializer':<22} {'ms / 1,000 rows':>16}")
+            self.stdout.write(f"{'PropertySerializer':<22} {slow * per_thousand * 1000:>16.1f}")
+            self.stdout.write(f"{'FastListSerializer':<22} {fast * per_thousand * 1000:>16.1f}")
+            self.stdout.write(f'speed-up: {slow / fast if fast else 0:.1f}x')
+
+    def time(self, serialize, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            serialize()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
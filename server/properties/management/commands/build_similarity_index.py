@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from properties.similarity import build_similarity_index, refresh_stale
+
+
+class Command(BaseCommand):
+    help = 'Builds the nearest-neighbour index used by the similar properties endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale', action='store_true',
+            help='Only refresh lists queued by recent changes instead of rebuilding'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['stale']:
+            count = refresh_stale()
+            self.stdout.write(f'Refreshed {count} neighbour lists')
+        else:
+            count = build_similarity_index()
+            self.stdout.write(f'Indexed {count} published properties')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - start:.2f}s'))
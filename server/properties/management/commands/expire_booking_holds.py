@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from properties.holds import expire_holds
+
+
+class Command(BaseCommand):
+    help = 'Expires pending bookings older than BOOKING_HOLD_TTL_MINUTES and frees their rooms'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=int, default=None,
+            help='Keep running, sweeping every this many seconds'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = expire_holds()
+            self.stdout.write(self.style.SUCCESS(f'Expired {count} pending bookings'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from properties import derivatives
+
+
+def _generate_in_worker(label, pk, force):
+    try:
+        return derivatives.generate(label, pk, force=force)
+    finally:
+        # Each worker thread holds its own connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Backfills thumb/card/full JPEG and WebP renditions of stored images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', choices=sorted(derivatives.SOURCES), action='append',
+            help='Only this model (repeatable); all image models by default'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Threads rendering in parallel; 1 renders inline'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Render again even where current derivatives exist'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        labels = options['model'] or list(derivatives.SOURCES)
+        force = options['force']
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for label in labels:
+                model = apps.get_model(label)
+                image_field, derivatives_field = derivatives.SOURCES[label]
+                pending = [
+                    pk for pk, name, current in model.objects.exclude(**{image_field: ''})
+                    .exclude(**{f'{image_field}__isnull': True})
+                    .values_list('pk', image_field, derivatives_field).iterator()
+                    if force or not current or current.get('source') != name
+                ]
+                if options['workers'] > 1:
+                    results = pool.map(lambda pk: _generate_in_worker(label, pk, force), pending)
+                else:
+                    results = (derivatives.generate(label, pk, force=force) for pk in pending)
+                generated = sum(results)
+                self.stdout.write(f'{label}: {generated} of {len(pending)} pending images updated')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - start:.2f}s'))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from properties.uploads import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Deletes resumable uploads (and their parts on disk) that have been idle too long'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=None,
+            help='Idle time after which an upload is dropped (default CHUNKED_UPLOAD_EXPIRY_HOURS)'
+        )
+
+    def handle(self, *args, **options):
+        max_age = timedelta(hours=options['hours']) if options['hours'] is not None else None
+        count = purge_expired(max_age)
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} chunked uploads'))
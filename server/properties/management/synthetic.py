@@ -0,0 +1,91 @@
+"""
+Synthetic data helpers shared by the benchmark management commands.
+
+Benchmarks run inside a transaction that is always rolled back, so they can be
+pointed at a development database without leaving rows behind.
+"""
+import random
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from properties import geo
+from properties.models import Property
+
+User = get_user_model()
+
+CITIES = [
+    ('Nairobi', 'Kenya', -1.2864, 36.8172), ('Mombasa', 'Kenya', -4.0435, 39.6682),
+    ('Malindi', 'Kenya', -3.2175, 40.1191), ('Lagos', 'Nigeria', 6.5244, 3.3792),
+    ('Abuja', 'Nigeria', 9.0765, 7.3986), ('Accra', 'Ghana', 5.6037, -0.1870),
+    ('Kampala', 'Uganda', 0.3476, 32.5825), ('Kigali', 'Rwanda', -1.9441, 30.0619),
+]
+WORDS = [
+    'luxury', 'modern', 'spacious', 'cozy', 'villa', 'apartment', 'garden', 'ocean',
+    'view', 'pool', 'beach', 'family', 'quiet', 'secure', 'parking', 'balcony',
+    'furnished', 'penthouse', 'studio', 'duplex', 'bungalow', 'terrace', 'lake',
+    'mountain', 'central', 'renovated', 'elegant', 'bright', 'private', 'estate',
+]
+STREETS = ['Ocean Drive', 'Westlands Road', 'Lekki Phase 1', 'Ngong Road', 'Kilimani Close']
+
+
+class Rollback(Exception):
+    """Raised to unwind the benchmark transaction."""
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction and discard everything it wrote."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def benchmark_owner():
+    return User.objects.create_user(
+        email=f'benchmark-{random.getrandbits(32)}@example.com',
+        password=None,
+        first_name='Benchmark',
+        last_name='Owner'
+    )
+
+
+def make_synthetic_properties(owner, count, batch_size=2000, seed=42):
+    """Bulk insert ``count`` randomised listings owned by ``owner``."""
+    rng = random.Random(seed)
+    property_types = [choice for choice, _ in Property.PROPERTY_TYPES]
+    listing_types = [choice for choice, _ in Property.LISTING_TYPES]
+    batch = []
+    for index in range(count):
+        city, country, lat, lng = rng.choice(CITIES)
+        title_words = rng.sample(WORDS, 3)
+        latitude = Decimal(str(round(lat + rng.uniform(-0.25, 0.25), 6)))
+        longitude = Decimal(str(round(lng + rng.uniform(-0.25, 0.25), 6)))
+        batch.append(Property(
+            owner=owner,
+            title=' '.join(title_words).title(),
+            slug=f'synthetic-{seed}-{index}',
+            description=' '.join(rng.choices(WORDS, k=60)),
+            property_type=rng.choice(property_types),
+            listing_type=rng.choice(listing_types),
+            price=Decimal(rng.randrange(20_000, 5_000_000, 500)),
+            bedrooms=rng.randint(0, 6),
+            bathrooms=rng.randint(1, 4),
+            area=Decimal(rng.randrange(2_000, 80_000)) / 100,
+            address=f'{rng.randint(1, 999)} {rng.choice(STREETS)}',
+            city=city,
+            country=country,
+            latitude=latitude,
+            longitude=longitude,
+            geo_cell=geo.cell_for(latitude, longitude),
+        ))
+        if len(batch) >= batch_size:
+            Property.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Property.objects.bulk_create(batch)
@@ -0,0 +1,37 @@
+from django.db import migrations, OperationalError
+
+SEARCH_TABLE = 'properties_property_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "title, description, address, city, country, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except OperationalError:
+        # SQLite built without FTS5: search keeps using icontains
+        return
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, description, address, city, country) "
+        "SELECT id, title, description, address, city, country FROM properties_property"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:43
+
+import math
+
+from django.db import migrations, models
+
+# The grid as of this migration (properties/geo.py), frozen here so later
+# changes to the live module cannot change what this backfill writes
+CELL_DEGREES = 0.1
+GRID_COLUMNS = int(round(360 / CELL_DEGREES))
+GRID_ROWS = int(round(180 / CELL_DEGREES))
+
+
+def cell_for(latitude, longitude):
+    row = min(max(int(math.floor((float(latitude) + 90) / CELL_DEGREES)), 0), GRID_ROWS - 1)
+    column = min(max(int(math.floor((float(longitude) + 180) / CELL_DEGREES)), 0), GRID_COLUMNS - 1)
+    return row * GRID_COLUMNS + column
+
+
+def backfill_geo_cells(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    batch = []
+    for property in Property.objects.exclude(latitude=None).exclude(longitude=None).only(
+        'id', 'latitude', 'longitude'
+    ).iterator():
+        property.geo_cell = cell_for(property.latitude, property.longitude)
+        batch.append(property)
+        if len(batch) >= 1000:
+            Property.objects.bulk_update(batch, ['geo_cell'])
+            batch = []
+    if batch:
+        Property.objects.bulk_update(batch, ['geo_cell'])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0002_property_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="geo_cell",
+            field=models.PositiveIntegerField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Spatial grid cell derived from latitude/longitude",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(backfill_geo_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0003_property_geo_cell"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["created_at", "id"], name="booking_created_keyset"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hotel",
+            index=models.Index(
+                fields=["created_at", "id"], name="hotel_created_keyset"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hotel",
+            index=models.Index(
+                fields=["star_rating", "id"], name="hotel_rating_keyset"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["created_at", "id"], name="property_created_keyset"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(fields=["price", "id"], name="property_price_keyset"),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(fields=["area", "id"], name="property_area_keyset"),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0004_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarityRefresh",
+            fields=[
+                (
+                    "property",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="properties.property",
+                    ),
+                ),
+                ("marked_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SimilarProperty",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField()),
+                (
+                    "neighbour",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbour_of",
+                        to="properties.property",
+                    ),
+                ),
+                (
+                    "property",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbours",
+                        to="properties.property",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["property", "rank"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="similarproperty",
+            constraint=models.UniqueConstraint(
+                fields=("property", "rank"), name="unique_similar_property_rank"
+            ),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:59
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Self-contained, so later changes to properties.amenity_bitmap cannot alter it
+BITS = 63
+BATCH_SIZE = 500
+
+
+def backfill_amenity_bitmaps(apps, schema_editor):
+    Amenity = apps.get_model('properties', 'Amenity')
+    bits = {}
+    for bit, amenity in enumerate(Amenity.objects.order_by('id')[:BITS]):
+        amenity.bit = bit
+        amenity.save(update_fields=['bit'])
+        bits[amenity.pk] = bit
+    for model_name in ('Property', 'Hotel', 'RoomType'):
+        model = apps.get_model('properties', model_name)
+        field = model._meta.get_field('amenities')
+        owner_column = f'{field.m2m_field_name()}_id'
+        masks = defaultdict(int)
+        for owner_id, amenity_id in field.remote_field.through.objects.values_list(owner_column, 'amenity_id'):
+            if amenity_id in bits:
+                masks[owner_id] |= 1 << bits[amenity_id]
+        groups = defaultdict(list)
+        for owner_id, mask in masks.items():
+            groups[mask].append(owner_id)
+        for mask, owner_ids in groups.items():
+            for start in range(0, len(owner_ids), BATCH_SIZE):
+                model.objects.filter(pk__in=owner_ids[start:start + BATCH_SIZE]).update(amenity_mask=mask)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0005_property_similarity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="amenity",
+            name="bit",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                editable=False,
+                help_text="Position of this amenity in amenity_mask bitmaps",
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="hotel",
+            name="amenity_mask",
+            field=models.BigIntegerField(
+                default=0,
+                editable=False,
+                help_text="Bitmap of Amenity.bit values, see amenity_bitmap.py",
+            ),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="amenity_mask",
+            field=models.BigIntegerField(
+                default=0,
+                editable=False,
+                help_text="Bitmap of Amenity.bit values, see amenity_bitmap.py",
+            ),
+        ),
+        migrations.AddField(
+            model_name="roomtype",
+            name="amenity_mask",
+            field=models.BigIntegerField(
+                default=0,
+                editable=False,
+                help_text="Bitmap of Amenity.bit values, see amenity_bitmap.py",
+            ),
+        ),
+        migrations.RunPython(backfill_amenity_bitmaps, migrations.RunPython.noop),
+    ]
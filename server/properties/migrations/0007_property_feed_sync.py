@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0006_amenity_bitmap"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="external_id",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="The partner's id for this listing",
+                max_length=100,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="feed_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="Content hash of the feed record last applied",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="feed_source",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="Partner feed this listing is synced from, see api/feeds.py",
+                max_length=100,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="property",
+            constraint=models.UniqueConstraint(
+                fields=("feed_source", "external_id"), name="property_feed_external_id"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0007_property_feed_sync"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="featured_image_derivatives",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                help_text="Resized renditions of the featured image, see derivatives.py",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="propertyimage",
+            name="derivatives",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                help_text="Resized renditions of the image, see derivatives.py",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="roomimage",
+            name="derivatives",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                help_text="Resized renditions of the image, see derivatives.py",
+                null=True,
+            ),
+        ),
+    ]
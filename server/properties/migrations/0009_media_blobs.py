@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:17
+
+from django.db import migrations, models
+import properties.blobs
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0008_image_derivatives"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("sha256", models.CharField(db_index=True, max_length=64)),
+                ("size", models.PositiveBigIntegerField()),
+                ("references", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="blogpost",
+            name="featured_image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=properties.blobs.content_addressed_storage,
+                upload_to="blog/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="propertyimage",
+            name="image",
+            field=models.ImageField(
+                storage=properties.blobs.content_addressed_storage,
+                upload_to="properties/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="roomimage",
+            name="image",
+            field=models.ImageField(
+                storage=properties.blobs.content_addressed_storage, upload_to="rooms/"
+            ),
+        ),
+    ]
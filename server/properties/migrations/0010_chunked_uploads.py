@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("properties", "0009_media_blobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChunkedUpload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "purpose",
+                    models.CharField(
+                        choices=[
+                            ("feed", "Listing feed"),
+                            ("property_image", "Property image"),
+                            ("room_image", "Room type image"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("target", models.CharField(blank=True, max_length=255)),
+                ("filename", models.CharField(max_length=255)),
+                ("size", models.PositiveBigIntegerField()),
+                ("sha256", models.CharField(max_length=64)),
+                ("offset", models.PositiveBigIntegerField(default=0)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("uploading", "Uploading"), ("complete", "Complete")],
+                        default="uploading",
+                        max_length=20,
+                    ),
+                ),
+                ("result", models.JSONField(blank=True, editable=False, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunked_uploads",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
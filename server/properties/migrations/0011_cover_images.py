@@ -0,0 +1,117 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:23
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Self-contained, so later changes to properties.covers cannot alter it
+COVER_FIELDS = ('cover_image', 'cover_width', 'cover_height')
+BATCH_SIZE = 1000
+
+
+def cover_of(image):
+    if image is None or not image.image:
+        return {'cover_image': '', 'cover_width': None, 'cover_height': None}
+    derivatives = image.derivatives or {}
+    if derivatives.get('source') == image.image.name and 'renditions' in derivatives:
+        card = derivatives['renditions']['card']
+        return {'cover_image': card['jpeg'], 'cover_width': card['width'], 'cover_height': card['height']}
+    return {'cover_image': image.image.name, 'cover_width': None, 'cover_height': None}
+
+
+def image_covers(image_model, parent_field, ids, primary_only):
+    images = image_model.objects.filter(**{f'{parent_field}__in': ids})
+    if primary_only:
+        images = images.filter(is_primary=True)
+    chosen = {}
+    for image in images.order_by('-is_primary', 'pk').only(parent_field, 'image', 'derivatives', 'is_primary'):
+        chosen.setdefault(getattr(image, parent_field), image)
+    return {pk: cover_of(chosen.get(pk)) for pk in ids}
+
+
+def store(model, covers):
+    """Write the covers found; updated_at too, since the cover is part of the row's responses and ETag."""
+    now = timezone.now()
+    model.objects.bulk_update(
+        [model(pk=pk, updated_at=now, **cover) for pk, cover in covers.items() if cover['cover_image']],
+        [*COVER_FIELDS, 'updated_at'], batch_size=BATCH_SIZE,
+    )
+
+
+def backfill_covers(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    PropertyImage = apps.get_model('properties', 'PropertyImage')
+    Hotel = apps.get_model('properties', 'Hotel')
+    RoomType = apps.get_model('properties', 'RoomType')
+    RoomImage = apps.get_model('properties', 'RoomImage')
+
+    for model, image_model, parent_field, primary_only in (
+        (Property, PropertyImage, 'property_id', True),
+        (RoomType, RoomImage, 'room_type_id', False),
+    ):
+        ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            store(model, image_covers(image_model, parent_field, batch, primary_only))
+
+    # A hotel shows the cover of its first room type that has one
+    hotel_covers = {}
+    for hotel_id, *cover in RoomType.objects.exclude(cover_image='').order_by('pk').values_list(
+        'hotel_id', *COVER_FIELDS
+    ):
+        hotel_covers.setdefault(hotel_id, dict(zip(COVER_FIELDS, cover)))
+    store(Hotel, hotel_covers)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0010_chunked_uploads"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hotel",
+            name="cover_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="hotel",
+            name="cover_image",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="hotel",
+            name="cover_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="cover_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="cover_image",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="cover_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="roomtype",
+            name="cover_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="roomtype",
+            name="cover_image",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="roomtype",
+            name="cover_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_covers, migrations.RunPython.noop),
+    ]
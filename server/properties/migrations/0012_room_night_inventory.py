@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:25
+
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# As in properties/inventory.py when this migration was written
+HOLDING_STATUSES = ('pending', 'confirmed')
+BATCH_SIZE = 1000
+
+
+def backfill_room_nights(apps, schema_editor):
+    Booking = apps.get_model('properties', 'Booking')
+    RoomNight = apps.get_model('properties', 'RoomNight')
+
+    counts = {}
+    holding = Booking.objects.filter(status__in=HOLDING_STATUSES).values_list(
+        'room_type_id', 'check_in_date', 'check_out_date', 'guest_count'
+    )
+    for room_type_id, check_in, check_out, guest_count in holding.iterator():
+        for offset in range((check_out - check_in).days):
+            date = check_in + timedelta(days=offset)
+            counts[room_type_id, date] = counts.get((room_type_id, date), 0) + guest_count
+    RoomNight.objects.bulk_create(
+        [
+            RoomNight(room_type_id=room_type_id, date=date, booked=booked)
+            for (room_type_id, date), booked in counts.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0011_cover_images"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoomNight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("booked", models.PositiveIntegerField(default=0)),
+                (
+                    "room_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="nights",
+                        to="properties.roomtype",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="roomnight",
+            constraint=models.UniqueConstraint(
+                fields=("room_type", "date"), name="room_night_unique"
+            ),
+        ),
+        migrations.RunPython(backfill_room_nights, migrations.RunPython.noop),
+    ]
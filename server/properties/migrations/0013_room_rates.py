@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0012_room_night_inventory"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoomRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField()),
+                (
+                    "price_per_night",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                (
+                    "room_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rates",
+                        to="properties.roomtype",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["room_type", "start_date"], name="room_rate_start"
+                    )
+                ],
+            },
+        ),
+    ]
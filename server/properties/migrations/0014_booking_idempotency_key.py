@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0013_room_rates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="booking",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Idempotency-Key the booking was created with, see reservations.py",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="booking",
+            constraint=models.UniqueConstraint(
+                fields=("user", "idempotency_key"), name="booking_idempotency_key"
+            ),
+        ),
+    ]
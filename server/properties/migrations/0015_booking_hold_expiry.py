@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0014_booking_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="booking",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("confirmed", "Confirmed"),
+                    ("cancelled", "Cancelled"),
+                    ("completed", "Completed"),
+                    ("expired", "Expired"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["status", "created_at"], name="booking_status_created"
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+import hashlib
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import migrations
+
+# (app label, model, field) of every field kept in content-addressed storage
+MEDIA_FIELDS = [
+    ("properties", "PropertyImage", "image"),
+    ("properties", "RoomImage", "image"),
+    ("properties", "BlogPost", "featured_image"),
+    ("api", "UploadedFile", "file"),
+]
+HASH_CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 500
+
+
+def digest(name):
+    hasher = hashlib.sha256()
+    with default_storage.open(name, "rb") as content:
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def backfill_media_blobs(apps, schema_editor):
+    """
+    Count the rows using each file stored before reference counting. A file
+    without a MediaBlob is treated as unreferenced, so deleting any row that
+    shares it would otherwise remove it from under the others.
+    """
+    MediaBlob = apps.get_model("properties", "MediaBlob")
+
+    counts = Counter()
+    for app_label, model_name, field_name in MEDIA_FIELDS:
+        model = apps.get_model(app_label, model_name)
+        names = model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+        counts.update(names.values_list(field_name, flat=True).iterator())
+
+    names = list(counts)
+    for start in range(0, len(names), BATCH_SIZE):
+        batch = names[start:start + BATCH_SIZE]
+        # Files saved since 0009 already have blobs and are counted as they change
+        tracked = set(MediaBlob.objects.filter(name__in=batch).values_list("name", flat=True))
+        MediaBlob.objects.bulk_create([
+            MediaBlob(name=name, sha256=digest(name), size=default_storage.size(name), references=counts[name])
+            for name in batch
+            if name not in tracked and default_storage.exists(name)
+        ])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0015_booking_hold_expiry"),
+        ("api", "0002_uploadedfile_feed_summary"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_media_blobs, migrations.RunPython.noop),
+    ]
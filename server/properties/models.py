@@ -1,4 +1,6 @@
-from django.db import models
+import uuid
+
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -8,6 +10,9 @@ from django.utils.text import slugify
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 
+from . import geo, inventory
+from .blobs import content_addressed_storage
+
 # Get the User model from the accounts app
 User = get_user_model()
 
@@ -21,7 +26,16 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
 
-class Property(BaseModel):
+class CoverImageModel(models.Model):
+    """Cover image copied from the image rows so cards need no image query, see covers.py."""
+    cover_image = models.CharField(max_length=255, blank=True, editable=False)
+    cover_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    cover_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+class Property(CoverImageModel, BaseModel):
     PROPERTY_TYPES = [
         ('house', 'House'),
         ('apartment', 'Apartment'),
@@ -49,14 +63,45 @@ class Property(BaseModel):
     country = models.CharField(max_length=100)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geo_cell = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, db_index=True,
+        help_text='Spatial grid cell derived from latitude/longitude'
+    )
     is_featured = models.BooleanField(default=False)
     is_published = models.BooleanField(default=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='properties')
     amenities = models.ManyToManyField('Amenity', blank=True, related_name='properties')
+    amenity_mask = models.BigIntegerField(
+        default=0, editable=False,
+        help_text='Bitmap of Amenity.bit values, see amenity_bitmap.py'
+    )
+    feed_source = models.CharField(
+        max_length=100, blank=True, default='', editable=False,
+        help_text='Partner feed this listing is synced from, see api/feeds.py'
+    )
+    external_id = models.CharField(
+        max_length=100, null=True, blank=True, editable=False,
+        help_text="The partner's id for this listing"
+    )
+    feed_hash = models.CharField(
+        max_length=64, blank=True, default='', editable=False,
+        help_text='Content hash of the feed record last applied'
+    )
 
     class Meta:
         verbose_name_plural = 'Properties'
         ordering = ['-created_at']
+        # Keyset pagination seeks on (<ordering field>, id)
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='property_created_keyset'),
+            models.Index(fields=['price', 'id'], name='property_price_keyset'),
+            models.Index(fields=['area', 'id'], name='property_area_keyset'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['feed_source', 'external_id'], name='property_feed_external_id'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.city}"
@@ -72,6 +117,11 @@ class Property(BaseModel):
             while Property.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
                 self.slug = f"{original_slug}-{counter}"
                 counter += 1
+
+        self.geo_cell = geo.cell_for(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geo_cell'}
                 
         super().save(*args, **kwargs)
 
@@ -81,14 +131,82 @@ class Property(BaseModel):
 
 class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='properties/')
+    image = models.ImageField(upload_to='properties/', storage=content_addressed_storage)
     is_primary = models.BooleanField(default=False)
+    derivatives = models.JSONField(
+        null=True, blank=True, editable=False,
+        help_text='Resized renditions of the image, see derivatives.py'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Image for {self.property.title}"
 
-class Hotel(BaseModel):
+class MediaBlob(models.Model):
+    """A stored file shared by every upload with the same content, see blobs.py."""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
+
+class ChunkedUpload(models.Model):
+    """A file sent in pieces and assembled on local disk until it completes, see uploads.py."""
+    PURPOSE_CHOICES = (
+        ('feed', 'Listing feed'),
+        ('property_image', 'Property image'),
+        ('room_image', 'Room type image'),
+    )
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    # Property slug or room type id the finished image is attached to
+    target = models.CharField(max_length=255, blank=True)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    offset = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    result = models.JSONField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes)"
+
+class SimilarProperty(models.Model):
+    """A precomputed nearest neighbour of a property, see similarity.py."""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='neighbour_of')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['property', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'rank'], name='unique_similar_property_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.neighbour_id} is #{self.rank + 1} for {self.property_id}"
+
+class SimilarityRefresh(models.Model):
+    """A property whose neighbour lists need recomputing."""
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True)
+    marked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Refresh neighbours of {self.property_id}"
+
+class Hotel(CoverImageModel, BaseModel):
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=255, unique=True)
     description = models.TextField()
@@ -100,14 +218,24 @@ class Hotel(BaseModel):
     )
     manager = models.ForeignKey(User, on_delete=models.CASCADE, related_name='managed_hotels')
     amenities = models.ManyToManyField('Amenity', related_name='hotels')
+    amenity_mask = models.BigIntegerField(
+        default=0, editable=False,
+        help_text='Bitmap of Amenity.bit values, see amenity_bitmap.py'
+    )
     check_in_time = models.TimeField(default='14:00:00')
     check_out_time = models.TimeField(default='12:00:00')
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='hotel_created_keyset'),
+            models.Index(fields=['star_rating', 'id'], name='hotel_rating_keyset'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.city}"
 
-class RoomType(BaseModel):
+class RoomType(CoverImageModel, BaseModel):
     hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='room_types')
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -115,14 +243,22 @@ class RoomType(BaseModel):
     price_per_night = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField()
     amenities = models.ManyToManyField('Amenity', related_name='room_types')
+    amenity_mask = models.BigIntegerField(
+        default=0, editable=False,
+        help_text='Bitmap of Amenity.bit values, see amenity_bitmap.py'
+    )
 
     def __str__(self):
         return f"{self.name} - {self.hotel.name}"
 
 class RoomImage(models.Model):
     room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='rooms/')
+    image = models.ImageField(upload_to='rooms/', storage=content_addressed_storage)
     is_primary = models.BooleanField(default=False)
+    derivatives = models.JSONField(
+        null=True, blank=True, editable=False,
+        help_text='Resized renditions of the image, see derivatives.py'
+    )
 
     def __str__(self):
         return f"Image for {self.room_type.name}"
@@ -133,6 +269,8 @@ class Booking(BaseModel):
         ('confirmed', 'Confirmed'),
         ('cancelled', 'Cancelled'),
         ('completed', 'Completed'),
+        # A pending hold that ran past BOOKING_HOLD_TTL_MINUTES, see holds.py
+        ('expired', 'Expired'),
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
@@ -143,6 +281,19 @@ class Booking(BaseModel):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     guest_count = models.PositiveIntegerField(default=1)
     special_requests = models.TextField(blank=True)
+    idempotency_key = models.CharField(
+        max_length=64, null=True, blank=True, editable=False,
+        help_text='Idempotency-Key the booking was created with, see reservations.py'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='booking_created_keyset'),
+            models.Index(fields=['status', 'created_at'], name='booking_status_created'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='booking_idempotency_key'),
+        ]
 
     def clean(self):
         if self.check_out_date <= self.check_in_date:
@@ -153,14 +304,57 @@ class Booking(BaseModel):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Takes or gives back the nights in RoomNight; raises inventory.Unavailable
+            inventory.booking_saved(self)
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.email} - {self.room_type.name} ({self.check_in_date} to {self.check_out_date})"
 
+class RoomNight(models.Model):
+    """Units of a room type booked on one date, see inventory.py."""
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='nights')
+    date = models.DateField()
+    booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'date'], name='room_night_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type_id} on {self.date}: {self.booked} booked"
+
+class RoomRate(models.Model):
+    """Nightly price of a room type from ``start_date`` up to, not including, ``end_date``, see quotes.py."""
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='rates')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    price_per_night = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room_type', 'start_date'], name='room_rate_start'),
+        ]
+
+    def clean(self):
+        if self.end_date <= self.start_date:
+            raise ValidationError('End date must be after start date')
+
+    def __str__(self):
+        return f"{self.room_type_id} from {self.start_date} to {self.end_date}: {self.price_per_night}"
+
 class Amenity(BaseModel):
+    # Bits 0-62, so amenity masks stay positive in a signed 64-bit column
+    BITMAP_BITS = 63
+
     name = models.CharField(max_length=100, unique=True)
     icon = models.CharField(max_length=50, blank=True, help_text='Font Awesome icon class')
+    bit = models.PositiveSmallIntegerField(
+        null=True, blank=True, unique=True, editable=False,
+        help_text='Position of this amenity in amenity_mask bitmaps'
+    )
 
     class Meta:
         verbose_name_plural = 'Amenities'
@@ -168,6 +362,21 @@ class Amenity(BaseModel):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.bit is not None or self.pk is not None:
+            return super().save(*args, **kwargs)
+        while True:
+            # Take the lowest free bit, if any are left
+            taken = set(Amenity.objects.exclude(bit=None).values_list('bit', flat=True))
+            self.bit = next((bit for bit in range(self.BITMAP_BITS) if bit not in taken), None)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # A concurrent create took the same bit first; try the next free one
+                if self.bit is None or not Amenity.objects.filter(bit=self.bit).exists():
+                    raise
+
 class Inquiry(BaseModel):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='inquiries')
     name = models.CharField(max_length=200)
@@ -188,7 +397,13 @@ class BlogPost(BaseModel):
     content = models.TextField()
     excerpt = models.TextField(max_length=300)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_posts')
-    featured_image = models.ImageField(upload_to='blog/', blank=True, null=True)
+    featured_image = models.ImageField(
+        upload_to='blog/', storage=content_addressed_storage, blank=True, null=True
+    )
+    featured_image_derivatives = models.JSONField(
+        null=True, blank=True, editable=False,
+        help_text='Resized renditions of the featured image, see derivatives.py'
+    )
     is_published = models.BooleanField(default=False)
     published_date = models.DateTimeField(null=True, blank=True)
     tags = models.ManyToManyField('Tag', related_name='blog_posts')
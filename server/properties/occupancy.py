@@ -0,0 +1,117 @@
+"""
+Daily occupancy calendars of room types.
+
+``build_calendar`` gives, for each room type and each day of a window,
+the units booked and the units left. All the bookings that overlap the
+window are read in one query, as ``values_list`` tuples. Each booking is a
+difference array update: ``+units`` on its first night in the window and
+``-units`` on the day after its last. A cumulative sum along the days
+turns these into daily totals. ``np.add.at`` applies every booking at once,
+so the cost is one vectorised pass over the bookings plus one over the
+``room types x days`` grid. There is no Python loop over nights.
+
+Like the ledger in inventory.py, each guest takes one unit. Occupancy rates
+are exact: booked room nights over available room nights in the window.
+"""
+from datetime import timedelta
+
+import numpy as np
+from rest_framework.exceptions import ValidationError
+
+from .availability import parse_date
+from .inventory import HOLDING_STATUSES
+from .models import Booking
+
+MAX_DAYS = 366
+DEFAULT_DAYS = 30
+
+
+def parse_window(params, today):
+    """``(start, end)`` from ``?start=`` (default today) and ``?end=`` or ``?days=``, end exclusive."""
+    start = parse_date(params['start'], 'start') if params.get('start') else today
+    too_long = ValidationError({'end': f'The window must cover 1 to {MAX_DAYS} days.'})
+    if params.get('end'):
+        end = parse_date(params['end'], 'end')
+    else:
+        try:
+            days = int(params.get('days') or DEFAULT_DAYS)
+        except ValueError:
+            raise ValidationError({'days': 'Expected a number.'})
+        # Checked before building the timedelta, which overflows on huge values
+        if not 1 <= days <= MAX_DAYS:
+            raise too_long
+        try:
+            end = start + timedelta(days=days)
+        except OverflowError:
+            raise ValidationError({'end': 'The window ends after the last supported date.'})
+    if not 1 <= (end - start).days <= MAX_DAYS:
+        raise too_long
+    return start, end
+
+
+class Calendar:
+    """Booked and available units per room type (rows) and day (columns)."""
+
+    def __init__(self, room_types, start, end, booked):
+        self.room_types = list(room_types)
+        self.start, self.end = start, end
+        self.booked = booked
+        self.quantity = np.array([room_type.quantity for room_type in self.room_types], dtype=np.int64)
+        self.available = np.maximum(self.quantity[:, None] - booked, 0)
+
+    @property
+    def dates(self):
+        return [self.start + timedelta(days=day) for day in range(self.booked.shape[1])]
+
+    def occupancy_rate(self, rows=slice(None)):
+        """Booked share of the room nights of ``rows``, in percent."""
+        capacity = int(self.quantity[rows].sum()) * self.booked.shape[1]
+        if not capacity:
+            return 0.0
+        # Overbooked nights count as full
+        booked = np.minimum(self.booked[rows], self.quantity[rows, None]).sum()
+        return round(float(booked) * 100 / capacity, 2)
+
+    def as_dict(self):
+        return {
+            'start': self.start,
+            'end': self.end,
+            'dates': self.dates,
+            'occupancy_rate': self.occupancy_rate(),
+            'room_types': [
+                {
+                    'id': room_type.pk,
+                    'name': room_type.name,
+                    'quantity': room_type.quantity,
+                    'booked': self.booked[row].tolist(),
+                    'available': self.available[row].tolist(),
+                    'occupancy_rate': self.occupancy_rate(slice(row, row + 1)),
+                }
+                for row, room_type in enumerate(self.room_types)
+            ],
+        }
+
+
+def build_calendar(room_types, start, end, statuses=HOLDING_STATUSES):
+    """Calendar of ``room_types`` from ``start`` up to, not including, ``end``."""
+    room_types = list(room_types)
+    days = (end - start).days
+    rows = {room_type.pk: row for row, room_type in enumerate(room_types)}
+    bookings = list(Booking.objects.filter(
+        room_type_id__in=list(rows), status__in=statuses,
+        check_in_date__lt=end, check_out_date__gt=start,
+    ).values_list('room_type_id', 'check_in_date', 'check_out_date', 'guest_count'))
+
+    room_type_ids, check_ins, check_outs, units = zip(*bookings) if bookings else ((), (), (), ())
+    origin = np.datetime64(start, 'D')
+    first = np.clip((np.array(check_ins, dtype='datetime64[D]') - origin).astype(np.int64), 0, days)
+    stop = np.clip((np.array(check_outs, dtype='datetime64[D]') - origin).astype(np.int64), 0, days)
+    row_index = np.array([rows[pk] for pk in room_type_ids], dtype=np.int64)
+    units = np.array(units, dtype=np.int64)
+
+    # One spare column takes the -units of stays running past the window
+    difference = np.zeros((len(room_types), days + 1), dtype=np.int64)
+    np.add.at(difference, (row_index, first), units)
+    np.add.at(difference, (row_index, stop), -units)
+    booked = np.cumsum(difference[:, :days], axis=1)
+    return Calendar(room_types, start, end, booked)
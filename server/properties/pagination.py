@@ -0,0 +1,177 @@
+"""
+Opt-in keyset (cursor) pagination for list endpoints.
+
+Page-number pagination counts the whole filtered queryset and scans past
+OFFSET rows on every page. Keyset pagination instead remembers the sort value
+and id of the last row it returned and asks for rows strictly after that pair,
+so every page is a single ``LIMIT page_size + 1`` query over an index on
+``(<field>, id)`` and no COUNT is issued.
+
+Clients opt in with ``?pagination=cursor`` and then follow the ``next`` /
+``previous`` links, which carry an opaque ``?cursor=``.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def uses_keyset_pagination(request):
+    """True when the client asked for cursor pagination."""
+    if request is None:
+        return False
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or 'cursor' in params
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_param = 'ordering'
+    max_page_size = 100
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if cursor:
+            field, descending = cursor['field'], cursor['descending']
+            # Cursors come from the client, so they may only name the view's ordering fields
+            if field not in self.get_ordering_fields(view):
+                raise NotFound(self.invalid_cursor_message)
+        else:
+            field, descending = self.get_ordering(request, view)
+        self.field, self.descending = field, descending
+
+        if cursor:
+            # Rows after the cursor in the requested direction, or before it
+            # (walking backwards) for a "previous" link.
+            forwards = not cursor['reverse']
+            try:
+                value = queryset.model._meta.get_field(field).to_python(cursor['value'])
+                queryset = queryset.filter(self.position_filter(field, value, cursor['id'], descending == forwards))
+            except (DjangoValidationError, FieldDoesNotExist, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        else:
+            forwards = True
+
+        order = [field, 'id']
+        if descending == forwards:
+            order = [f'-{name}' for name in order]
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if forwards:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        else:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        self.page = rows
+        return rows
+
+    def position_filter(self, field, value, pk, descending):
+        """Rows strictly past ``(value, pk)`` in the given direction."""
+        lookup = 'lt' if descending else 'gt'
+        return Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk})
+
+    def get_ordering_fields(self, view):
+        """Fields a page may be ordered, and so a cursor keyed, on."""
+        allowed = getattr(view, 'cursor_ordering_fields', ('created_at',))
+        return {*allowed, self.default_ordering.lstrip('-')}
+
+    def get_ordering(self, request, view):
+        ordering = request.query_params.get(self.ordering_param, '').split(',')[0].strip()
+        if ordering.lstrip('-') not in self.get_ordering_fields(view):
+            ordering = self.default_ordering
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 12
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return {
+                'field': str(data['f']),
+                'descending': bool(data['d']),
+                'value': data['v'],
+                'id': int(data['i']),
+                'reverse': bool(data.get('r', False)),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.field)
+        data = {
+            'f': self.field,
+            'd': self.descending,
+            'v': value.isoformat() if hasattr(value, 'isoformat') else str(value),
+            'i': row.pk,
+        }
+        if reverse:
+            data['r'] = True
+        encoded = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        url = remove_query_param(self.request.build_absolute_uri(), self.ordering_param)
+        return replace_query_param(url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetPaginationMixin:
+    """
+    Lets a list view switch to KeysetPagination on request, keeping the
+    configured pagination class for everyone else.
+    ``cursor_ordering_fields`` lists the fields a cursor may be keyed on.
+    """
+    cursor_ordering_fields = ('created_at',)
+
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator') and self.action == 'list'
+                and uses_keyset_pagination(getattr(self, 'request', None))):
+            self._paginator = KeysetPagination()
+        return super().paginator
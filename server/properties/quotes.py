@@ -0,0 +1,150 @@
+"""
+Server-side prices for room stays.
+
+``quote_stays`` prices a batch of ``(room_type, check_in, check_out, guests)``
+stays. A search page showing 50 room options needs one request. The batch
+costs three queries whatever its size: the room types (``in_bulk``), their
+rate overrides in the batch's date range, and their booked nights in the
+``RoomNight`` ledger.
+
+A night costs the room type's ``price_per_night`` unless a ``RoomRate``
+covers it. A ``RoomRate`` is a date range with one price, so a season is one
+row instead of one row per night. When ranges overlap, the later row wins.
+As in inventory.py, each guest takes one unit, so a stay costs the sum of
+its nightly prices times ``guests``.
+
+Quotes are cached for ``BOOKING_QUOTE_TTL`` seconds under a key made from
+the stay and the room type's price generation. Saving a room type or one of
+its rates bumps the generation (see signals.py), so its cached quotes are
+never served after a price change. Repeat searches are served from the
+cache. Booking creation takes ``total_price`` from the cached quote and
+never from the client. When no quote is cached, because it expired or was
+made on a worker with its own cache, the stay is priced again inside the
+booking's transaction. ``available`` is advisory: ``Booking.save`` still
+reserves the nights in the ledger.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import inventory
+from .models import RoomNight, RoomRate, RoomType
+
+MAX_STAYS = 100
+
+
+def ttl():
+    return getattr(settings, 'BOOKING_QUOTE_TTL', 300)
+
+
+def generation_key(room_type_id):
+    return f'quote-generation:{room_type_id}'
+
+
+def generations(room_type_ids):
+    """The current price generation of each room type."""
+    keys = {room_type_id: generation_key(room_type_id) for room_type_id in set(room_type_ids)}
+    stored = cache.get_many(list(keys.values()))
+    return {room_type_id: stored.get(key, 1) for room_type_id, key in keys.items()}
+
+
+def cache_key(room_type_id, check_in, check_out, guests, generation=1):
+    return f'quote:{room_type_id}:{generation}:{check_in.isoformat()}:{check_out.isoformat()}:{guests}'
+
+
+def cached_quote(room_type_id, check_in, check_out, guests):
+    """The live quote for this stay, or None once it has expired or its prices changed."""
+    generation = generations([room_type_id])[room_type_id]
+    return cache.get(cache_key(room_type_id, check_in, check_out, guests, generation))
+
+
+def invalidate(room_type_id):
+    """
+    Retire the cached quotes of a room type whose prices changed. Runs now
+    and again on commit, so a quote priced from pre-commit rows is retired too.
+    """
+    def bump():
+        try:
+            cache.incr(generation_key(room_type_id))
+        except ValueError:
+            cache.add(generation_key(room_type_id), 2, None)
+    bump()
+    if connection.in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def nightly_prices(base, rates, check_in, check_out):
+    """Price of each night of the stay; ``rates`` are ``(start, end, price)`` in ascending priority."""
+    prices = [base] * (check_out - check_in).days
+    for start, end, price in rates:
+        first = max((start - check_in).days, 0)
+        stop = min((end - check_in).days, len(prices))
+        if first < stop:
+            prices[first:stop] = [price] * (stop - first)
+    return prices
+
+
+def _price(room_type, rates, booked, check_in, check_out, guests, expires_at):
+    prices = nightly_prices(room_type.price_per_night, rates, check_in, check_out)
+    fullest = max((booked.get(date, 0) for date in inventory.nights(check_in, check_out)), default=0)
+    return {
+        'room_type': room_type.pk,
+        'check_in': check_in,
+        'check_out': check_out,
+        'guests': guests,
+        'nightly_prices': prices,
+        'total_price': sum(prices) * guests,
+        'available': (
+            room_type.max_guests >= guests and fullest + guests <= room_type.quantity
+        ),
+        'expires_at': expires_at,
+    }
+
+
+def quote_stays(stays):
+    """Quotes for ``stays``, dicts of room_type (pk), check_in, check_out and guests, in order."""
+    current = generations(stay['room_type'] for stay in stays)
+    keys = [
+        cache_key(stay['room_type'], stay['check_in'], stay['check_out'], stay['guests'], current[stay['room_type']])
+        for stay in stays
+    ]
+    quotes = cache.get_many(keys)
+    missing = {key: stay for key, stay in zip(keys, stays) if key not in quotes}
+    if missing:
+        quotes.update(_quote_missing(missing))
+    return [quotes[key] for key in keys]
+
+
+def _quote_missing(missing):
+    room_type_ids = {stay['room_type'] for stay in missing.values()}
+    room_types = RoomType.objects.filter(is_active=True, hotel__is_active=True).in_bulk(room_type_ids)
+    unknown = sorted(room_type_ids - set(room_types))
+    if unknown:
+        raise ValidationError({'room_type': f"Unknown room types: {', '.join(map(str, unknown))}."})
+
+    start = min(stay['check_in'] for stay in missing.values())
+    end = max(stay['check_out'] for stay in missing.values())
+    rates = {}
+    for room_type_id, *rate in RoomRate.objects.filter(
+        room_type_id__in=room_type_ids, start_date__lt=end, end_date__gt=start
+    ).order_by('pk').values_list('room_type_id', 'start_date', 'end_date', 'price_per_night'):
+        rates.setdefault(room_type_id, []).append(rate)
+    booked = {}
+    for room_type_id, date, count in RoomNight.objects.filter(
+        room_type_id__in=room_type_ids, date__gte=start, date__lt=end, booked__gt=0
+    ).values_list('room_type_id', 'date', 'booked'):
+        booked.setdefault(room_type_id, {})[date] = count
+
+    expires_at = timezone.now() + timedelta(seconds=ttl())
+    fresh = {}
+    for key, stay in missing.items():
+        fresh[key] = _price(
+            room_types[stay['room_type']], rates.get(stay['room_type'], ()), booked.get(stay['room_type'], {}),
+            stay['check_in'], stay['check_out'], stay['guests'], expires_at,
+        )
+    cache.set_many(fresh, ttl())
+    return fresh
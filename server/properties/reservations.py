@@ -0,0 +1,125 @@
+"""
+Booking creation under contention.
+
+``create_booking`` runs the whole create path in one transaction:
+lock the room type, check the idempotency key, reserve the nights
+(inventory.py) and insert the booking. The lock covers only the booked
+``RoomType`` row, so a flash sale on one room type does not queue
+bookings for the rest of the hotel. On PostgreSQL the lock is
+``SELECT ... FOR UPDATE``. SQLite has no row locks, so there the
+transaction starts with a no-op write to the row. That takes the database
+write lock at once; otherwise a read lock would fail to upgrade later.
+
+SQLite answers a writer that waited past its busy timeout with
+``database is locked``. The transaction is then retried
+``BOOKING_CREATE_RETRIES`` times with jittered exponential backoff. After
+that the client gets a 503 with ``Retry-After`` instead of a 500.
+
+An ``Idempotency-Key`` header makes a create safe to resend. The first
+request with a key books. Any later request from the same user with that key
+gets the same booking back (200, ``Idempotent-Replayed: true``) and books
+nothing. Reusing the key for a different stay is refused with 422.
+``(user, idempotency_key)`` is unique, so two concurrent first requests
+cannot both book.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Booking, RoomType
+
+MAX_KEY_LENGTH = 64
+BACKOFF_SECONDS = 0.01
+
+
+class Busy(APIException):
+    """The room type stayed locked through every retry."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Bookings for this room are busy; try again shortly.'
+    default_code = 'busy'
+    # Sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was used for a different booking.'
+    default_code = 'idempotency_key_reused'
+
+
+def retries():
+    return getattr(settings, 'BOOKING_CREATE_RETRIES', 5)
+
+
+def idempotency_key(request):
+    """The request's ``Idempotency-Key`` header, or None."""
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValidationError({'Idempotency-Key': f'At most {MAX_KEY_LENGTH} characters.'})
+    return key or None
+
+
+def replayed(user, key):
+    return Booking.objects.filter(user=user, idempotency_key=key).first() if key else None
+
+
+def check_replay(booking, data):
+    """Refuse a replay whose stay differs from the booking made under its key."""
+    sent = (
+        str(data.get('room_type')), str(data.get('check_in_date')),
+        str(data.get('check_out_date')), str(data.get('guest_count') or 1),
+    )
+    made = (
+        str(booking.room_type_id), booking.check_in_date.isoformat(),
+        booking.check_out_date.isoformat(), str(booking.guest_count),
+    )
+    if sent != made:
+        raise IdempotencyKeyReused()
+
+
+def lock_room_type(room_type_id):
+    """Hold the room type's row until the transaction ends."""
+    if connection.features.has_select_for_update:
+        list(RoomType.objects.select_for_update().filter(pk=room_type_id).values_list('pk'))
+    else:
+        RoomType.objects.filter(pk=room_type_id).update(quantity=F('quantity'))
+
+
+def is_lock_error(error):
+    # "database is locked", or "database table is locked" from shared-cache (in-memory) databases
+    message = str(error).lower()
+    return 'is locked' in message or 'deadlock' in message
+
+
+def create_booking(serializer, user, key=None):
+    """
+    Save the validated ``serializer`` as ``user``'s booking. Returns
+    ``(booking, created)``; ``created`` is False for a replayed key.
+    """
+    room_type_id = serializer.validated_data['room_type'].pk
+    for attempt in range(retries() + 1):
+        try:
+            with transaction.atomic():
+                lock_room_type(room_type_id)
+                existing = replayed(user, key)
+                if existing is not None:
+                    return existing, False
+                return serializer.save(user=user, idempotency_key=key), True
+        except (IntegrityError, DjangoValidationError):
+            # The same key booked another room type in parallel
+            existing = replayed(user, key)
+            if existing is None:
+                raise
+            return existing, False
+        except OperationalError as error:
+            if not is_lock_error(error):
+                raise
+            if attempt == retries():
+                raise Busy()
+            time.sleep(random.uniform(0, BACKOFF_SECONDS * 2 ** attempt))
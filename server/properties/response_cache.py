@@ -0,0 +1,166 @@
+"""
+Read-through cache for anonymous property list and detail responses.
+
+Entries hold the serialized ``response.data`` and are keyed by the action,
+host, slug and the normalised query string, so a hit is answered before the
+queryset is built. Detail entries are dropped per slug when the property,
+its images or its amenities change; list entries share a generation number
+that any such change bumps. See signals.py for the wiring.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+KEY_PREFIX = 'property-response'
+LIST_GENERATION_KEY = f'{KEY_PREFIX}:list-generation'
+HITS_KEY = f'{KEY_PREFIX}:hits'
+MISSES_KEY = f'{KEY_PREFIX}:misses'
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def _timeout():
+    return getattr(settings, 'PROPERTY_RESPONSE_CACHE_TIMEOUT', 60 * 5)
+
+
+def normalized_params(params):
+    """Query parameters as a stable string: sorted keys and values, no blanks."""
+    items = sorted(
+        (key, value)
+        for key in params
+        for value in params.getlist(key)
+        if value != ''
+    )
+    return '&'.join(f'{key}={value}' for key, value in items)
+
+
+def list_generation():
+    generation = cache.get(LIST_GENERATION_KEY)
+    if generation is None:
+        cache.add(LIST_GENERATION_KEY, 1, None)
+        generation = cache.get(LIST_GENERATION_KEY, 1)
+    return generation
+
+
+def response_key(request, action, slug=None):
+    host = f'{request.scheme}://{request.get_host()}'
+    digest = hashlib.md5(f'{host}?{normalized_params(request.query_params)}'.encode('utf-8')).hexdigest()
+    if action == 'retrieve':
+        return f'{KEY_PREFIX}:detail:{slug}:{digest}'
+    return f'{KEY_PREFIX}:list:{list_generation()}:{digest}'
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    hits, misses = cache.get(HITS_KEY, 0), cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+def _after_commit(func):
+    """
+    Run now, and again once the open transaction commits, so a reader racing
+    the write cannot leave pre-commit data behind.
+    """
+    func()
+    if connection.in_atomic_block:
+        transaction.on_commit(func)
+
+
+def invalidate_lists():
+    def bump():
+        try:
+            cache.incr(LIST_GENERATION_KEY)
+        except ValueError:
+            cache.add(LIST_GENERATION_KEY, 2, None)
+    _after_commit(bump)
+
+
+def invalidate_details(slugs):
+    """Drop the cached detail responses of the given property slugs."""
+    slugs = [slug for slug in slugs if slug]
+    if not slugs:
+        return
+    # Detail entries vary by query string, so they live under a per-slug
+    # index of keys that is deleted along with them
+    def drop():
+        index_keys = [_detail_index_key(slug) for slug in slugs]
+        keys = set(index_keys)
+        for stored in cache.get_many(index_keys).values():
+            keys.update(stored)
+        cache.delete_many(list(keys))
+    _after_commit(drop)
+
+
+def _detail_index_key(slug):
+    return f'{KEY_PREFIX}:detail-keys:{slug}'
+
+
+def _remember_detail_key(slug, key):
+    index_key = _detail_index_key(slug)
+    keys = cache.get(index_key, set())
+    keys.add(key)
+    cache.set(index_key, keys, _timeout())
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Serves ``list`` and ``retrieve`` to anonymous clients from the response
+    cache, falling through to the normal view on a miss.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(request, 'list', None, lambda: super(
+            AnonymousResponseCacheMixin, self
+        ).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        slug = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self._cached_response(request, 'retrieve', slug, lambda: super(
+            AnonymousResponseCacheMixin, self
+        ).retrieve(request, *args, **kwargs))
+
+    def _cached_response(self, request, action, slug, render):
+        if request.user.is_authenticated:
+            return render()
+        key = response_key(request, action, slug)
+        cached = cache.get(key)
+        if cached is not None:
+            _count(HITS_KEY)
+            response = Response(cached['data'])
+            for header, value in cached['headers'].items():
+                response[header] = value
+            if 'ETag' in cached['headers'] or 'Last-Modified' in cached['headers']:
+                last_modified = cached['headers'].get('Last-Modified')
+                return get_conditional_response(
+                    request, etag=cached['headers'].get('ETag'),
+                    last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+                    response=response,
+                )
+            return response
+        _count(MISSES_KEY)
+        response = render()
+        if response.status_code == status.HTTP_200_OK:
+            # Validators set by ConditionalRetrieveMixin are kept, so cached
+            # revalidations are answered without a query
+            headers = {header: response[header] for header in CACHED_HEADERS if header in response}
+            cache.set(key, {'data': response.data, 'headers': headers}, _timeout())
+            if action == 'retrieve':
+                _remember_detail_key(slug, key)
+        return response
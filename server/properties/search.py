@@ -0,0 +1,120 @@
+"""
+Full-text search for properties backed by an SQLite FTS5 index.
+
+The index lives in a separate virtual table keyed by the property id
+(``rowid``) and is kept in sync from the ``post_save``/``post_delete``
+signals. On databases without the table the caller falls back to the plain
+``icontains`` search.
+"""
+import re
+
+from django.db import connections
+
+SEARCH_TABLE = 'properties_property_fts'
+SEARCH_COLUMNS = ('title', 'description', 'address', 'city', 'country')
+
+# bm25() weights, in SEARCH_COLUMNS order. Title and city hits rank highest.
+SEARCH_WEIGHTS = (10.0, 1.0, 2.0, 5.0, 3.0)
+
+_available = set()
+
+
+def search_index_available(using='default'):
+    """Return True when the FTS5 table exists on the given database."""
+    if using in _available:
+        return True
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    if SEARCH_TABLE in connection.introspection.table_names():
+        _available.add(using)
+        return True
+    return False
+
+
+def build_match_expression(search_terms):
+    """
+    Turn user search terms into an FTS5 MATCH expression.
+    Every word must be present (as in SearchFilter) and is prefix matched, so
+    "lek vil" finds "Lekki villa". Words are quoted to neutralise FTS syntax.
+    """
+    words = re.findall(r'\w+', ' '.join(search_terms))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_properties(queryset, search_terms):
+    """Filter a Property queryset to FTS matches, best BM25 score first."""
+    match = build_match_expression(search_terms)
+    if not match:
+        return queryset.none()
+    property_table = queryset.model._meta.db_table
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    return queryset.extra(
+        select={'search_rank': f'bm25({SEARCH_TABLE}, {weights})'},
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE} MATCH %s',
+            f'{SEARCH_TABLE}.rowid = {property_table}.id',
+        ],
+        params=[match],
+    ).order_by('search_rank', '-created_at')
+
+
+def index_property(instance, using='default'):
+    """Insert or refresh a single property in the search index."""
+    if not search_index_available(using):
+        return
+    columns = ', '.join(SEARCH_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(SEARCH_COLUMNS))
+    values = [getattr(instance, column) or '' for column in SEARCH_COLUMNS]
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [instance.pk])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, {columns}) VALUES (%s, {placeholders})',
+            [instance.pk, *values]
+        )
+
+
+def index_properties(pks, using='default', batch_size=500):
+    """Insert or refresh many properties, e.g. after a bulk import."""
+    if not search_index_available(using):
+        return
+    from .models import Property
+
+    pks = list(pks)
+    columns = ', '.join(SEARCH_COLUMNS)
+    with connections[using].cursor() as cursor:
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', batch)
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, {columns}) '
+                f'SELECT id, {columns} FROM {Property._meta.db_table} WHERE id IN ({placeholders})',
+                batch
+            )
+
+
+def unindex_property(pk, using='default'):
+    """Remove a property from the search index."""
+    if not search_index_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild_search_index(using='default'):
+    """Repopulate the whole index from the property table."""
+    if not search_index_available(using):
+        return 0
+    from .models import Property
+
+    columns = ', '.join(SEARCH_COLUMNS)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, {columns}) '
+            f'SELECT id, {columns} FROM {Property._meta.db_table}'
+        )
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
@@ -2,9 +2,15 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import (
     User, Property, PropertyImage, Hotel, RoomType, RoomImage, 
-    Booking, Amenity, Inquiry, BlogPost, Tag
+    Booking, Amenity, Inquiry, BlogPost, Tag, ChunkedUpload
 )
 from django.utils import timezone
+import os
+import re
+
+from . import availability, covers, derivatives, inventory, quotes, uploads
+from .fieldsets import SparseFieldsetSerializerMixin
+from .loaders import property_owner_prefetches
 
 class UserSerializer(serializers.ModelSerializer):
     role = serializers.SerializerMethodField()
@@ -20,37 +26,51 @@ class UserSerializer(serializers.ModelSerializer):
     def get_role(self, obj):
         if obj.is_superuser:
             return 'admin'
-        elif hasattr(obj, 'groups') and obj.groups.filter(name='Hotel Managers').exists():
+        # Read through groups.all() so a prefetched owner__groups is reused
+        group_names = {group.name for group in obj.groups.all()} if hasattr(obj, 'groups') else set()
+        if 'Hotel Managers' in group_names:
             return 'hotel_manager'
-        elif hasattr(obj, 'groups') and obj.groups.filter(name='Agents').exists():
+        elif 'Agents' in group_names:
             return 'agent'
         # Return the user_type from the model if no specific role is found
         return obj.get_user_type_display().lower() if obj.user_type else 'user'
 
 class PropertyImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = PropertyImage
-        fields = ['id', 'image', 'image_url', 'is_primary', 'created_at']
-        read_only_fields = ['id', 'created_at', 'image_url']
+        fields = ['id', 'image', 'image_url', 'srcset', 'is_primary', 'created_at']
+        read_only_fields = ['id', 'created_at', 'image_url', 'srcset']
     
     def get_image_url(self, obj):
         if obj.image:
             return self.context['request'].build_absolute_uri(obj.image.url)
         return None
 
+    def get_srcset(self, obj):
+        return derivatives.srcset(self.context['request'], obj.derivatives, obj.image)
+
 class AmenitySerializer(serializers.ModelSerializer):
     class Meta:
         model = Amenity
         fields = ['id', 'name', 'icon']
         read_only_fields = ['id']
 
-class PropertySerializer(serializers.ModelSerializer):
+class PropertySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     images = PropertyImageSerializer(many=True, read_only=True)
     owner = UserSerializer(read_only=True)
     amenities = AmenitySerializer(many=True, read_only=True)
     primary_image = serializers.SerializerMethodField()
+    primary_image_width = serializers.IntegerField(source='cover_width', read_only=True)
+    primary_image_height = serializers.IntegerField(source='cover_height', read_only=True)
+    # Only present when the list was filtered with ?near=
+    distance = serializers.FloatField(read_only=True)
+
+    expandable_fields = ('owner', 'images', 'amenities')
+    field_dependencies = {'primary_image': ('cover_image',)}
+    expand_prefetches = {'owner': property_owner_prefetches()}
     
     class Meta:
         model = Property
@@ -58,76 +78,85 @@ class PropertySerializer(serializers.ModelSerializer):
             'id', 'title', 'slug', 'description', 'property_type', 'listing_type',
             'price', 'bedrooms', 'bathrooms', 'area', 'address', 'city', 'country',
             'latitude', 'longitude', 'is_featured', 'is_published', 'created_at',
-            'updated_at', 'owner', 'images', 'amenities', 'primary_image'
+            'updated_at', 'owner', 'images', 'amenities', 'primary_image',
+            'primary_image_width', 'primary_image_height', 'distance'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'owner', 'slug']
         lookup_field = 'slug'
         extra_kwargs = {'url': {'lookup_field': 'slug'}}
     
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return self.context['request'].build_absolute_uri(primary_image.image.url)
-        return None
+        # Denormalised on the row: the card rendition once it exists
+        return covers.cover_url(self.context['request'], obj)
     
     def create(self, validated_data):
         validated_data['owner'] = self.context['request'].user
         return super().create(validated_data)
 
-class HotelSerializer(serializers.ModelSerializer):
+class HotelSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     amenities = AmenitySerializer(many=True, read_only=True)
     manager = UserSerializer(read_only=True)
     primary_image = serializers.SerializerMethodField()
+    primary_image_width = serializers.IntegerField(source='cover_width', read_only=True)
+    primary_image_height = serializers.IntegerField(source='cover_height', read_only=True)
+    # Only present when the list was filtered with ?check_in=&check_out=
+    cheapest_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    expandable_fields = ('manager', 'amenities')
+    field_dependencies = {'primary_image': ('cover_image',)}
     
     class Meta:
         model = Hotel
         fields = [
             'id', 'name', 'slug', 'description', 'address', 'city', 'country',
             'star_rating', 'check_in_time', 'check_out_time', 'is_active',
-            'created_at', 'updated_at', 'manager', 'amenities', 'primary_image'
+            'created_at', 'updated_at', 'manager', 'amenities', 'primary_image',
+            'primary_image_width', 'primary_image_height', 'cheapest_price'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'manager']
         lookup_field = 'slug'
         extra_kwargs = {'url': {'lookup_field': 'slug'}}
     
     def get_primary_image(self, obj):
-        if hasattr(obj, 'images') and obj.images.exists():
-            return self.context['request'].build_absolute_uri(obj.images.first().image.url)
-        return None
+        # Denormalised on the row: the card rendition once it exists
+        return covers.cover_url(self.context['request'], obj)
 
 class RoomImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = RoomImage
-        fields = ['id', 'image', 'image_url', 'is_primary']
-        read_only_fields = ['id', 'image_url']
+        fields = ['id', 'image', 'image_url', 'srcset', 'is_primary']
+        read_only_fields = ['id', 'image_url', 'srcset']
     
     def get_image_url(self, obj):
         if obj.image:
             return self.context['request'].build_absolute_uri(obj.image.url)
         return None
 
+    def get_srcset(self, obj):
+        return derivatives.srcset(self.context['request'], obj.derivatives, obj.image)
+
 class RoomTypeSerializer(serializers.ModelSerializer):
     images = RoomImageSerializer(many=True, read_only=True)
     amenities = AmenitySerializer(many=True, read_only=True)
     primary_image = serializers.SerializerMethodField()
+    primary_image_width = serializers.IntegerField(source='cover_width', read_only=True)
+    primary_image_height = serializers.IntegerField(source='cover_height', read_only=True)
     
     class Meta:
         model = RoomType
         fields = [
             'id', 'name', 'description', 'max_guests', 'price_per_night',
-            'quantity', 'amenities', 'images', 'primary_image', 'created_at'
+            'quantity', 'amenities', 'images', 'primary_image',
+            'primary_image_width', 'primary_image_height', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
     
     def get_primary_image(self, obj):
-        primary = obj.images.filter(is_primary=True).first()
-        if primary:
-            return self.context['request'].build_absolute_uri(primary.image.url)
-        elif obj.images.exists():
-            return self.context['request'].build_absolute_uri(obj.images.first().image.url)
-        return None
+        # Denormalised on the row: the card rendition once it exists
+        return covers.cover_url(self.context['request'], obj)
 
 class BookingSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -141,7 +170,8 @@ class BookingSerializer(serializers.ModelSerializer):
             'check_out_date', 'status', 'total_price', 'guest_count',
             'special_requests', 'created_at'
         ]
-        read_only_fields = ['id', 'user', 'status', 'created_at']
+        # The price comes from the stay's quote, never the client; see quotes.py
+        read_only_fields = ['id', 'user', 'status', 'total_price', 'created_at']
     
     def validate(self, data):
         if data['check_out_date'] <= data['check_in_date']:
@@ -150,25 +180,63 @@ class BookingSerializer(serializers.ModelSerializer):
         if data['check_in_date'] < timezone.now().date():
             raise serializers.ValidationError("Check-in date cannot be in the past.")
         
-        # Check room availability
-        room_type = data['room_type']
-        overlapping_bookings = Booking.objects.filter(
-            room_type=room_type,
-            check_in_date__lt=data['check_out_date'],
-            check_out_date__gt=data['check_in_date'],
-            status__in=['pending', 'confirmed']
-        )
+        # Early answer from the per-night ledger; Booking.save reserves the nights for real
+        if self.instance is None and not inventory.is_available(
+            data['room_type'], data['check_in_date'], data['check_out_date'], data.get('guest_count', 1)
+        ):
+            raise serializers.ValidationError("Not enough rooms available for the selected dates.")
         
-        if overlapping_bookings.exists():
-            booked_rooms = sum(booking.guest_count for booking in overlapping_bookings)
-            if booked_rooms + data.get('guest_count', 1) > room_type.quantity:
-                raise serializers.ValidationError("Not enough rooms available for the selected dates.")
+        if self.instance is None:
+            quote = quotes.cached_quote(
+                data['room_type'].pk, data['check_in_date'], data['check_out_date'], data.get('guest_count', 1)
+            )
+            if quote is not None:
+                data['total_price'] = quote['total_price']
         
         return data
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        if 'total_price' not in validated_data:
+            # No live quote here: price the stay inside the booking's transaction
+            validated_data['total_price'] = quotes.quote_stays([{
+                'room_type': validated_data['room_type'].pk,
+                'check_in': validated_data['check_in_date'],
+                'check_out': validated_data['check_out_date'],
+                'guests': validated_data.get('guest_count', 1),
+            }])[0]['total_price']
+        try:
+            return super().create(validated_data)
+        except inventory.Unavailable as error:
+            # Taken by a concurrent booking since validate()
+            raise serializers.ValidationError(error.messages)
+
+    def update(self, instance, validated_data):
+        try:
+            return super().update(instance, validated_data)
+        except inventory.Unavailable as error:
+            raise serializers.ValidationError(error.messages)
+
+class StaySerializer(serializers.Serializer):
+    room_type = serializers.IntegerField(min_value=1)
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    guests = serializers.IntegerField(min_value=1, max_value=availability.MAX_GUESTS, default=1)
+
+    def validate(self, data):
+        nights = (data['check_out'] - data['check_in']).days
+        if nights < 1:
+            raise serializers.ValidationError({'check_out': 'Must be after check_in.'})
+        if nights > availability.MAX_NIGHTS:
+            raise serializers.ValidationError(
+                {'check_out': f'Stays are limited to {availability.MAX_NIGHTS} nights.'}
+            )
+        if data['check_in'] < timezone.now().date():
+            raise serializers.ValidationError({'check_in': 'Cannot be in the past.'})
+        return data
+
+class QuoteRequestSerializer(serializers.Serializer):
+    stays = StaySerializer(many=True, allow_empty=False, max_length=quotes.MAX_STAYS)
 
 class InquirySerializer(serializers.ModelSerializer):
     property_title = serializers.CharField(source='property.title', read_only=True)
@@ -187,16 +255,24 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug']
         read_only_fields = ['id', 'slug']
 
-class BlogPostSerializer(serializers.ModelSerializer):
+class BlogPostSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, required=False)
     featured_image_url = serializers.SerializerMethodField()
+    featured_image_srcset = serializers.SerializerMethodField()
+
+    expandable_fields = ('author', 'tags')
+    field_dependencies = {
+        'featured_image_url': ('featured_image',),
+        'featured_image_srcset': ('featured_image', 'featured_image_derivatives'),
+    }
     
     class Meta:
         model = BlogPost
         fields = [
             'id', 'title', 'slug', 'content', 'excerpt', 'author', 'featured_image',
-            'featured_image_url', 'is_published', 'published_date', 'tags', 'created_at'
+            'featured_image_url', 'featured_image_srcset', 'is_published', 'published_date',
+            'tags', 'created_at'
         ]
         read_only_fields = ['id', 'slug', 'created_at', 'published_date']
         lookup_field = 'slug'
@@ -206,6 +282,11 @@ class BlogPostSerializer(serializers.ModelSerializer):
         if obj.featured_image:
             return self.context['request'].build_absolute_uri(obj.featured_image.url)
         return None
+
+    def get_featured_image_srcset(self, obj):
+        return derivatives.srcset(
+            self.context['request'], obj.featured_image_derivatives, obj.featured_image
+        )
     
     def create(self, validated_data):
         tags_data = validated_data.pop('tags', [])
@@ -227,3 +308,52 @@ class BlogPostSerializer(serializers.ModelSerializer):
                 instance.tags.add(tag)
         
         return super().update(instance, validated_data)
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """Starts a resumable upload, see uploads.py."""
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = [
+            'id', 'purpose', 'target', 'filename', 'size', 'sha256',
+            'offset', 'status', 'chunk_size', 'result', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'offset', 'status', 'result', 'created_at', 'updated_at']
+
+    def get_chunk_size(self, obj):
+        return uploads.max_chunk_size()
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError("Expected a hex SHA-256 digest.")
+        return value
+
+    def validate(self, data):
+        extensions, max_size = uploads.PURPOSES[data['purpose']]
+        if os.path.splitext(data['filename'])[1].lower() not in extensions:
+            raise serializers.ValidationError({'filename': f"Allowed extensions: {', '.join(extensions)}."})
+        if not 0 < data['size'] <= max_size:
+            raise serializers.ValidationError({'size': f"Size must be between 1 and {max_size} bytes."})
+
+        user = self.context['request'].user
+        target = data.get('target', '')
+        if data['purpose'] == 'feed':
+            # Feeds create listings, so they need the same access as the feed upload endpoint
+            if not (user.is_staff or user.has_perm('api.upload_feed')):
+                raise serializers.ValidationError({'purpose': "Only staff and feed partners may upload feeds."})
+        elif data['purpose'] == 'property_image':
+            properties = Property.objects.filter(slug=target)
+            if not user.is_staff:
+                properties = properties.filter(owner=user)
+            if not properties.exists():
+                raise serializers.ValidationError({'target': "No property of yours has this slug."})
+        elif data['purpose'] == 'room_image':
+            room_types = RoomType.objects.filter(pk=target) if target.isdigit() else RoomType.objects.none()
+            if not user.is_staff:
+                room_types = room_types.filter(hotel__manager=user)
+            if not room_types.exists():
+                raise serializers.ValidationError({'target': "No room type of yours has this id."})
+        return data
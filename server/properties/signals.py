@@ -0,0 +1,301 @@
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Property, PropertyImage, RoomImage, RoomType, RoomRate, Amenity, Hotel, BlogPost, Tag, Booking
+from . import amenity_bitmap, blobs, covers, derivatives, inventory, facets, quotes, response_cache, search, similarity, stats, tasks
+from .conditional import touch
+
+
+@receiver(pre_save, sender=Property)
+def remember_previous_row(sender, instance, raw, **kwargs):
+    """
+    Load the stored row once per save. The facet, response cache and stats
+    receivers compare the saved property against ``_previous_row``.
+    """
+    if raw or instance.pk is None:
+        instance._previous_row = None
+        return
+    instance._previous_row = Property.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Property)
+def index_property_on_save(sender, instance, using, **kwargs):
+    """Keep the full-text search index in step with the property row."""
+    search.index_property(instance, using=using)
+
+
+@receiver(post_delete, sender=Property)
+def unindex_property_on_delete(sender, instance, using, **kwargs):
+    search.unindex_property(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Property)
+def update_facets_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    # Saving a property leaves its amenity links alone, so they serve both snapshots
+    amenity_ids = [] if created else list(instance.amenities.values_list('id', flat=True))
+    old = facets.snapshot(getattr(instance, '_previous_row', None), amenity_ids=amenity_ids)
+    facets.apply_change(old, facets.snapshot(instance, amenity_ids=amenity_ids))
+
+
+@receiver(pre_delete, sender=Property)
+def snapshot_facets_before_delete(sender, instance, **kwargs):
+    instance._facet_snapshot = facets.snapshot(instance)
+
+
+@receiver(post_delete, sender=Property)
+def update_facets_on_delete(sender, instance, **kwargs):
+    facets.apply_change(getattr(instance, '_facet_snapshot', None), None)
+
+
+@receiver(m2m_changed, sender=Property.amenities.through)
+def update_facets_on_amenities_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Patch amenity facet counts for every property whose amenities changed."""
+    if action not in ('pre_add', 'pre_remove', 'pre_clear', 'post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        properties = [instance]
+    elif action.startswith('pre_'):
+        ids = pk_set if pk_set is not None else instance.properties.values_list('id', flat=True)
+        properties = list(Property.objects.filter(pk__in=list(ids)))
+        instance._facet_properties = properties
+    else:
+        properties = getattr(instance, '_facet_properties', [])
+
+    if action.startswith('pre_'):
+        instance._facet_snapshots = {
+            property.pk: facets.snapshot(property) for property in properties
+        }
+        return
+    before = getattr(instance, '_facet_snapshots', {})
+    for property in properties:
+        facets.apply_change(before.get(property.pk), facets.snapshot(property))
+
+
+@receiver(post_save, sender=Property)
+def refresh_neighbours_on_save(sender, instance, raw, **kwargs):
+    """Queue the property for a neighbour refresh off the request thread."""
+    if raw or not similarity.features_changed(getattr(instance, '_previous_row', None), instance):
+        return
+    similarity.mark_stale([instance.pk])
+    similarity.schedule_refresh()
+
+
+@receiver(pre_delete, sender=Property)
+def refresh_neighbours_on_delete(sender, instance, **kwargs):
+    # The neighbour rows cascade with the property, so queue the lists that
+    # pointed at it before they disappear
+    similarity.mark_stale(
+        instance.neighbour_of.exclude(property=instance).values_list('property_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Property)
+def refresh_neighbours_after_delete(sender, instance, **kwargs):
+    similarity.schedule_refresh()
+
+
+@receiver(m2m_changed, sender=Property.amenities.through)
+def refresh_neighbours_on_amenities_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # An amenity losing all its properties: find them before the rows go
+        similarity.mark_stale(instance.properties.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        similarity.mark_stale([instance.pk])
+    elif pk_set:
+        similarity.mark_stale(pk_set)
+    similarity.schedule_refresh()
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def drop_cached_property_responses(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_row', None)
+    response_cache.invalidate_lists()
+    response_cache.invalidate_details([instance.slug, previous.slug if previous is not None else None])
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def drop_cached_responses_for_image(sender, instance, **kwargs):
+    response_cache.invalidate_lists()
+    response_cache.invalidate_details(
+        Property.objects.filter(pk=instance.property_id).values_list('slug', flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Property.amenities.through)
+def drop_cached_responses_for_amenities(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    response_cache.invalidate_lists()
+    if not reverse:
+        response_cache.invalidate_details([instance.slug])
+    elif action == 'pre_clear':
+        response_cache.invalidate_details(instance.properties.values_list('slug', flat=True))
+    else:
+        response_cache.invalidate_details(Property.objects.filter(pk__in=pk_set).values_list('slug', flat=True))
+
+
+@receiver(post_save, sender=Amenity)
+def drop_cached_responses_for_amenity_rename(sender, instance, created, raw, **kwargs):
+    """Amenity names and icons are embedded in every property response."""
+    if created or raw:
+        return
+    response_cache.invalidate_lists()
+    response_cache.invalidate_details(instance.properties.values_list('slug', flat=True))
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def touch_property_for_image(sender, instance, **kwargs):
+    """Images leave no change stamp on the property, so bump its updated_at."""
+    touch(Property.objects.filter(pk=instance.property_id))
+
+
+def _touch_on_m2m_change(model, related_name):
+    """
+    Build an m2m_changed receiver that bumps ``updated_at`` on the ``model``
+    rows whose relation ``related_name`` gained or lost members.
+    """
+    def receiver(sender, instance, action, reverse, pk_set, **kwargs):
+        if reverse and action == 'pre_clear':
+            touch(model.objects.filter(**{related_name: instance}))
+        elif action in ('post_add', 'post_remove', 'post_clear'):
+            if not reverse:
+                touch(model.objects.filter(pk=instance.pk))
+            elif pk_set:
+                touch(model.objects.filter(pk__in=pk_set))
+    return receiver
+
+
+touch_property_on_amenities_change = _touch_on_m2m_change(Property, 'amenities')
+touch_hotel_on_amenities_change = _touch_on_m2m_change(Hotel, 'amenities')
+touch_blog_post_on_tags_change = _touch_on_m2m_change(BlogPost, 'tags')
+m2m_changed.connect(touch_property_on_amenities_change, sender=Property.amenities.through)
+m2m_changed.connect(touch_hotel_on_amenities_change, sender=Hotel.amenities.through)
+m2m_changed.connect(touch_blog_post_on_tags_change, sender=BlogPost.tags.through)
+
+
+@receiver(pre_delete, sender=Amenity)
+def touch_on_amenity_delete(sender, instance, **kwargs):
+    # The link rows cascade without m2m_changed
+    touch(Property.objects.filter(amenities=instance))
+    touch(Hotel.objects.filter(amenities=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_blog_posts_for_tag(sender, instance, **kwargs):
+    """Tags carry no updated_at of their own."""
+    if kwargs.get('created') or kwargs.get('raw'):
+        return
+    touch(BlogPost.objects.filter(tags=instance))
+
+
+def _maintain_amenity_mask(model):
+    """Build an m2m_changed receiver keeping ``model.amenity_mask`` in step."""
+    def receiver(sender, instance, action, reverse, pk_set, **kwargs):
+        if not reverse:
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                amenity_bitmap.refresh_masks(model, [instance.pk])
+            return
+        # The instance is an Amenity: flip its bit on the affected rows
+        if instance.bit is None:
+            return
+        if action == 'post_add' and pk_set:
+            amenity_bitmap.set_bit(model.objects.filter(pk__in=pk_set), instance.bit)
+        elif action == 'post_remove' and pk_set:
+            amenity_bitmap.clear_bit(model.objects.filter(pk__in=pk_set), instance.bit)
+        elif action == 'pre_clear':
+            amenity_bitmap.clear_bit(model.objects.filter(amenities=instance), instance.bit)
+    return receiver
+
+
+for _model in amenity_bitmap.BITMAP_MODELS:
+    m2m_changed.connect(
+        _maintain_amenity_mask(_model), sender=_model.amenities.through, weak=False,
+        dispatch_uid=f'amenity_mask_{_model._meta.model_name}'
+    )
+
+
+@receiver(pre_delete, sender=Amenity)
+def clear_amenity_bit_on_delete(sender, instance, **kwargs):
+    # The link rows cascade without m2m_changed
+    if instance.bit is None:
+        return
+    for model in amenity_bitmap.BITMAP_MODELS:
+        amenity_bitmap.clear_bit(model.objects.filter(amenities=instance), instance.bit)
+
+
+@receiver(post_save, sender=Property)
+def invalidate_stats_on_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    stats.invalidate(stats.snapshot(getattr(instance, '_previous_row', None)), stats.snapshot(instance))
+
+
+@receiver(post_delete, sender=Property)
+def invalidate_stats_on_delete(sender, instance, **kwargs):
+    stats.invalidate(stats.snapshot(instance), None)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_save, sender=RoomImage)
+@receiver(post_save, sender=BlogPost)
+def generate_image_derivatives(sender, instance, raw, **kwargs):
+    """Render resized copies of a new or replaced image off the request thread."""
+    if raw:
+        return
+    label = sender._meta.label
+    if derivatives.needs_derivatives(instance, label):
+        tasks.enqueue(derivatives.generate, label, instance.pk)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def refresh_property_cover(sender, instance, raw=False, **kwargs):
+    """Keep the property's denormalised cover in step with its images."""
+    if raw:
+        return
+    covers.refresh_properties([instance.property_id])
+
+
+@receiver(post_save, sender=RoomImage)
+@receiver(post_delete, sender=RoomImage)
+def refresh_room_type_cover(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    covers.refresh_room_types([instance.room_type_id])
+
+
+@receiver(post_delete, sender=RoomType)
+def refresh_hotel_cover(sender, instance, **kwargs):
+    # The hotel may have shown this room type's cover
+    covers.refresh_hotels([instance.hotel_id])
+
+
+@receiver(post_save, sender=RoomType)
+@receiver(post_save, sender=RoomRate)
+@receiver(post_delete, sender=RoomRate)
+def retire_cached_quotes(sender, instance, raw=False, **kwargs):
+    """Cached quotes carry the prices and quantity they were made with."""
+    if raw:
+        return
+    quotes.invalidate(instance.pk if sender is RoomType else instance.room_type_id)
+
+
+@receiver(post_delete, sender=Booking)
+def release_booked_nights(sender, instance, **kwargs):
+    """Deletes, cascades included, bypass Booking.save; give the nights back here."""
+    inventory.booking_deleted(instance)
+
+
+# Reference counts of content-addressed uploads, see blobs.py
+blobs.track_references(PropertyImage, 'image')
+blobs.track_references(RoomImage, 'image')
+blobs.track_references(BlogPost, 'featured_image')
@@ -0,0 +1,255 @@
+"""
+Precomputed nearest neighbours for the ``similar`` properties action.
+
+Every published property is encoded as a weighted feature vector:
+
+* one-hot property type, listing type and city
+* price, area and bedrooms as "soft" buckets on a fixed scale, so nearby
+  values share weight with their neighbouring bucket
+* the amenity bitset
+
+Rows are L2-normalised, so a matrix product gives cosine similarities. Top-k
+neighbours are computed in row blocks with NumPy and stored in
+SimilarProperty, which turns ``similar`` into one indexed lookup.
+
+Changes mark properties stale (see signals.py). ``refresh_stale`` then
+recomputes only those rows plus the rows they can enter or leave, which are
+found from the stored k-th best score of every property.
+
+A refresh still encodes every published property, so it is not run per
+save. Saves that leave the encoded fields alone mark nothing, and
+``schedule_refresh`` queues at most one refresh at a time: marks made
+before it starts are all handled by that one run.
+"""
+import threading
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from . import tasks
+from .models import Property, SimilarProperty, SimilarityRefresh
+
+NEIGHBOURS = 12
+BLOCK_SIZE = 256
+REFRESH_CACHE_KEY = 'similarity:refresh-scheduled'
+# Only guards against a queued refresh that never ran; a starting refresh clears the key
+REFRESH_SCHEDULE_TIMEOUT = 60 * 5
+
+# Property fields the feature vectors are built from
+FEATURE_FIELDS = ('is_published', 'property_type', 'listing_type', 'price', 'area', 'bedrooms', 'city')
+
+# Relative weight of each feature block
+WEIGHTS = {
+    'property_type': 2.0,
+    'listing_type': 3.0,
+    'price': 2.0,
+    'area': 1.0,
+    'bedrooms': 1.0,
+    'city': 2.0,
+    'amenities': 1.0,
+}
+
+# Fixed bucket scales (log10 for price and area) keep vectors stable between
+# refreshes, unlike quantiles that move with the data.
+PRICE_BUCKETS = np.arange(3.0, 8.01, 0.25)
+AREA_BUCKETS = np.arange(1.0, 4.51, 0.25)
+BEDROOM_BUCKETS = np.arange(0.0, 8.01, 1.0)
+
+_refresh_lock = threading.Lock()
+
+
+def _soft_buckets(values, edges):
+    """Spread each value linearly over the two nearest bucket centres."""
+    values = np.clip(values, edges[0], edges[-1])
+    position = (values - edges[0]) / (edges[1] - edges[0])
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, len(edges) - 1)
+    weight_upper = position - lower
+    encoded = np.zeros((len(values), len(edges)), dtype=np.float32)
+    rows = np.arange(len(values))
+    encoded[rows, lower] += 1 - weight_upper
+    encoded[rows, upper] += weight_upper
+    return encoded
+
+
+def _one_hot(labels, vocabulary):
+    """One column per label of ``vocabulary``, plus a last "other" column for anything else."""
+    index = {label: position for position, label in enumerate(vocabulary)}
+    encoded = np.zeros((len(labels), len(vocabulary) + 1), dtype=np.float32)
+    encoded[np.arange(len(labels)), [index.get(label, len(vocabulary)) for label in labels]] = 1
+    return encoded
+
+
+def build_feature_matrix():
+    """
+    Load every published property and return ``(ids, matrix)``, with one
+    normalised feature row per property in id order.
+    """
+    rows = list(
+        Property.objects.filter(is_published=True).order_by('id').values_list(
+            'id', 'property_type', 'listing_type', 'price', 'area', 'bedrooms', 'city'
+        )
+    )
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    if not rows:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+
+    property_types = [row[1] for row in rows]
+    listing_types = [row[2] for row in rows]
+    cities = [row[6].strip().lower() for row in rows]
+    price = np.log10(np.maximum(np.array([float(row[3]) for row in rows]), 1.0))
+    area = np.log10(np.maximum(np.array([float(row[4]) for row in rows]), 1.0))
+    bedrooms = np.array([row[5] for row in rows], dtype=np.float64)
+
+    amenity_ids = sorted(set(Property.amenities.through.objects.values_list('amenity_id', flat=True)))
+    amenities = np.zeros((len(rows), len(amenity_ids)), dtype=np.float32)
+    if amenity_ids:
+        row_of = {property_id: position for position, property_id in enumerate(ids.tolist())}
+        column_of = {amenity_id: position for position, amenity_id in enumerate(amenity_ids)}
+        for property_id, amenity_id in Property.amenities.through.objects.filter(
+            property__is_published=True
+        ).values_list('property_id', 'amenity_id'):
+            amenities[row_of[property_id], column_of[amenity_id]] = 1
+        # Scale the bitset so listings with many amenities don't dominate
+        counts = amenities.sum(axis=1, keepdims=True)
+        amenities = np.divide(amenities, np.sqrt(counts), out=amenities, where=counts > 0)
+
+    blocks = [
+        WEIGHTS['property_type'] * _one_hot(property_types, [c for c, _ in Property.PROPERTY_TYPES]),
+        WEIGHTS['listing_type'] * _one_hot(listing_types, [c for c, _ in Property.LISTING_TYPES]),
+        WEIGHTS['price'] * _soft_buckets(price, PRICE_BUCKETS),
+        WEIGHTS['area'] * _soft_buckets(area, AREA_BUCKETS),
+        WEIGHTS['bedrooms'] * _soft_buckets(bedrooms, BEDROOM_BUCKETS),
+        WEIGHTS['city'] * _one_hot(cities, sorted(set(cities))),
+        WEIGHTS['amenities'] * amenities,
+    ]
+    matrix = np.hstack(blocks).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.maximum(norms, 1e-12)
+    return ids, matrix
+
+
+def top_neighbours(matrix, rows, k=NEIGHBOURS):
+    """
+    Yield ``(row, neighbour_rows, scores)`` for each requested row, best first,
+    working through the rows in blocks to bound memory.
+    """
+    k = min(k, len(matrix) - 1)
+    if k <= 0:
+        for row in rows:
+            yield row, np.array([], dtype=int), np.array([], dtype=np.float32)
+        return
+    rows = np.asarray(rows)
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        scores = matrix[block] @ matrix.T
+        scores[np.arange(len(block)), block] = -np.inf
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        for offset, row in enumerate(block):
+            yield row, candidates[offset], candidate_scores[offset]
+
+
+def _store(ids, matrix, rows):
+    """Replace the neighbour lists of the given matrix rows."""
+    property_ids = [int(ids[row]) for row in rows]
+    objects = [
+        SimilarProperty(
+            property_id=int(ids[row]), neighbour_id=int(ids[neighbour]), rank=rank, score=float(score)
+        )
+        for row, neighbours, scores in top_neighbours(matrix, rows)
+        for rank, (neighbour, score) in enumerate(zip(neighbours, scores))
+    ]
+    with transaction.atomic():
+        SimilarProperty.objects.filter(property_id__in=property_ids).delete()
+        SimilarProperty.objects.bulk_create(objects, batch_size=1000)
+
+
+def build_similarity_index():
+    """Recompute every neighbour list from scratch."""
+    ids, matrix = build_feature_matrix()
+    with transaction.atomic():
+        SimilarProperty.objects.all().delete()
+        SimilarityRefresh.objects.all().delete()
+        for start in range(0, len(ids), BLOCK_SIZE * 8):
+            _store(ids, matrix, np.arange(start, min(start + BLOCK_SIZE * 8, len(ids))))
+    return len(ids)
+
+
+def features_changed(previous, property):
+    """True unless ``property`` encodes like the stored row ``previous``."""
+    return previous is None or any(
+        getattr(previous, field) != getattr(property, field) for field in FEATURE_FIELDS
+    )
+
+
+def mark_stale(property_ids):
+    """Queue properties whose features changed for the next refresh."""
+    SimilarityRefresh.objects.bulk_create(
+        [SimilarityRefresh(property_id=pk) for pk in property_ids], ignore_conflicts=True
+    )
+
+
+def schedule_refresh():
+    """Queue ``refresh_stale`` in the background unless a queued one has not started yet."""
+    if cache.add(REFRESH_CACHE_KEY, True, REFRESH_SCHEDULE_TIMEOUT):
+        tasks.enqueue(refresh_stale)
+
+
+def refresh_stale():
+    """
+    Recompute neighbour lists affected by queued changes. Returns the number
+    of lists rewritten. Concurrent calls return immediately.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        return 0
+    try:
+        # Marks made from here on schedule another run
+        cache.delete(REFRESH_CACHE_KEY)
+        refreshed = 0
+        while True:
+            stale = set(SimilarityRefresh.objects.values_list('property_id', flat=True))
+            if not stale:
+                return refreshed
+            # Claim the batch first so marks made while it runs are kept
+            SimilarityRefresh.objects.filter(property_id__in=stale).delete()
+            refreshed += _refresh(stale)
+    finally:
+        _refresh_lock.release()
+
+
+def _refresh(stale):
+    ids, matrix = build_feature_matrix()
+    row_of = {property_id: row for row, property_id in enumerate(ids.tolist())}
+
+    # Lists that currently point at a changed property may lose it
+    affected = set(stale) | set(
+        SimilarProperty.objects.filter(neighbour_id__in=stale).values_list('property_id', flat=True)
+    )
+    # Unpublished or deleted properties keep no list of their own
+    SimilarProperty.objects.filter(property_id__in=[pk for pk in affected if pk not in row_of]).delete()
+
+    # Lists a changed property may now enter: its score beats their k-th best
+    changed_rows = [row_of[pk] for pk in stale if pk in row_of]
+    if changed_rows:
+        # Properties without a full list keep -inf and are always refreshed
+        kth = np.full(len(ids), -np.inf, dtype=np.float32)
+        last_rank = min(NEIGHBOURS, len(ids) - 1) - 1
+        for property_id, score in SimilarProperty.objects.filter(rank=last_rank).values_list('property_id', 'score'):
+            if property_id in row_of:
+                kth[row_of[property_id]] = score
+        for start in range(0, len(changed_rows), BLOCK_SIZE):
+            block = changed_rows[start:start + BLOCK_SIZE]
+            scores = matrix[block] @ matrix.T
+            scores[np.arange(len(block)), block] = -np.inf
+            entering = (scores > kth).any(axis=0)
+            affected.update(ids[entering].tolist())
+
+    rows = sorted(row_of[pk] for pk in affected if pk in row_of)
+    if rows:
+        _store(ids, matrix, np.array(rows))
+    return len(rows)
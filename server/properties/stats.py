@@ -0,0 +1,182 @@
+"""
+Price and area statistics for the property search slider.
+
+One query reads the price and area of every matching row as floats. NumPy then
+computes min/max/mean, percentiles and a fixed-width histogram per field.
+
+Results for the public (published-only) queryset are cached when the only
+filters are listing type, property type and/or city. Saves and deletes
+that change a property's price, area, visibility or those three fields
+drop the cache entries whose filters the old or new row matched (see
+signals.py). An index of the cached keys and their filters, itself kept in
+the cache, makes that possible for the substring ``city`` filter.
+
+The index is bounded. Entries past their timeout are pruned whenever it is
+written, and beyond ``STATS_INDEX_MAX_KEYS`` the least recently cached
+entries are dropped together with their statistics, so a crawl through
+many cities cannot grow it, or the scan on every save, without limit.
+"""
+import hashlib
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from rest_framework.exceptions import ValidationError
+
+STATS_CACHE_PREFIX = 'property-stats'
+STATS_INDEX_KEY = f'{STATS_CACHE_PREFIX}:index'
+STATS_CACHE_TIMEOUT = 60 * 10
+STATS_INDEX_MAX_KEYS = 500
+
+STATS_FIELDS = ('price', 'area')
+PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_BINS, MAX_BINS = 20, 100
+
+# Filters a cached entry may carry, matched as get_queryset does:
+# iexact for the types, icontains for the city
+CACHEABLE_FILTERS = ('listing_type', 'property_type', 'city')
+# Query parameters that do not change which rows are counted
+IGNORED_PARAMS = {
+    'ordering', 'page', 'page_size', 'pagination', 'cursor', 'format', 'fields', 'expand', 'bins'
+}
+
+
+def parse_bins(value):
+    if value in (None, ''):
+        return DEFAULT_BINS
+    try:
+        bins = int(value)
+    except ValueError:
+        raise ValidationError({'bins': 'Expected a whole number.'})
+    if not 1 <= bins <= MAX_BINS:
+        raise ValidationError({'bins': f'Expected a number between 1 and {MAX_BINS}.'})
+    return bins
+
+
+def _summary(values, bins):
+    if not len(values):
+        return None
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        'min': round(float(values.min()), 2),
+        'max': round(float(values.max()), 2),
+        'mean': round(float(values.mean()), 2),
+        'percentiles': {
+            f'p{percentile}': round(float(value), 2)
+            for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+        },
+        'histogram': {
+            'edges': [round(float(edge), 2) for edge in edges],
+            'counts': counts.tolist(),
+        },
+    }
+
+
+def compute_stats(queryset, bins=DEFAULT_BINS):
+    """Statistics of price and area over every row in ``queryset``."""
+    rows = queryset.order_by().prefetch_related(None).values_list(
+        *(Cast(field, FloatField()) for field in STATS_FIELDS)
+    )
+    values = np.array(list(rows), dtype=np.float64).reshape(-1, len(STATS_FIELDS))
+    stats = {'count': len(values)}
+    for column, field in enumerate(STATS_FIELDS):
+        stats[field] = _summary(values[:, column], bins)
+    return stats
+
+
+def cacheable_filters(params):
+    """
+    The ``(listing_type, property_type, city)`` filter of the request, blank
+    where absent, or None when it filters on anything else.
+    """
+    filters = {key: params.getlist(key) for key in params if key not in IGNORED_PARAMS}
+    filters = {key: values for key, values in filters.items() if any(values)}
+    if any(key not in CACHEABLE_FILTERS or len(values) != 1 for key, values in filters.items()):
+        return None
+    return tuple(filters.get(field, [''])[0].strip().lower() for field in CACHEABLE_FILTERS)
+
+
+def cache_key(combination, bins):
+    digest = hashlib.md5('\x1f'.join(combination).encode('utf-8')).hexdigest()
+    return f'{STATS_CACHE_PREFIX}:{digest}:{bins}'
+
+
+def get_stats(queryset, params, public=True):
+    """Statistics for the filtered queryset, served from cache when possible."""
+    bins = parse_bins(params.get('bins'))
+    combination = cacheable_filters(params) if public else None
+    if combination is None:
+        return compute_stats(queryset, bins)
+    key = cache_key(combination, bins)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(queryset, bins)
+        cache.set(key, stats, STATS_CACHE_TIMEOUT)
+        _index_key(key, combination)
+    return stats
+
+
+def _index_key(key, combination):
+    """Record a cached key in the index, keeping it within its bounds."""
+    now = time.time()
+    index = {
+        indexed: entry for indexed, entry in cache.get(STATS_INDEX_KEY, {}).items()
+        if indexed != key and entry[1] > now
+    }
+    # Insertion order is caching order, so the oldest entries come first
+    index[key] = (combination, now + STATS_CACHE_TIMEOUT)
+    evicted = list(index)[:-STATS_INDEX_MAX_KEYS]
+    if evicted:
+        # An entry the index forgets could no longer be invalidated
+        cache.delete_many(evicted)
+        for indexed in evicted:
+            del index[indexed]
+    # Every indexed entry expires by now + STATS_CACHE_TIMEOUT, and so can the index
+    cache.set(STATS_INDEX_KEY, index, STATS_CACHE_TIMEOUT)
+
+
+def snapshot(property):
+    """The values of a property the cached statistics depend on, or None if it is not public."""
+    if property is None or not property.is_published:
+        return None
+    return {
+        'listing_type': property.listing_type.lower(),
+        'property_type': property.property_type.lower(),
+        'city': property.city.lower(),
+        'price': property.price,
+        'area': property.area,
+    }
+
+
+def _matches(combination, snap):
+    listing_type, property_type, city = combination
+    return (
+        listing_type in ('', snap['listing_type'])
+        and property_type in ('', snap['property_type'])
+        and city in snap['city']
+    )
+
+
+def invalidate(old, new):
+    """Drop the cached statistics a change from snapshot ``old`` to ``new`` affects."""
+    if old != new:
+        invalidate_snapshots([old, new])
+
+
+def invalidate_snapshots(snapshots):
+    """Drop the cached statistics whose filters any of ``snapshots`` matches."""
+    snapshots = [snap for snap in snapshots if snap is not None]
+    if not snapshots:
+        return
+    index = cache.get(STATS_INDEX_KEY, {})
+    stale = {
+        key for key, (combination, _) in index.items()
+        if any(_matches(combination, snap) for snap in snapshots)
+    }
+    if stale:
+        cache.delete_many(list(stale))
+        cache.set(
+            STATS_INDEX_KEY, {key: entry for key, entry in index.items() if key not in stale}, STATS_CACHE_TIMEOUT
+        )
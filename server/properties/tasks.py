@@ -0,0 +1,47 @@
+"""
+Minimal background execution for work that should not hold up a request.
+
+Jobs are handed to a small thread pool once the surrounding transaction
+commits, so they never see uncommitted rows. Set ``BACKGROUND_TASKS_EAGER``
+to True (as the tests do) to run them inline instead.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                thread_name_prefix='background-task'
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        # Each worker thread holds its own connection; don't leak it
+        connection.close()
+
+
+def enqueue(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` off the request thread after commit."""
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, args, kwargs))
@@ -0,0 +1,247 @@
+"""
+Resumable chunked uploads for listing feeds and images.
+
+A single multipart POST has to start over when the connection drops. Large
+feeds and batches of phone photos often do. ``ChunkedUploadViewSet`` instead
+takes a file in pieces:
+
+    POST   uploads/                {filename, size, sha256, purpose, target}
+    PUT    uploads/<id>/           raw bytes, Content-Range: bytes 0-8388607/52428800
+    GET    uploads/<id>/           how much has arrived (``offset``), to resume from
+    POST   uploads/<id>/complete/  verify the checksum and create the row
+
+Each PUT is streamed into ``<CHUNKED_UPLOAD_DIR>/<id>.part`` at its offset,
+so a chunk is never held in memory whole. A chunk may start anywhere up to
+the current offset, which makes a retried chunk harmless. Completing an upload
+hashes the assembled file and passes it to the usual creation path:
+``UploadedFileSerializer`` (and the feed import) for feeds,
+``PropertyImageSerializer`` / ``RoomImageSerializer`` for images. The
+verified digest goes along, so the content-addressed storage does not hash
+the file again.
+
+Parts live on local disk, so every app server answering uploads must share
+``CHUNKED_UPLOAD_DIR``. Abandoned uploads are removed by
+``purge_chunked_uploads``.
+"""
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from . import tasks
+
+READ_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+# purpose -> (allowed extensions, largest file in bytes)
+PURPOSES = {
+    'feed': (('.xml',), 100 * 1024 * 1024),
+    'property_image': (IMAGE_EXTENSIONS, 50 * 1024 * 1024),
+    'room_image': (IMAGE_EXTENSIONS, 50 * 1024 * 1024),
+}
+
+
+class UploadConflict(APIException):
+    """A chunk that does not continue the upload; the body carries the offset to resume from."""
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'conflict'
+
+    def __init__(self, message, offset):
+        super().__init__({'error': message})
+        # Kept a number, not coerced to an error string
+        self.detail['offset'] = offset
+
+
+class AssembledFile(UploadedFile):
+    """A finished upload read from its part file, with the digest it was verified against."""
+
+    def __init__(self, path, name, size, content_hash):
+        super().__init__(open(path, 'rb'), name=name, size=size)
+        self.path = path
+        self.content_hash = content_hash
+
+    def temporary_file_path(self):
+        # Lets FileSystemStorage move the part into place instead of copying it
+        return self.path
+
+
+def upload_dir():
+    return getattr(settings, 'CHUNKED_UPLOAD_DIR', '') or os.path.join(tempfile.gettempdir(), 'chunked-uploads')
+
+
+def part_path(upload):
+    return os.path.join(upload_dir(), f'{upload.pk}.part')
+
+
+def max_chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', MAX_CHUNK_SIZE)
+
+
+def parse_content_range(header, size):
+    """``(start, end)`` of ``Content-Range: bytes <start>-<end>/<size>``, end inclusive."""
+    try:
+        unit, _, spec = header.partition(' ')
+        span, _, total = spec.partition('/')
+        start, end = (int(value) for value in span.split('-'))
+        total = int(total)
+    except ValueError:
+        raise ValidationError({'Content-Range': 'Expected "bytes <start>-<end>/<size>".'})
+    if unit != 'bytes' or total != size or not 0 <= start <= end < size:
+        raise ValidationError({'Content-Range': f'Expected a byte range within 0-{size - 1}/{size}.'})
+    if end - start + 1 > max_chunk_size():
+        raise ValidationError({'Content-Range': f'Chunks may be at most {max_chunk_size()} bytes.'})
+    return start, end
+
+
+def write_chunk(upload, stream, content_range):
+    """
+    Append the bytes of ``stream`` at the start of ``content_range`` and
+    return the upload with its new offset. If the stream ends early, the
+    bytes that did arrive are kept and the client resumes after them.
+    """
+    from .models import ChunkedUpload
+
+    start, end = parse_content_range(content_range, upload.size)
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != 'uploading':
+            raise UploadConflict('The upload is already complete.', upload.offset)
+        if start > upload.offset:
+            raise UploadConflict(f'Expected a chunk starting at or before byte {upload.offset}.', upload.offset)
+
+        path = part_path(upload)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        remaining = end - start + 1
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+            part.seek(start)
+            while remaining:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                part.write(data)
+                remaining -= len(data)
+            part.truncate()
+            upload.offset = part.tell()
+        upload.save(update_fields=['offset', 'updated_at'])
+    return upload
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _create_feed(upload, file, request):
+    from api.feeds import ingest_uploaded_file
+    from api.serializers import UploadedFileSerializer
+
+    serializer = UploadedFileSerializer(data={'file': file}, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    uploaded = serializer.save(uploaded_by=request.user)
+    tasks.enqueue(ingest_uploaded_file, uploaded.pk)
+    return serializer.data
+
+
+def _create_property_image(upload, file, request):
+    from .models import Property
+    from .serializers import PropertyImageSerializer
+
+    property = Property.objects.filter(slug=upload.target).first()
+    if property is None:
+        raise ValidationError({'target': 'The property this image was for no longer exists.'})
+    serializer = PropertyImageSerializer(data={'image': file}, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    serializer.save(property=property, is_primary=not property.images.exists())
+    return serializer.data
+
+
+def _create_room_image(upload, file, request):
+    from .models import RoomType
+    from .serializers import RoomImageSerializer
+
+    room_type = RoomType.objects.filter(pk=upload.target).first()
+    if room_type is None:
+        raise ValidationError({'target': 'The room type this image was for no longer exists.'})
+    serializer = RoomImageSerializer(data={'image': file}, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    serializer.save(room_type=room_type, is_primary=not room_type.images.exists())
+    return serializer.data
+
+
+CREATORS = {
+    'feed': _create_feed,
+    'property_image': _create_property_image,
+    'room_image': _create_room_image,
+}
+
+
+def complete(upload, request):
+    """
+    Verify the assembled file against the declared SHA-256 and create the
+    row it was uploaded for. Returns ``(result, created)``: the created row
+    as serialized by its usual serializer, and False on a repeated call.
+
+    The upload row stays locked while the file is hashed and the row is
+    created, so concurrent completes create it once and a PUT cannot
+    rewrite the part underneath.
+    """
+    from .models import ChunkedUpload
+
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == 'complete':
+            return upload.result, False
+        if upload.offset != upload.size:
+            raise UploadConflict(f'Only {upload.offset} of {upload.size} bytes have arrived.', upload.offset)
+
+        path = part_path(upload)
+        matches = file_sha256(path) == upload.sha256
+        if matches:
+            file = AssembledFile(path, os.path.basename(upload.filename), upload.size, upload.sha256)
+            try:
+                upload.result = CREATORS[upload.purpose](upload, file, request)
+            finally:
+                file.close()
+            upload.status = 'complete'
+            upload.save(update_fields=['result', 'status', 'updated_at'])
+        else:
+            # The parts are not what the client meant to send; start over
+            discard_part(upload)
+            upload.offset = 0
+            upload.save(update_fields=['offset', 'updated_at'])
+    if not matches:
+        raise ValidationError({'sha256': 'The assembled file does not match the checksum; upload it again.'})
+    discard_part(upload)
+    return upload.result, True
+
+
+def discard_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired(max_age=None):
+    """Delete uploads (and their parts) untouched for ``max_age``. Returns how many."""
+    from .models import ChunkedUpload
+
+    if max_age is None:
+        max_age = timedelta(hours=getattr(settings, 'CHUNKED_UPLOAD_EXPIRY_HOURS', 24))
+    expired = list(ChunkedUpload.objects.filter(updated_at__lt=timezone.now() - max_age))
+    for upload in expired:
+        discard_part(upload)
+    ChunkedUpload.objects.filter(pk__in=[upload.pk for upload in expired]).delete()
+    return len(expired)
@@ -22,6 +22,7 @@ router.register(r'blog/posts', views.BlogPostViewSet, basename='blogpost')
 router.register(r'amenities', views.AmenityViewSet, basename='amenity')
 router.register(r'tags', views.TagViewSet, basename='tag')
 router.register(r'dashboard', views.DashboardViewSet, basename='dashboard')
+router.register(r'uploads', views.ChunkedUploadViewSet, basename='chunked-upload')
 
 # Nested routers for related resources
 property_router = routers.NestedSimpleRouter(router, r'properties', lookup='property')
@@ -37,6 +38,7 @@ room_type_router.register(r'images', views.RoomImageViewSet, basename='room-type
 
 # Bookings (can be accessed at /bookings/ or /hotels/<slug>/bookings/)
 router.register(r'bookings', views.BookingViewSet, basename='booking')
+router.register(r'quotes', views.QuoteViewSet, basename='quote')
 hotel_router.register(r'bookings', views.BookingViewSet, basename='hotel-booking')
 
 urlpatterns = [
@@ -1,5 +1,6 @@
-from rest_framework import viewsets, status, permissions, filters, generics
+from rest_framework import viewsets, mixins, status, permissions, filters, generics
 from rest_framework.decorators import action, permission_classes
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
@@ -8,32 +9,58 @@ from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth import get_user_model
 
-from .filters import PropertyFilter
+from .filters import PropertyFilter, PropertySearchFilter, PropertyOrderingFilter
+from . import (
+    amenity_bitmap, availability, facets, geo, holds, occupancy, quotes, reservations, response_cache, stats,
+    uploads,
+)
+from .conditional import ConditionalRetrieveMixin
+from .export import ExportMixin
+from .fast_serializers import FastListMixin
+from .fieldsets import SparseFieldsetMixin
+from .loaders import with_page_relations
+from .pagination import KeysetPaginationMixin
+from .response_cache import AnonymousResponseCacheMixin
 
 from .models import (
     Property, PropertyImage, Hotel, RoomType, RoomImage, 
-    Booking, Amenity, Inquiry, BlogPost, Tag
+    Booking, Amenity, Inquiry, BlogPost, Tag, ChunkedUpload
 )
 from .serializers import (
     PropertySerializer, PropertyImageSerializer, HotelSerializer,
     RoomTypeSerializer, RoomImageSerializer, BookingSerializer,
     AmenitySerializer, InquirySerializer, BlogPostSerializer, TagSerializer,
-    UserSerializer
+    UserSerializer, ChunkedUploadSerializer, QuoteRequestSerializer
 )
 
 User = get_user_model()
 
-class PropertyViewSet(viewsets.ModelViewSet):
+class PropertyViewSet(AnonymousResponseCacheMixin, ConditionalRetrieveMixin, FastListMixin,
+                      SparseFieldsetMixin, KeysetPaginationMixin, ExportMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows properties to be viewed or edited.
     Uses basic filtering to avoid issues with django-filter/DRF integration.
+    Pass ?pagination=cursor for count-free keyset pagination.
+    Pass ?fields= / ?expand= to trim list and detail responses.
+    Anonymous list/detail responses are served from the response cache, and
+    lists are rendered by the compiled FastListSerializer.
+    Detail responses carry ETag / Last-Modified and answer conditional GETs.
+    Staff can stream the filtered list from export/csv/ or export/ndjson/.
     """
     serializer_class = PropertySerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]  # Remove DjangoFilterBackend
+    filter_backends = [PropertySearchFilter, PropertyOrderingFilter]  # Remove DjangoFilterBackend
     search_fields = ['title', 'description', 'address', 'city', 'country']
-    ordering_fields = ['price', 'created_at', 'area']
+    ordering_fields = ['price', 'created_at', 'area', 'distance']
+    cursor_ordering_fields = ('created_at', 'price', 'area')
+    conditional_related_stamps = ('amenities__updated_at',)
     lookup_field = 'slug'
     parser_classes = [MultiPartParser, FormParser]
+    export_fields = (
+        'id', 'slug', 'title', 'description', 'property_type', 'listing_type', 'price',
+        'bedrooms', 'bathrooms', 'area', 'address', 'city', 'country', 'latitude', 'longitude',
+        'is_featured', 'is_published', 'owner__email', 'created_at', 'updated_at',
+    )
+    export_filename = 'properties'
     
     def get_permissions(self):
         """
@@ -109,12 +136,23 @@ class PropertyViewSet(viewsets.ModelViewSet):
         if max_area:
             queryset = queryset.filter(area__lte=max_area)
             
-        # Amenities filtering
-        amenities = params.getlist('amenities')
-        if amenities:
-            queryset = queryset.filter(amenities__id__in=amenities).distinct()
+        # Amenities filtering: ?amenities=1,2 (any of them), or all of them
+        # with ?amenities_match=all; answered from the amenity bitmap
+        queryset = amenity_bitmap.filter_from_params(queryset, params)
+            
+        # Map viewport filtering: ?bbox=west,south,east,north
+        bbox = params.get('bbox')
+        if bbox:
+            queryset = geo.filter_bbox(queryset, *geo.parse_bbox(bbox))
             
-        return queryset.prefetch_related('images', 'amenities')
+        # Radius filtering: ?near=lat,lng&radius_km=, nearest first
+        near = params.get('near')
+        if near:
+            latitude, longitude = geo.parse_point(near)
+            radius_km = geo.parse_radius(params.get('radius_km'))
+            queryset = geo.filter_near(queryset, latitude, longitude, radius_km).order_by('distance')
+            
+        return self.with_fieldset(queryset, with_page_relations)
     
     def perform_create(self, serializer):
         """Save the property with the current user as the owner."""
@@ -142,14 +180,21 @@ class PropertyViewSet(viewsets.ModelViewSet):
         
     @action(detail=True, methods=['get'])
     def similar(self, request, slug=None):
-        """Get similar properties based on property type and location."""
+        """
+        Get similar properties from the precomputed neighbour index, falling
+        back to matching type, city or amenities until the index has a list.
+        """
         property = self.get_object()
-        similar = Property.objects.filter(
-            Q(property_type=property.property_type) | 
-            Q(city=property.city) |
-            Q(amenities__in=property.amenities.all()),
-            is_published=True
-        ).exclude(id=property.id).distinct()[:4]
+        similar = list(with_page_relations(Property.objects.filter(
+            neighbour_of__property=property, is_published=True
+        ).order_by('neighbour_of__rank'))[:4])
+        if not similar:
+            similar = with_page_relations(Property.objects.filter(
+                Q(property_type=property.property_type) | 
+                Q(city=property.city) |
+                Q(amenities__in=property.amenities.all()),
+                is_published=True
+            ).exclude(id=property.id).distinct())[:4]
         
         page = self.paginate_queryset(similar)
         if page is not None:
@@ -159,11 +204,38 @@ class PropertyViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(similar, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """Hit/miss counters of the anonymous response cache (staff only)."""
+        return Response(response_cache.stats())
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Counts per property type, listing type, bedrooms, city and amenity for
+        the rows matching the current filters, in one round trip.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(facets.get_facets(
+            queryset, request.query_params, public=not request.user.is_staff
+        ))
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Min/max/mean, percentiles and a histogram (?bins=, default 20) of
+        price and area over the rows matching the current filters.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(stats.get_stats(
+            queryset, request.query_params, public=not request.user.is_staff
+        ))
+
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'facets', 'stats']:
             permission_classes = [permissions.AllowAny]
         elif self.action in ['create', 'upload_image', 'set_primary_image']:
             permission_classes = [permissions.IsAuthenticated]
@@ -207,10 +279,11 @@ class PropertyViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            PropertyImage.objects.filter(property=property).update(is_primary=False)
             image = PropertyImage.objects.get(id=image_id, property=property)
+            PropertyImage.objects.filter(property=property).exclude(pk=image.pk).update(is_primary=False)
             image.is_primary = True
-            image.save()
+            # post_save moves the property's cover to this image
+            image.save(update_fields=['is_primary'])
             return Response({"status": "primary image updated"})
         except PropertyImage.DoesNotExist:
             return Response(
@@ -239,9 +312,16 @@ class PropertyImageViewSet(viewsets.ModelViewSet):
         serializer.save(property=property, is_primary=is_primary)
 
 
-class HotelViewSet(viewsets.ModelViewSet):
+class HotelViewSet(ConditionalRetrieveMixin, SparseFieldsetMixin, KeysetPaginationMixin,
+                   viewsets.ModelViewSet):
     """
     API endpoint for managing hotels.
+    Pass ?pagination=cursor for count-free keyset pagination.
+    Pass ?fields= / ?expand= to trim list and detail responses.
+    Pass ?check_in=&check_out=&guests= for hotels with a free room type,
+    annotated with its cheapest_price.
+    Managers get daily booked/available units per room type from calendar/.
+    Detail responses carry ETag / Last-Modified and answer conditional GETs.
     """
     queryset = Hotel.objects.filter(is_active=True).order_by('-created_at')
     serializer_class = HotelSerializer
@@ -249,8 +329,17 @@ class HotelViewSet(viewsets.ModelViewSet):
     filterset_fields = ['city', 'country', 'star_rating']
     search_fields = ['name', 'description', 'address', 'city', 'country']
     ordering_fields = ['star_rating', 'created_at']
+    cursor_ordering_fields = ('created_at', 'star_rating')
+    conditional_related_stamps = ('amenities__updated_at',)
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # ?amenities=1,2 with optional ?amenities_match=all
+        queryset = amenity_bitmap.filter_from_params(queryset, self.request.query_params)
+        queryset = availability.filter_from_params(queryset, self.request.query_params)
+        return self.with_fieldset(queryset)
+
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             permission_classes = [permissions.AllowAny]
@@ -263,6 +352,16 @@ class HotelViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(manager=self.request.user)
 
+    @action(detail=True, methods=['get'])
+    def calendar(self, request, slug=None):
+        """Booked and available units per room type and day, ?start=&end= (or ?days=)."""
+        hotel = self.get_object()
+        if not (request.user.is_staff or hotel.manager_id == request.user.pk):
+            raise PermissionDenied("Only the hotel's manager can see its calendar.")
+        start, end = occupancy.parse_window(request.query_params, timezone.now().date())
+        room_types = hotel.room_types.filter(is_active=True).order_by('pk')
+        return Response({'hotel': hotel.slug, **occupancy.build_calendar(room_types, start, end).as_dict()})
+
     @action(detail=True, methods=['post'], parser_classes=[MultiPartParser])
     def upload_image(self, request, slug=None):
         hotel = self.get_object()
@@ -327,8 +426,12 @@ class RoomTypeViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         hotel_slug = self.kwargs.get('hotel_slug')
         if hotel_slug:
-            return RoomType.objects.filter(hotel__slug=hotel_slug, is_active=True)
-        return RoomType.objects.filter(is_active=True)
+            queryset = RoomType.objects.filter(hotel__slug=hotel_slug, is_active=True)
+        else:
+            queryset = RoomType.objects.filter(is_active=True)
+        # ?amenities=1,2 with optional ?amenities_match=all
+        queryset = amenity_bitmap.filter_from_params(queryset, self.request.query_params)
+        return queryset
 
     def perform_create(self, serializer):
         hotel_slug = self.kwargs.get('hotel_slug')
@@ -336,21 +439,34 @@ class RoomTypeViewSet(viewsets.ModelViewSet):
         serializer.save(hotel=hotel)
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(FastListMixin, KeysetPaginationMixin, ExportMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing bookings.
+    Pass ?pagination=cursor for count-free keyset pagination.
+    Lists are rendered by the compiled FastListSerializer.
+    Staff can stream the filtered list from export/csv/ or export/ndjson/.
+    Creates lock only the booked room type and accept an Idempotency-Key
+    header, so a resent request returns the booking it made.
+    Pending bookings expire after BOOKING_HOLD_TTL_MINUTES, see holds.py.
     """
     serializer_class = BookingSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'check_in_date', 'check_out_date']
+    export_fields = (
+        'id', 'user__email', 'room_type_id', 'room_type__name', 'room_type__hotel__slug',
+        'check_in_date', 'check_out_date', 'status', 'total_price', 'guest_count',
+        'special_requests', 'created_at', 'updated_at',
+    )
+    export_filename = 'bookings'
     
     def get_permissions(self):
         if self.action in ['create']:
             permission_classes = [permissions.IsAuthenticated]
-        elif self.action in ['update', 'partial_update', 'destroy']:
+        elif self.action in ['update', 'partial_update', 'destroy', 'export']:
             permission_classes = [permissions.IsAdminUser]
         else:
-            permission_classes = [permissions.IsAdminUser | permissions.IsOwner]
+            # get_queryset() limits non-staff users to their own bookings
+            permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
@@ -359,8 +475,21 @@ class BookingViewSet(viewsets.ModelViewSet):
             return Booking.objects.all()
         return Booking.objects.filter(user=user)
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+    def create(self, request, *args, **kwargs):
+        key = reservations.idempotency_key(request)
+        booking = reservations.replayed(request.user, key)
+        if booking is None:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            booking, created = reservations.create_booking(serializer, request.user, key)
+            if created:
+                holds.schedule_sweep()
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
+        reservations.check_replay(booking, request.data)
+        return Response(
+            self.get_serializer(booking).data, status=status.HTTP_200_OK,
+            headers={'Idempotent-Replayed': 'true'}
+        )
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -383,16 +512,36 @@ class BookingViewSet(viewsets.ModelViewSet):
         return Response({"status": "booking cancelled"})
 
 
-class InquiryViewSet(viewsets.ModelViewSet):
+class QuoteViewSet(viewsets.ViewSet):
+    """
+    Prices for room stays. POST {"stays": [{"room_type", "check_in",
+    "check_out", "guests"}, ...]} quotes up to 100 stays in one request.
+    Bookings take their total_price from these quotes while they are cached.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def create(self, request):
+        serializer = QuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'quotes': quotes.quote_stays(serializer.validated_data['stays'])})
+
+
+class InquiryViewSet(ExportMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing property inquiries.
+    Staff can stream them from export/csv/ or export/ndjson/.
     """
     serializer_class = InquirySerializer
+    export_fields = (
+        'id', 'property__slug', 'name', 'email', 'phone', 'message', 'is_read',
+        'created_at', 'updated_at',
+    )
+    export_filename = 'inquiries'
     
     def get_permissions(self):
         if self.action in ['create']:
             permission_classes = [permissions.AllowAny]
-        elif self.action in ['update', 'partial_update', 'destroy']:
+        elif self.action in ['update', 'partial_update', 'destroy', 'export']:
             permission_classes = [permissions.IsAdminUser]
         else:
             permission_classes = [permissions.IsAdminUser | permissions.IsAuthenticated]
@@ -410,9 +559,11 @@ class InquiryViewSet(viewsets.ModelViewSet):
         serializer.save(property=property)
 
 
-class BlogPostViewSet(viewsets.ModelViewSet):
+class BlogPostViewSet(ConditionalRetrieveMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing blog posts.
+    Pass ?fields= / ?expand= to trim list and detail responses.
+    Detail responses carry ETag / Last-Modified and answer conditional GETs.
     """
     serializer_class = BlogPostSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -444,14 +595,54 @@ class BlogPostViewSet(viewsets.ModelViewSet):
             
         # For admin users, include unpublished posts in list view
         if self.request.user.is_staff and self.action == 'list':
-            return BlogPost.objects.all()
+            return self.with_fieldset(BlogPost.objects.all())
             
-        return queryset
+        return self.with_fieldset(queryset)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
+class ChunkedUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint for resumable uploads of feeds and images (see uploads.py).
+    POST starts an upload, PUT sends a chunk with Content-Range, GET tells
+    where to resume and POST complete/ verifies the checksum and creates
+    the file, property image or room image.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        uploads.discard_part(instance)
+        instance.delete()
+
+    def update(self, request, pk=None):
+        """Write one chunk of the raw request body."""
+        upload = self.get_object()
+        content_range = request.headers.get('Content-Range')
+        if not content_range:
+            return Response(
+                {"error": "Content-Range header is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # request.stream is read directly, never parsed into request.data
+        upload = uploads.write_chunk(upload, request.stream, content_range)
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        result, created = uploads.complete(self.get_object(), request)
+        return Response(result, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
 class AmenityViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing amenities.
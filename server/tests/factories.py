@@ -0,0 +1,27 @@
+"""Builders shared by the test modules."""
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from properties.models import Hotel, RoomType
+
+
+def image_file(name='photo.jpg', size=(64, 48), color=(200, 120, 40), image_format='JPEG', mode='RGB', exif=None):
+    """A generated image as an upload; ``.read()`` gives its bytes."""
+    buffer = io.BytesIO()
+    options = {'exif': exif} if exif is not None else {}
+    Image.new(mode, size, (*color, 128)[:len(mode)]).save(buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+def make_room_type(manager, quantity):
+    """A room type with ``quantity`` units in a new hotel managed by ``manager``."""
+    hotel = Hotel.objects.create(
+        name='Harbour Hotel', slug='harbour-hotel', description='Test hotel', address='Harbour Road',
+        city='Mombasa', country='Kenya', star_rating=4, manager=manager,
+    )
+    return RoomType.objects.create(
+        hotel=hotel, name='Double', description='Two beds', max_guests=2,
+        price_per_night='90.00', quantity=quantity,
+    )
@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties import amenity_bitmap
+from properties.models import Property, Amenity, Hotel, RoomType
+
+User = get_user_model()
+
+
+class AmenityBitmapTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='bitmap@example.com',
+            password='testpass123',
+            first_name='Bitmap',
+            last_name='Owner'
+        )
+        cls.wifi, cls.parking, cls.pool = (
+            Amenity.objects.create(name=name) for name in ('WiFi', 'Parking', 'Pool')
+        )
+        cls.all_three = cls.create('All three', [cls.wifi, cls.parking, cls.pool])
+        cls.wifi_parking = cls.create('WiFi and parking', [cls.wifi, cls.parking])
+        cls.pool_only = cls.create('Pool only', [cls.pool])
+        cls.bare = cls.create('Nothing', [])
+
+    @classmethod
+    def create(cls, title, amenities):
+        property = Property.objects.create(
+            owner=cls.owner, title=title, description='Test listing', property_type='house',
+            listing_type='rent', price=1000, bedrooms=2, bathrooms=1, area=80,
+            address='1 Test Street', city='Dodoma', country='Tanzania',
+        )
+        property.amenities.set(amenities)
+        return property
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def titles(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('property-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        listing_sql = [q['sql'] for q in context.captured_queries if 'FROM "properties_property"' in q['sql']]
+        for sql in listing_sql:
+            self.assertNotIn('DISTINCT', sql)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return {row['title'] for row in rows}
+
+    def test_masks_follow_m2m_changes(self):
+        masks = dict(Property.objects.values_list('title', 'amenity_mask'))
+        self.assertEqual(masks['All three'], (1 << self.wifi.bit) | (1 << self.parking.bit) | (1 << self.pool.bit))
+        self.assertEqual(masks['Nothing'], 0)
+
+        self.pool.properties.add(self.bare)
+        self.wifi.properties.remove(self.all_three)
+        self.wifi_parking.amenities.clear()
+        masks = dict(Property.objects.values_list('title', 'amenity_mask'))
+        self.assertEqual(masks['Nothing'], 1 << self.pool.bit)
+        self.assertEqual(masks['All three'], (1 << self.parking.bit) | (1 << self.pool.bit))
+        self.assertEqual(masks['WiFi and parking'], 0)
+
+        self.pool.delete()
+        self.assertEqual(Property.objects.get(pk=self.bare.pk).amenity_mask, 0)
+
+    def test_all_and_any_filters(self):
+        ids = f'{self.wifi.id},{self.parking.id}'
+        self.assertEqual(self.titles(amenities=ids, amenities_match='all'), {'All three', 'WiFi and parking'})
+        self.assertEqual(
+            self.titles(amenities=[self.parking.id, self.pool.id]),
+            {'All three', 'WiFi and parking', 'Pool only'}
+        )
+        self.assertEqual(self.titles(amenities='999999', amenities_match='all'), set())
+
+    def test_amenities_without_a_bit_fall_back_to_the_join(self):
+        Amenity.objects.filter(pk=self.pool.pk).update(bit=None)
+        self.assertEqual(
+            self.titles(amenities=f'{self.wifi.id},{self.pool.id}', amenities_match='all'), {'All three'}
+        )
+        self.assertEqual(
+            self.titles(amenities=f'{self.parking.id},{self.pool.id}'),
+            {'All three', 'WiFi and parking', 'Pool only'}
+        )
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('property-list'), {'amenities': 'wifi'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('property-list'), {'amenities': '1', 'amenities_match': 'most'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hotels_and_room_types(self):
+        hotel = Hotel.objects.create(
+            name='Lake Hotel', slug='lake-hotel', description='Test hotel', address='Lake Road',
+            city='Dodoma', country='Tanzania', star_rating=4, manager=self.owner,
+        )
+        hotel.amenities.set([self.wifi, self.pool])
+        room_type = RoomType.objects.create(
+            hotel=hotel, name='Double', description='Two beds', max_guests=2,
+            price_per_night='80.00', quantity=3,
+        )
+        room_type.amenities.set([self.wifi])
+
+        both = [self.wifi.id, self.pool.id]
+        self.assertEqual(
+            list(amenity_bitmap.filter_amenities(Hotel.objects.all(), both, 'all')), [hotel]
+        )
+        self.assertEqual(
+            list(amenity_bitmap.filter_amenities(RoomType.objects.all(), both, 'all')), []
+        )
+        self.assertEqual(
+            list(amenity_bitmap.filter_amenities(RoomType.objects.all(), both, 'any')), [room_type]
+        )
+
+    def test_bit_taken_concurrently_is_retried(self):
+        sauna = Amenity.objects.create(name='Sauna')
+        exclude = Amenity.objects.exclude
+        reads = []
+
+        def read_before_sauna(*args, **kwargs):
+            # The first read misses the bit a concurrent create just took
+            reads.append(kwargs)
+            queryset = exclude(*args, **kwargs)
+            return queryset.exclude(pk=sauna.pk) if len(reads) == 1 else queryset
+
+        with mock.patch.object(Amenity.objects, 'exclude', side_effect=read_before_sauna):
+            gym = Amenity.objects.create(name='Gym')
+        self.assertEqual(len(reads), 2)
+        self.assertEqual(gym.bit, sauna.bit + 1)
+
+        with self.assertRaises(IntegrityError):
+            Amenity.objects.create(name='Gym')
@@ -0,0 +1,159 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, close_old_connections, connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties import quotes, reservations
+from properties.models import Booking, RoomNight
+from tests.factories import make_room_type
+
+User = get_user_model()
+
+
+def stay_payload(room_type, check_in, nights=2):
+    quotes.quote_stays([{
+        'room_type': room_type.pk, 'check_in': check_in,
+        'check_out': check_in + timedelta(days=nights), 'guests': 1,
+    }])
+    return {
+        'room_type': room_type.pk, 'check_in_date': check_in.isoformat(),
+        'check_out_date': (check_in + timedelta(days=nights)).isoformat(), 'guest_count': 1,
+    }
+
+
+class BookingIdempotencyTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(
+            email='guest@example.com',
+            password='testpass123',
+            first_name='Guest',
+            last_name='User'
+        )
+        cls.room_type = make_room_type(cls.guest, quantity=2)
+        cls.check_in = timezone.now().date() + timedelta(days=15)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.guest)
+
+    def post(self, payload, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(reverse('booking-list'), payload, format='json', **headers)
+
+    def test_resent_request_returns_the_same_booking(self):
+        payload = stay_payload(self.room_type, self.check_in)
+        first = self.post(payload, key='order-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED, first.data)
+
+        # The resend books nothing, so it needs no live quote
+        cache.clear()
+        again = self.post(payload, key='order-1')
+        self.assertEqual(again.status_code, status.HTTP_200_OK, again.data)
+        self.assertEqual(again['Idempotent-Replayed'], 'true')
+        self.assertEqual(again.data['id'], first.data['id'])
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(set(RoomNight.objects.values_list('booked', flat=True)), {1})
+
+        # Keys belong to their user
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.post(stay_payload(self.room_type, self.check_in), key='order-1').status_code,
+                         status.HTTP_201_CREATED)
+
+    def test_key_reused_for_another_stay_is_refused(self):
+        self.post(stay_payload(self.room_type, self.check_in), key='order-2')
+        response = self.post(stay_payload(self.room_type, self.check_in + timedelta(days=5)), key='order-2')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Booking.objects.count(), 1)
+
+        response = self.post(stay_payload(self.room_type, self.check_in), key='x' * 65)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_locked_database_is_retried_then_reported_busy(self):
+        payload = stay_payload(self.room_type, self.check_in)
+        locked = OperationalError('database is locked')
+        with mock.patch.object(reservations, 'lock_room_type', side_effect=[locked, locked, None]), \
+                mock.patch.object(reservations.time, 'sleep') as sleep:
+            response = self.post(payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(sleep.call_count, 2)
+
+        with self.settings(BOOKING_CREATE_RETRIES=2), \
+                mock.patch.object(reservations, 'lock_room_type', side_effect=locked), \
+                mock.patch.object(reservations.time, 'sleep'):
+            response = self.post(payload)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class BookingContentionTestCase(TransactionTestCase):
+    """Parallel API creates on one room type: no overbooking and one booking per key."""
+    THREADS = 8
+    QUANTITY = 5
+
+    def setUp(self):
+        cache.clear()
+        self.guest = User.objects.create_user(
+            email='crowd@example.com',
+            password='testpass123',
+            first_name='Crowd',
+            last_name='User'
+        )
+        self.room_type = make_room_type(self.guest, quantity=self.QUANTITY)
+        self.payload = stay_payload(self.room_type, timezone.now().date() + timedelta(days=40))
+
+    def test_parallel_creates(self):
+        first, resent = [], {}
+        start = threading.Barrier(self.THREADS)
+
+        def post(client, key):
+            while True:
+                try:
+                    return client.post(
+                        reverse('booking-list'), self.payload, format='json', HTTP_IDEMPOTENCY_KEY=key
+                    ).status_code
+                except OperationalError:
+                    # The shared-cache test database locks whole tables, even for
+                    # the reads around the create; a client would resend
+                    time.sleep(0.005)
+
+        def worker(index):
+            client = APIClient()
+            client.force_authenticate(user=self.guest)
+            key = f'key-{index}'
+            start.wait()
+            try:
+                first.append(post(client, key))
+                # Every request is sent twice
+                resent[key] = post(client, key)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(resent), self.THREADS)
+        self.assertLessEqual(set(first), {status.HTTP_201_CREATED, status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST})
+        booked = set(Booking.objects.values_list('idempotency_key', flat=True))
+        self.assertEqual(len(booked), self.QUANTITY)
+        self.assertEqual(Booking.objects.count(), self.QUANTITY)
+        self.assertEqual(set(RoomNight.objects.values_list('booked', flat=True)), {self.QUANTITY})
+        self.assertEqual(
+            resent,
+            {key: status.HTTP_200_OK if key in booked else status.HTTP_400_BAD_REQUEST for key in resent}
+        )
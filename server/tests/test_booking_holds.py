@@ -0,0 +1,140 @@
+import importlib
+from datetime import timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from properties import holds, inventory
+from properties.models import Hotel, RoomType, Booking, RoomNight
+
+User = get_user_model()
+backfill_room_nights = importlib.import_module(
+    'properties.migrations.0012_room_night_inventory'
+).backfill_room_nights
+
+
+@override_settings(BOOKING_HOLD_TTL_MINUTES=30)
+class BookingHoldExpiryTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(
+            email='guest@example.com',
+            password='testpass123',
+            first_name='Guest',
+            last_name='User'
+        )
+        hotel = Hotel.objects.create(
+            name='Rift Valley Inn', slug='rift-valley-inn', description='Test hotel', address='Lake road',
+            city='Naivasha', country='Kenya', star_rating=3, manager=cls.guest,
+        )
+        cls.room_types = [
+            RoomType.objects.create(
+                hotel=hotel, name=name, description='Test room', max_guests=2,
+                price_per_night='60.00', quantity=40,
+            )
+            for name in ('Cottage', 'Chalet')
+        ]
+        cls.check_in = timezone.now().date() + timedelta(days=7)
+
+    def setUp(self):
+        cache.clear()
+
+    def book(self, room_type, offset=0, nights=2, guests=1, status='pending', age=None):
+        check_in = self.check_in + timedelta(days=offset)
+        booking = Booking.objects.create(
+            user=self.guest, room_type=room_type, check_in_date=check_in,
+            check_out_date=check_in + timedelta(days=nights), total_price='120.00',
+            guest_count=guests, status=status,
+        )
+        if age is not None:
+            Booking.objects.filter(pk=booking.pk).update(created_at=timezone.now() - age)
+        return booking
+
+    def booked(self, room_type):
+        return {
+            (date - self.check_in).days: count
+            for date, count in RoomNight.objects.filter(room_type=room_type).values_list('date', 'booked')
+            if count
+        }
+
+    def test_stale_holds_expire_and_free_their_nights(self):
+        cottage, chalet = self.room_types
+        stale = [
+            self.book(cottage, offset=index % 3, guests=1 + index % 2, age=timedelta(hours=1))
+            for index in range(12)
+        ] + [self.book(chalet, nights=1, age=timedelta(minutes=31))]
+        fresh = self.book(cottage, age=timedelta(minutes=10))
+        confirmed = self.book(cottage, status='confirmed', age=timedelta(days=2))
+
+        with mock.patch.object(Booking, 'full_clean') as full_clean, \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(holds.expire_holds(batch_size=5), len(stale))
+        full_clean.assert_not_called()
+        # Three batches: a read, an UPDATE and a few ledger UPDATEs each
+        self.assertLess(len(queries), 30)
+
+        self.assertEqual(
+            set(Booking.objects.filter(pk__in=[booking.pk for booking in stale]).values_list('status', flat=True)),
+            {'expired'}
+        )
+        self.assertEqual(Booking.objects.get(pk=fresh.pk).status, 'pending')
+        self.assertEqual(Booking.objects.get(pk=confirmed.pk).status, 'confirmed')
+        self.assertEqual(self.booked(cottage), {0: 2, 1: 2})
+        self.assertEqual(self.booked(chalet), {})
+        self.assertEqual(holds.expire_holds(), 0)
+
+    def test_ledger_matches_a_rebuild_after_expiry(self):
+        for index in range(8):
+            self.book(self.room_types[index % 2], offset=index, nights=3, guests=2, age=timedelta(hours=index))
+        holds.expire_holds()
+        expected = {room_type.pk: self.booked(room_type) for room_type in self.room_types}
+        RoomNight.objects.all().delete()
+        backfill_room_nights(apps, None)
+        self.assertEqual({room_type.pk: self.booked(room_type) for room_type in self.room_types}, expected)
+
+        # The freed units can be booked again, and expired bookings stay released
+        booking = Booking.objects.filter(status='expired').first()
+        self.assertTrue(inventory.is_available(booking.room_type, booking.check_in_date, booking.check_out_date, 40))
+        booking.special_requests = 'Late arrival'
+        booking.save()
+        self.assertEqual({room_type.pk: self.booked(room_type) for room_type in self.room_types}, expected)
+
+    def test_bookings_changed_after_the_read_are_left_alone(self):
+        cottage = self.room_types[0]
+        stale = self.book(cottage, age=timedelta(hours=1))
+        confirmed = self.book(cottage, offset=3, age=timedelta(hours=1))
+        # Both read as stale holds, then one is confirmed before the UPDATE, as without row locks
+        read = Booking.objects.filter(pk__in=[stale.pk, confirmed.pk]).order_by('created_at')
+        Booking.objects.filter(pk=confirmed.pk).update(status='confirmed')
+        with mock.patch.object(holds, 'stale_holds', return_value=read):
+            self.assertEqual(holds.expire_holds(), 1)
+
+        self.assertEqual(Booking.objects.get(pk=stale.pk).status, 'expired')
+        self.assertEqual(Booking.objects.get(pk=confirmed.pk).status, 'confirmed')
+        self.assertEqual(self.booked(cottage), {3: 1, 4: 1})
+
+    def test_sweep_uses_the_status_index(self):
+        plan = holds.stale_holds().explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn('booking_status_created', plan)
+
+    def test_command_and_scheduled_sweeps(self):
+        self.book(self.room_types[0], age=timedelta(hours=2))
+        call_command('expire_booking_holds', stdout=mock.Mock())
+        self.assertEqual(Booking.objects.get().status, 'expired')
+
+        self.book(self.room_types[0], age=timedelta(hours=2))
+        with self.settings(BACKGROUND_TASKS_EAGER=True):
+            holds.schedule_sweep()
+            self.assertFalse(Booking.objects.filter(status='pending').exists())
+            # Not again within BOOKING_HOLD_SWEEP_SECONDS
+            self.book(self.room_types[0], age=timedelta(hours=2))
+            holds.schedule_sweep()
+        self.assertTrue(Booking.objects.filter(status='pending').exists())
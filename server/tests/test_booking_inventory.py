@@ -0,0 +1,197 @@
+import importlib
+import threading
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, close_old_connections, connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties import inventory
+from properties.models import Booking, RoomNight
+from tests.factories import make_room_type
+
+User = get_user_model()
+backfill_room_nights = importlib.import_module(
+    'properties.migrations.0012_room_night_inventory'
+).backfill_room_nights
+
+
+class BookingInventoryTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(
+            email='guest@example.com',
+            password='testpass123',
+            first_name='Guest',
+            last_name='User'
+        )
+        cls.room_type = make_room_type(cls.guest, quantity=3)
+        cls.check_in = timezone.now().date() + timedelta(days=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.guest)
+
+    def book(self, offset=0, nights=3, guests=1, **kwargs):
+        check_in = self.check_in + timedelta(days=offset)
+        return Booking.objects.create(
+            user=self.guest, room_type=self.room_type, check_in_date=check_in,
+            check_out_date=check_in + timedelta(days=nights), total_price='270.00',
+            guest_count=guests, **kwargs
+        )
+
+    def booked(self):
+        return dict(RoomNight.objects.filter(room_type=self.room_type).values_list('date', 'booked'))
+
+    def night(self, offset):
+        return self.check_in + timedelta(days=offset)
+
+    def test_bookings_take_and_free_nights(self):
+        booking = self.book(guests=2)
+        self.assertEqual(self.booked(), {self.night(0): 2, self.night(1): 2, self.night(2): 2})
+
+        # The last unit on night 2 is taken; a stay over it no longer fits
+        self.book(offset=2, nights=1)
+        with self.assertRaises(inventory.Unavailable):
+            self.book(offset=1, nights=2)
+        self.assertEqual(self.booked()[self.night(1)], 2)
+        self.assertFalse(inventory.is_available(self.room_type, self.night(1), self.night(3)))
+        self.assertTrue(inventory.is_available(self.room_type, self.night(0), self.night(2)))
+
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(self.booked(), {self.night(0): 0, self.night(1): 0, self.night(2): 1})
+
+        # Back to pending takes the nights again
+        booking.status = 'pending'
+        booking.save()
+        self.assertEqual(self.booked()[self.night(0)], 2)
+
+    def test_moving_and_deleting_a_booking(self):
+        booking = self.book(nights=2)
+        booking.check_in_date, booking.check_out_date = self.night(5), self.night(6)
+        booking.save()
+        self.assertEqual(self.booked(), {self.night(0): 0, self.night(1): 0, self.night(5): 1})
+
+        booking.status = 'completed'
+        booking.save()
+        self.assertEqual(self.booked()[self.night(5)], 0)
+
+        other = self.book(guests=3)
+        other.delete()
+        self.assertEqual(set(self.booked().values()), {0})
+
+    def test_cancel_endpoint_releases_nights(self):
+        booking = self.book(guests=3)
+        response = self.client.post(reverse('booking-cancel', args=[booking.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self.booked().values()), {0})
+        self.assertEqual(self.book(guests=3).status, 'pending')
+
+    def test_booking_endpoint_checks_one_row_per_night(self):
+        for offset in range(6):
+            self.book(offset=offset * 4, nights=1)
+        payload = {
+            'room_type': self.room_type.pk, 'check_in_date': self.night(0),
+            'check_out_date': self.night(3), 'guest_count': 2,
+        }
+        stay = {'room_type': self.room_type.pk, 'check_in': self.night(0), 'check_out': self.night(3), 'guests': 2}
+        self.client.post(reverse('quote-list'), {'stays': [stay]}, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('booking-list'), payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertFalse(any(
+            'FROM "properties_booking"' in query['sql'] and '"check_in_date" <' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+        payload['guest_count'] = 1
+        response = self.client.post(reverse('booking-list'), payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_migration_recounts_from_bookings(self):
+        self.book(guests=2)
+        self.book(offset=1, nights=1)
+        self.book(offset=2, status='cancelled')
+        expected = self.booked()
+        RoomNight.objects.all().delete()
+        backfill_room_nights(apps, None)
+        self.assertEqual({date: booked for date, booked in self.booked().items() if booked},
+                         {date: booked for date, booked in expected.items() if booked})
+
+
+class BookingInventoryStressTestCase(TransactionTestCase):
+    """Parallel bookings of the same nights never exceed the room type's quantity."""
+    THREADS = 12
+    ATTEMPTS_PER_THREAD = 4
+    QUANTITY = 5
+
+    def setUp(self):
+        self.guest = User.objects.create_user(
+            email='crowd@example.com',
+            password='testpass123',
+            first_name='Crowd',
+            last_name='User'
+        )
+        self.room_type = make_room_type(self.guest, quantity=self.QUANTITY)
+        self.check_in = timezone.now().date() + timedelta(days=30)
+
+    def test_parallel_bookings_never_overbook(self):
+        outcomes = {'booked': 0, 'unavailable': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(self.THREADS)
+
+        def attempt(offset):
+            # Overlapping stays of one to three nights
+            check_in = self.check_in + timedelta(days=offset % 3)
+            booking = Booking(
+                user=self.guest, room_type=self.room_type, check_in_date=check_in,
+                check_out_date=check_in + timedelta(days=1 + offset % 3), total_price='90.00',
+            )
+            while True:
+                try:
+                    booking.save()
+                    return 'booked'
+                except inventory.Unavailable:
+                    return 'unavailable'
+                except OperationalError:
+                    # SQLite allows one writer at a time; wait for it
+                    booking.pk = None
+                    time.sleep(0.005)
+
+        def worker(index):
+            start.wait()
+            try:
+                for attempt_index in range(self.ATTEMPTS_PER_THREAD):
+                    outcome = attempt(index + attempt_index)
+                    with lock:
+                        outcomes[outcome] += 1
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(outcomes.values()), self.THREADS * self.ATTEMPTS_PER_THREAD)
+        self.assertGreater(outcomes['unavailable'], 0)
+        for offset in range(5):
+            date = self.check_in + timedelta(days=offset)
+            holding = Booking.objects.filter(
+                room_type=self.room_type, status__in=inventory.HOLDING_STATUSES,
+                check_in_date__lte=date, check_out_date__gt=date,
+            ).count()
+            self.assertLessEqual(holding, self.QUANTITY)
+            booked = RoomNight.objects.filter(room_type=self.room_type, date=date).values_list('booked', flat=True)
+            self.assertEqual(list(booked) or [0], [holding])
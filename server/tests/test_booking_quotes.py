@@ -0,0 +1,144 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Hotel, RoomType, RoomRate, Booking
+from properties.quotes import nightly_prices
+
+User = get_user_model()
+
+
+class BookingQuoteTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user(
+            email='guest@example.com',
+            password='testpass123',
+            first_name='Guest',
+            last_name='User'
+        )
+        cls.hotel = Hotel.objects.create(
+            name='Coral Bay', slug='coral-bay', description='Test hotel', address='Beach road',
+            city='Malindi', country='Kenya', star_rating=4, manager=cls.guest,
+        )
+        cls.room_types = [
+            RoomType.objects.create(
+                hotel=cls.hotel, name=f'Room {index}', description='Test room', max_guests=2,
+                price_per_night=f'{100 + index}.00', quantity=2,
+            )
+            for index in range(30)
+        ]
+        cls.double = cls.room_types[0]
+        cls.check_in = timezone.now().date() + timedelta(days=20)
+        # A weekend rate on nights 1-2, overridden by a later rate on night 2
+        RoomRate.objects.create(
+            room_type=cls.double, start_date=cls.night(1), end_date=cls.night(3), price_per_night='150.00'
+        )
+        RoomRate.objects.create(
+            room_type=cls.double, start_date=cls.night(2), end_date=cls.night(3), price_per_night='175.50'
+        )
+
+    @classmethod
+    def night(cls, offset):
+        return cls.check_in + timedelta(days=offset)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def stay(self, room_type=None, offset=0, nights=4, guests=1):
+        return {
+            'room_type': (room_type or self.double).pk, 'check_in': self.night(offset),
+            'check_out': self.night(offset + nights), 'guests': guests,
+        }
+
+    def quote(self, *stays):
+        response = self.client.post(reverse('quote-list'), {'stays': list(stays)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data['quotes']
+
+    def test_rate_overrides_price_their_nights(self):
+        quote, = self.quote(self.stay())
+        self.assertEqual(quote['nightly_prices'], [Decimal('100.00'), Decimal('150.00'), Decimal('175.50'), Decimal('100.00')])
+        self.assertEqual(quote['total_price'], Decimal('525.50'))
+        self.assertTrue(quote['available'])
+        # Each guest takes, and pays for, a unit
+        self.assertEqual(self.quote(self.stay(guests=2))[0]['total_price'], Decimal('1051.00'))
+
+        base = Decimal('80.00')
+        rates = [(self.night(-5), self.night(-1), Decimal('1')), (self.night(3), self.night(9), Decimal('2'))]
+        self.assertEqual(nightly_prices(base, rates, self.night(0), self.night(4)), [base] * 3 + [Decimal('2')])
+
+    def test_batch_costs_a_fixed_number_of_queries_and_is_cached(self):
+        stays = [self.stay(room_type, offset=index % 5) for index, room_type in enumerate(self.room_types)]
+        stays.append(self.stay(guests=3))
+        with CaptureQueriesContext(connection) as queries:
+            quotes = self.quote(*stays)
+        self.assertEqual(len(queries), 3)
+        self.assertEqual([quote['room_type'] for quote in quotes], [stay['room_type'] for stay in stays])
+        self.assertFalse(quotes[-1]['available'])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.quote(*stays), quotes)
+        self.assertEqual(len(queries), 0)
+
+    def test_booking_takes_its_price_from_the_quote(self):
+        self.client.force_authenticate(user=self.guest)
+        payload = {
+            'room_type': self.double.pk, 'check_in_date': self.night(0), 'check_out_date': self.night(4),
+            'guest_count': 1, 'total_price': '1.00',
+        }
+        self.quote(self.stay())
+        response = self.client.post(reverse('booking-list'), payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(Booking.objects.get().total_price, Decimal('525.50'))
+
+        # Without a cached quote (expired, or made on another worker) the stay is priced again
+        cache.clear()
+        payload.update(guest_count=2, check_in_date=self.night(10), check_out_date=self.night(11))
+        response = self.client.post(reverse('booking-list'), payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(Decimal(response.data['total_price']), Decimal('200.00'))
+
+    def test_price_changes_retire_cached_quotes(self):
+        quote, = self.quote(self.stay())
+        rate = RoomRate.objects.create(
+            room_type=self.double, start_date=self.night(0), end_date=self.night(1), price_per_night='999.00'
+        )
+        self.assertEqual(self.quote(self.stay())[0]['total_price'], Decimal('1424.50'))
+        rate.delete()
+        self.assertEqual(self.quote(self.stay())[0], dict(quote, expires_at=mock.ANY))
+
+        self.double.price_per_night = Decimal('90.00')
+        self.double.save()
+        self.assertEqual(self.quote(self.stay())[0]['total_price'], Decimal('505.50'))
+        # Other room types keep their quotes
+        other = self.stay(self.room_types[1])
+        self.quote(other)
+        self.double.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.quote(other)
+        self.assertEqual(len(queries), 0)
+
+    def test_invalid_batches_are_rejected(self):
+        url = reverse('quote-list')
+        past = self.stay()
+        past['check_in'] = timezone.now().date() - timedelta(days=1)
+        for body in (
+            {'stays': []},
+            {'stays': [self.stay()] * 101},
+            {'stays': [self.stay(nights=0)]},
+            {'stays': [past]},
+            {'stays': [self.stay(guests=0)]},
+            {'stays': [dict(self.stay(), room_type=999999)]},
+        ):
+            response = self.client.post(url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, response.data)
@@ -0,0 +1,238 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from api.models import UploadedFile
+from properties import uploads
+from properties.models import Property, PropertyImage, ChunkedUpload
+from tests.factories import image_file
+
+User = get_user_model()
+
+FEED = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<listings>'
+    + ''.join(
+        f'<listing><title>Chunked listing {index}</title><description>Sent in pieces</description>'
+        f'<property_type>house</property_type><listing_type>sale</listing_type><price>{100000 + index}</price>'
+        f'<bedrooms>2</bedrooms><bathrooms>1</bathrooms><area>90</area><address>1 Test road</address>'
+        f'<city>Kigali</city><country>Rwanda</country></listing>'
+        for index in range(40)
+    )
+    + '</listings>'
+).encode('utf-8')
+
+PHOTO = image_file(size=(640, 480)).read()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ChunkedUploadTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='uploader@example.com',
+            password='testpass123',
+            first_name='Up',
+            last_name='Loader'
+        )
+        # A feed partner, so it may upload feeds as well as images
+        cls.owner.user_permissions.add(Permission.objects.get(codename='upload_feed'))
+        cls.other = User.objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+            first_name='Other',
+            last_name='User'
+        )
+        cls.property = Property.objects.create(
+            owner=cls.owner, title='Lake House', description='Test listing',
+            property_type='house', listing_type='sale', price=250000, bedrooms=3,
+            bathrooms=2, area=120, address='Test address', city='Kigali', country='Rwanda',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+        self.media_root = tempfile.mkdtemp()
+        self.upload_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, CHUNKED_UPLOAD_DIR=self.upload_dir,
+            LISTING_FEED_OWNER_EMAIL=self.owner.email,
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+    def start(self, content, purpose='feed', filename='feed.xml', target='', sha256=None):
+        return self.client.post(reverse('chunked-upload-list'), {
+            'purpose': purpose,
+            'target': target,
+            'filename': filename,
+            'size': len(content),
+            'sha256': sha256 or hashlib.sha256(content).hexdigest(),
+        }, format='json')
+
+    def put_chunk(self, upload_id, content, start, end=None):
+        end = len(content) - 1 if end is None else end
+        return self.client.put(
+            reverse('chunked-upload-detail', args=[upload_id]), content[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(content)}',
+        )
+
+    def complete(self, upload_id):
+        return self.client.post(reverse('chunked-upload-complete', args=[upload_id]))
+
+    def send(self, content, chunk_size, **kwargs):
+        upload_id = self.start(content, **kwargs).data['id']
+        for start in range(0, len(content), chunk_size):
+            response = self.put_chunk(upload_id, content, start, min(start + chunk_size, len(content)) - 1)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return upload_id
+
+    def test_feed_is_assembled_and_imported(self):
+        upload_id = self.send(FEED, 1000)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        uploaded = UploadedFile.objects.get(pk=response.data['id'])
+        self.assertTrue(uploaded.processed)
+        self.assertEqual(uploaded.feed_summary['created'], 40)
+        with uploaded.file.open('rb') as stored:
+            self.assertEqual(stored.read(), FEED)
+        self.assertFalse(os.listdir(self.upload_dir))
+
+        self.assertEqual(uploaded.uploaded_by, self.owner)
+
+        # Completing again answers with the same result
+        again = self.complete(upload_id)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data['id'], uploaded.pk)
+        self.assertEqual(UploadedFile.objects.count(), 1)
+
+    def test_complete_rechecks_the_locked_row(self):
+        upload_id = self.send(FEED, 4000)
+        # Loaded before a concurrent complete finished
+        stale = ChunkedUpload.objects.get(pk=upload_id)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        self.assertEqual(uploads.complete(stale, None), (response.data, False))
+        self.assertEqual(UploadedFile.objects.count(), 1)
+
+    def test_upload_resumes_from_reported_offset(self):
+        upload_id = self.start(FEED).data['id']
+        self.put_chunk(upload_id, FEED, 0, 999)
+
+        # A chunk past the end of what arrived is refused with the offset to resume from
+        response = self.put_chunk(upload_id, FEED, 3000)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 1000)
+
+        # A retried chunk overlapping what arrived is harmless
+        self.put_chunk(upload_id, FEED, 500, 1999)
+        response = self.client.get(reverse('chunked-upload-detail', args=[upload_id]))
+        self.assertEqual(response.data['offset'], 2000)
+        self.put_chunk(upload_id, FEED, response.data['offset'])
+
+        self.assertEqual(self.complete(upload_id).status_code, status.HTTP_201_CREATED)
+        with UploadedFile.objects.get().file.open('rb') as stored:
+            self.assertEqual(stored.read(), FEED)
+
+    def test_chunks_are_streamed_in_small_reads(self):
+        upload_id = self.start(FEED).data['id']
+        with mock.patch.object(uploads, 'READ_SIZE', 256):
+            self.put_chunk(upload_id, FEED, 0)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).offset, len(FEED))
+        with open(os.path.join(self.upload_dir, f'{upload_id}.part'), 'rb') as part:
+            self.assertEqual(part.read(), FEED)
+
+    def test_checksum_mismatch_restarts_the_upload(self):
+        upload_id = self.send(FEED, 4000, sha256='0' * 64)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('sha256', response.data)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).offset, 0)
+        self.assertFalse(UploadedFile.objects.exists())
+
+    def test_incomplete_upload_cannot_complete(self):
+        upload_id = self.start(FEED).data['id']
+        self.put_chunk(upload_id, FEED, 0, 99)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 100)
+
+    def test_property_image_goes_through_the_image_path(self):
+        content = PHOTO
+        upload_id = self.send(content, 4096, purpose='property_image', filename='Front.JPG',
+                              target=self.property.slug)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        image = PropertyImage.objects.get(pk=response.data['id'])
+        self.assertEqual(image.property, self.property)
+        self.assertTrue(image.is_primary)
+        self.assertEqual(image.image.name, f'properties/{hashlib.sha256(content).hexdigest()[:2]}/'
+                                           f'{hashlib.sha256(content).hexdigest()}.jpg')
+        with image.image.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+
+    def test_deleted_target_is_reported(self):
+        upload_id = self.send(PHOTO, 4096, purpose='property_image', filename='a.jpg', target=self.property.slug)
+        Property.objects.filter(pk=self.property.pk).delete()
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('target', response.data)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).status, 'uploading')
+
+    def test_start_is_validated(self):
+        self.assertEqual(self.start(FEED, filename='feed.csv').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.start(FEED, sha256='not-a-digest').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.start(PHOTO, purpose='property_image', filename='a.jpg', target='missing')
+        self.assertIn('target', response.data)
+
+        # Only the owner may attach images to a property, and uploads are private
+        upload_id = self.start(FEED).data['id']
+        self.client.force_authenticate(user=self.other)
+        response = self.start(PHOTO, purpose='property_image', filename='a.jpg', target=self.property.slug)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Feeds create listings, so they are for staff and feed partners only
+        self.assertIn('purpose', self.start(FEED).data)
+        response = self.put_chunk(upload_id, FEED, 0)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bad_content_range_is_rejected(self):
+        upload_id = self.start(FEED).data['id']
+        url = reverse('chunked-upload-detail', args=[upload_id])
+        for header in ('items 0-9/10', f'bytes 0-9/{len(FEED) + 1}', f'bytes 9-0/{len(FEED)}'):
+            response = self.client.put(url, FEED[:10], content_type='application/octet-stream',
+                                       HTTP_CONTENT_RANGE=header)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, header)
+        response = self.client.put(url, FEED[:10], content_type='application/octet-stream')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_idle_uploads_are_purged(self):
+        stale_id = self.start(FEED).data['id']
+        self.put_chunk(stale_id, FEED, 0, 99)
+        fresh_id = self.start(FEED).data['id']
+        ChunkedUpload.objects.filter(pk=stale_id).update(updated_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_chunked_uploads', stdout=io.StringIO())
+        self.assertEqual([str(pk) for pk in ChunkedUpload.objects.values_list('pk', flat=True)], [str(fresh_id)])
+        self.assertFalse(os.path.exists(os.path.join(self.upload_dir, f'{stale_id}.part')))
+
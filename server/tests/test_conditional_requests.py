@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Property, PropertyImage, Amenity, Hotel, BlogPost, Tag
+
+User = get_user_model()
+
+
+class ConditionalGetTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='etag@example.com',
+            password='testpass123',
+            first_name='Etag',
+            last_name='Owner'
+        )
+        cls.wifi = Amenity.objects.create(name='WiFi')
+        cls.property = Property.objects.create(
+            owner=cls.owner, title='Conditional Villa', description='Test listing',
+            property_type='villa', listing_type='sale', price=1000, bedrooms=3,
+            bathrooms=2, area=120, address='Test address', city='Kisumu', country='Kenya',
+        )
+        cls.property.amenities.add(cls.wifi)
+        cls.hotel = Hotel.objects.create(
+            name='Lake Hotel', slug='lake-hotel', description='Test hotel', address='Lake Road',
+            city='Kisumu', country='Kenya', star_rating=4, manager=cls.owner,
+        )
+        cls.post = BlogPost.objects.create(
+            title='Market update', slug='market-update', content='Body', author=cls.owner,
+            is_published=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('property-detail', kwargs={'slug': self.property.slug})
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_matching_etag_returns_304_without_loading_the_object(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+
+        # Served from the response cache without a query
+        with CaptureQueriesContext(connection) as context:
+            not_modified = self.revalidate(self.url, response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(len(context.captured_queries), 0)
+
+        # Otherwise a single validator query
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            not_modified = self.revalidate(self.url, response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(context.captured_queries), 1)
+
+        modified_since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(modified_since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_related_changes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        PropertyImage.objects.create(property=self.property, image='properties/a.jpg', is_primary=True)
+        self.assertEqual(self.revalidate(self.url, etag).status_code, status.HTTP_200_OK)
+        etag = self.client.get(self.url)['ETag']
+
+        self.wifi.name = 'Fibre WiFi'
+        self.wifi.save()
+        response = self.revalidate(self.url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['amenities'][0]['name'], 'Fibre WiFi')
+        etag = response['ETag']
+
+        self.property.amenities.clear()
+        self.assertEqual(self.revalidate(self.url, etag).status_code, status.HTTP_200_OK)
+
+    def test_query_string_is_part_of_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, {'fields': 'title'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'title': 'Conditional Villa'})
+
+    def test_hotel_and_blog_post_details(self):
+        hotel_url = reverse('hotel-detail', kwargs={'slug': self.hotel.slug})
+        etag = self.client.get(hotel_url)['ETag']
+        self.assertEqual(self.revalidate(hotel_url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.hotel.amenities.add(self.wifi)
+        self.assertEqual(self.revalidate(hotel_url, etag).status_code, status.HTTP_200_OK)
+
+        post_url = reverse('blogpost-detail', kwargs={'slug': self.post.slug})
+        etag = self.client.get(post_url)['ETag']
+        self.assertEqual(self.revalidate(post_url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.post.tags.add(Tag.objects.create(name='market'))
+        self.assertEqual(self.revalidate(post_url, etag).status_code, status.HTTP_200_OK)
+
+    def test_missing_property_is_still_404(self):
+        response = self.client.get(reverse('property-detail', kwargs={'slug': 'no-such-listing'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
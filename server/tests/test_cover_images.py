@@ -0,0 +1,150 @@
+import importlib
+import shutil
+import tempfile
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties import covers
+from properties.models import Property, PropertyImage, Hotel, RoomType, RoomImage
+from tests.factories import image_file
+
+User = get_user_model()
+
+PHOTO_SIZE = (1600, 1200)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class CoverImageTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='covers@example.com',
+            password='testpass123',
+            first_name='Cover',
+            last_name='Owner'
+        )
+        cls.property = Property.objects.create(
+            owner=cls.owner, title='Garden Flat', description='Test listing',
+            property_type='apartment', listing_type='rent', price=1200, bedrooms=2,
+            bathrooms=1, area=70, address='Test address', city='Kigali', country='Rwanda',
+        )
+        cls.hotel = Hotel.objects.create(
+            name='Lakeside', slug='lakeside', description='Test hotel', address='Test address',
+            city='Gisenyi', country='Rwanda', star_rating=4, manager=cls.owner,
+        )
+        cls.room_types = [
+            RoomType.objects.create(
+                hotel=cls.hotel, name=name, description='Test room', max_guests=2,
+                price_per_night=80, quantity=5,
+            )
+            for name in ('Double', 'Suite')
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def add_image(self, color=(200, 120, 40), **kwargs):
+        upload = image_file(size=PHOTO_SIZE, color=color)
+        return PropertyImage.objects.create(property=self.property, image=upload, **kwargs)
+
+    def test_primary_image_becomes_the_card_cover(self):
+        image = self.add_image(is_primary=True)
+        image.refresh_from_db()
+        self.property.refresh_from_db()
+        card = image.derivatives['renditions']['card']
+        self.assertEqual(self.property.cover_image, card['jpeg'])
+        self.assertEqual((self.property.cover_width, self.property.cover_height), (800, 600))
+
+        self.client.force_authenticate(user=None)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('property-list'), {'fields': 'title,primary_image'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        row = rows[0]
+        self.assertTrue(row['primary_image'].endswith(card['jpeg']))
+        self.assertFalse(any('properties_propertyimage' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get(reverse('property-detail', args=[self.property.slug]))
+        self.assertEqual((response.data['primary_image_width'], response.data['primary_image_height']), (800, 600))
+
+    def test_cover_follows_set_primary_image_and_deletes(self):
+        first = self.add_image(is_primary=True)
+        second = self.add_image(color=(10, 20, 30))
+        second.refresh_from_db()
+
+        response = self.client.post(
+            reverse('property-set-primary-image', args=[self.property.slug]), {'image_id': second.pk}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.cover_image, second.derivatives['renditions']['card']['jpeg'])
+        self.assertFalse(PropertyImage.objects.get(pk=first.pk).is_primary)
+
+        # An unknown image leaves the primary (and the cover) alone
+        response = self.client.post(
+            reverse('property-set-primary-image', args=[self.property.slug]), {'image_id': 0}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(PropertyImage.objects.get(pk=second.pk).is_primary)
+
+        second.delete()
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.cover_image, '')
+        self.assertIsNone(self.property.cover_width)
+
+    def test_room_type_and_hotel_covers(self):
+        double, suite = self.room_types
+        image = RoomImage.objects.create(room_type=suite, image=image_file(size=(400, 300)))
+        image.refresh_from_db()
+        suite.refresh_from_db()
+        self.hotel.refresh_from_db()
+        # No primary image: the first one is the cover
+        self.assertEqual(suite.cover_image, image.derivatives['renditions']['card']['jpeg'])
+        self.assertEqual((suite.cover_width, suite.cover_height), (400, 300))
+        self.assertEqual(self.hotel.cover_image, suite.cover_image)
+
+        RoomImage.objects.create(room_type=double, image=image_file(size=PHOTO_SIZE, color=(0, 90, 0)), is_primary=True)
+        double.refresh_from_db()
+        self.hotel.refresh_from_db()
+        self.assertEqual(self.hotel.cover_image, double.cover_image)
+
+        double.delete()
+        self.hotel.refresh_from_db()
+        self.assertEqual(self.hotel.cover_image, suite.cover_image)
+
+        response = self.client.get(reverse('hotel-detail', args=[self.hotel.slug]))
+        self.assertTrue(response.data['primary_image'].endswith(suite.cover_image))
+        self.assertEqual(response.data['primary_image_width'], 400)
+
+    def test_migration_backfills_every_cover(self):
+        image = self.add_image(is_primary=True)
+        RoomImage.objects.create(room_type=self.room_types[0], image=image_file(size=PHOTO_SIZE))
+        image.refresh_from_db()
+        expected = {
+            model: list(model.objects.order_by('pk').values_list(*covers.COVER_FIELDS))
+            for model in (Property, RoomType, Hotel)
+        }
+        for model in expected:
+            model.objects.update(cover_image='', cover_width=None, cover_height=None)
+
+        backfill = importlib.import_module('properties.migrations.0011_cover_images').backfill_covers
+        backfill(apps, None)
+        for model, rows in expected.items():
+            self.assertEqual(list(model.objects.order_by('pk').values_list(*covers.COVER_FIELDS)), rows)
+        self.assertEqual(expected[Property][0][0], image.derivatives['renditions']['card']['jpeg'])
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Property, Hotel, RoomType, Booking, Inquiry
+
+User = get_user_model()
+
+
+class ExportTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='bi@example.com',
+            password='testpass123',
+            first_name='Bi',
+            last_name='Team',
+            is_staff=True
+        )
+        cls.user = User.objects.create_user(
+            email='guest@example.com',
+            password='testpass123',
+            first_name='Guest',
+            last_name='User'
+        )
+        cls.properties = [
+            Property.objects.create(
+                owner=cls.staff, title=f'Listing {index}', description='Line one\nline "two"',
+                property_type='house', listing_type='sale', price=100_000 + index,
+                bedrooms=index % 3, bathrooms=1, area=80, address='Test address',
+                city='Nairobi' if index % 2 else 'Mombasa', country='Kenya',
+                is_published=index != 4,
+            )
+            for index in range(5)
+        ]
+        hotel = Hotel.objects.create(
+            name='Lake Hotel', slug='lake-hotel', description='Test hotel', address='Lake Road',
+            city='Dodoma', country='Tanzania', star_rating=4, manager=cls.staff,
+        )
+        room_type = RoomType.objects.create(
+            hotel=hotel, name='Double', description='Two beds', max_guests=2,
+            price_per_night='80.00', quantity=3,
+        )
+        today = timezone.now().date()
+        for index, booking_status in enumerate(['pending', 'confirmed', 'confirmed']):
+            Booking.objects.create(
+                user=cls.user, room_type=room_type, check_in_date=today + timedelta(days=index + 1),
+                check_out_date=today + timedelta(days=index + 3), total_price='160.00',
+                status=booking_status,
+            )
+        Inquiry.objects.create(
+            property=cls.properties[0], name='Ada', email='ada@example.com', message='Still available?'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+
+    def export(self, basename, export_format, params=None):
+        url = reverse(f'{basename}-export', kwargs={'export_format': export_format})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.streaming)
+            body = b''.join(response.streaming_content).decode('utf-8')
+        self.queries = queries
+        return response, body
+
+    def test_property_csv_includes_unpublished_and_filters(self):
+        response, body = self.export('property', 'csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('attachment; filename="properties-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['owner_email'], 'bi@example.com')
+        # Newest first, as in the list
+        self.assertEqual(rows[0]['id'], str(self.properties[-1].id))
+        self.assertEqual(rows[-1]['description'], 'Line one\nline "two"')
+        self.assertEqual(rows[-1]['price'], '100000.00')
+        self.assertEqual(rows[-1]['latitude'], '')
+        self.assertEqual(rows[-1]['is_published'], 'True')
+
+        response, body = self.export('property', 'csv', {'city': 'nairobi', 'ordering': 'price'})
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([row['title'] for row in rows], ['Listing 1', 'Listing 3'])
+
+    def test_property_ndjson(self):
+        response, body = self.export('property', 'ndjson', {'search': 'listing', 'min_price': 100_003})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual({line['title'] for line in lines}, {'Listing 3', 'Listing 4'})
+        self.assertEqual(lines[0]['price'], '100004.00')
+        self.assertTrue(body.endswith('\n'))
+
+    def test_bookings_and_inquiries(self):
+        response, body = self.export('booking', 'csv', {'status': 'confirmed'})
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['user_email'], 'guest@example.com')
+        self.assertEqual(rows[0]['room_type_hotel_slug'], 'lake-hotel')
+
+        url = reverse('property-inquiry-export', kwargs={
+            'property_slug': self.properties[0].slug, 'export_format': 'ndjson'
+        })
+        body = b''.join(self.client.get(url).streaming_content).decode('utf-8')
+        self.assertEqual(json.loads(body)['property_slug'], self.properties[0].slug)
+
+    def test_rows_are_read_in_one_query(self):
+        self.export('property', 'ndjson')
+        exported = [query['sql'] for query in self.queries.captured_queries if 'properties_property' in query['sql']]
+        self.assertEqual(len(exported), 1)
+
+    def test_empty_export_still_has_header(self):
+        response, body = self.export('property', 'csv', {'city': 'nowhere'})
+        self.assertEqual(body.splitlines(), [','.join([
+            'id', 'slug', 'title', 'description', 'property_type', 'listing_type', 'price',
+            'bedrooms', 'bathrooms', 'area', 'address', 'city', 'country', 'latitude', 'longitude',
+            'is_featured', 'is_published', 'owner_email', 'created_at', 'updated_at',
+        ])])
+
+    def test_staff_only(self):
+        url = reverse('property-export', kwargs={'export_format': 'csv'})
+        self.client.force_authenticate(user=None)
+        self.assertIn(
+            self.client.get(url).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+        )
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        url = reverse('booking-export', kwargs={'export_format': 'ndjson'})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
+from properties import geo
+from properties.fast_serializers import FastListSerializer
+from properties.fieldsets import Fieldset
+from properties.loaders import with_page_relations
+from properties.models import (
+    Property, PropertyImage, Amenity, Hotel, RoomType, RoomImage, Booking
+)
+from properties.serializers import PropertySerializer, BookingSerializer
+
+User = get_user_model()
+
+
+class FastListSerializerParityTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='fast@example.com',
+            password='testpass123',
+            first_name='Fast',
+            last_name='Owner'
+        )
+        cls.owner.groups.add(Group.objects.create(name='Agents'))
+        amenities = [Amenity.objects.create(name='WiFi', icon='fa-wifi'), Amenity.objects.create(name='Pool')]
+        for index in range(4):
+            property = Property.objects.create(
+                owner=cls.owner, title=f'Listing {index}', description='Test listing',
+                property_type='villa', listing_type='sale', price='1999.50', bedrooms=index,
+                bathrooms=1, area='120.25', address='1 Test Street', city='Kigali', country='Rwanda',
+                # Alternate rows have no coordinates
+                latitude='-1.944100' if index % 2 else None,
+                longitude='30.061900' if index % 2 else None,
+            )
+            property.amenities.set(amenities[:index])
+            if index:
+                PropertyImage.objects.create(property=property, image='properties/a.jpg', is_primary=index > 1)
+
+        hotel = Hotel.objects.create(
+            name='Lake Hotel', slug='lake-hotel', description='Test hotel', address='Lake Road',
+            city='Kigali', country='Rwanda', star_rating=4, manager=cls.owner,
+        )
+        room_type = RoomType.objects.create(
+            hotel=hotel, name='Double', description='Two beds', max_guests=2,
+            price_per_night='80.00', quantity=3,
+        )
+        room_type.amenities.set(amenities)
+        RoomImage.objects.create(room_type=room_type, image='rooms/a.jpg', is_primary=True)
+        today = timezone.now().date()
+        for index in range(3):
+            Booking.objects.create(
+                user=cls.owner, room_type=room_type, check_in_date=today + timedelta(days=index + 1),
+                check_out_date=today + timedelta(days=index + 3), total_price='160.00',
+                special_requests='' if index else 'Late arrival',
+            )
+
+    def context(self, params=None, serializer_class=PropertySerializer):
+        request = Request(APIRequestFactory().get('/', params or {}))
+        context = {'request': request}
+        fieldset = Fieldset.from_request(request, serializer_class)
+        if fieldset is not None:
+            context['fieldset'] = fieldset
+        return context
+
+    def assertParity(self, serializer_class, queryset, context):
+        slow = serializer_class(queryset, many=True, context=context).data
+        fast = FastListSerializer(queryset, child=serializer_class(context=context), context=context).data
+        # Byte-identical JSON, so field order matches as well
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(slow))
+        return fast
+
+    def test_property_rows(self):
+        rows = self.assertParity(
+            PropertySerializer, with_page_relations(Property.objects.order_by('id')), self.context()
+        )
+        self.assertEqual(len(rows), 4)
+        self.assertNotIn('distance', rows[0])
+
+    def test_property_rows_with_distance(self):
+        queryset = geo.filter_near(with_page_relations(Property.objects.all()), -1.9441, 30.0619, 10)
+        rows = self.assertParity(PropertySerializer, queryset.order_by('distance'), self.context())
+        self.assertIn('distance', rows[0])
+
+    def test_property_rows_with_fieldset(self):
+        for params in ({'fields': 'title,price,primary_image'}, {'fields': 'id,owner,amenities,images'},
+                       {'expand': 'owner'}):
+            self.assertParity(PropertySerializer, with_page_relations(Property.objects.all()), self.context(params))
+
+    def test_booking_rows(self):
+        queryset = Booking.objects.select_related('user', 'room_type').order_by('id')
+        rows = self.assertParity(BookingSerializer, queryset, self.context(serializer_class=BookingSerializer))
+        self.assertEqual(rows[0]['room_details']['name'], 'Double')
+
+    def test_list_endpoint_uses_fast_path(self):
+        cache.clear()
+        client = APIClient()
+        fast = client.get(reverse('property-list'), {'ordering': 'price'})
+        self.assertIsInstance(fast.data.serializer, FastListSerializer)
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            cache.clear()
+            slow = client.get(reverse('property-list'), {'ordering': 'price'})
+        self.assertEqual(fast.content, slow.content)
+
+    def test_input_data_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            FastListSerializer(data=[{'title': 'New'}], child=PropertySerializer())
@@ -0,0 +1,353 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+from api import feeds
+from api.models import FeedSource, UploadedFile
+from api.views import FileDetailView, FileListView, FileUploadView
+from properties.models import Property, PropertyImage, Amenity, MediaBlob
+from properties.search import search_properties
+
+User = get_user_model()
+
+LISTING = '''
+  <listing id="{ref}">
+    <title>{title}</title>
+    <description>Imported listing</description>
+    <property_type>{property_type}</property_type>
+    <listing_type>rent</listing_type>
+    <price>{price}</price>
+    <bedrooms>2</bedrooms>
+    <bathrooms>1</bathrooms>
+    <area>75.5</area>
+    <address>1 Feed Street</address>
+    <city>Arusha</city>
+    <country>Tanzania</country>
+    <latitude>-3.3869</latitude>
+    <longitude>36.6830</longitude>
+    <amenities><amenity>WiFi</amenity><amenity>Solar Power</amenity></amenities>
+    <images>{images}</images>
+  </listing>'''
+# Stored blobs the test listings use as their photos
+IMAGES = ('properties/front.jpg', 'properties/garden.jpg')
+
+
+def feed(*listings, **attributes):
+    attributes = ''.join(f' {name}="{value}"' for name, value in attributes.items())
+    return f'<?xml version="1.0"?>\n<feed{attributes}><listings>{"".join(listings)}</listings></feed>'.encode('utf-8')
+
+
+def listing(ref, title='Garden Cottage', property_type='house', price='1200.00', images=IMAGES):
+    images = ''.join(
+        f'<image primary="true">{path}</image>' if index == 0 else f'<image>{path}</image>'
+        for index, path in enumerate(images)
+    )
+    return LISTING.format(ref=ref, title=title, property_type=property_type, price=price, images=images)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, LISTING_FEED_OWNER_EMAIL='feeds@example.com')
+class FeedTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = User.objects.create_user(
+            email='feeds@example.com',
+            password='testpass123',
+            first_name='Feed',
+            last_name='Agent'
+        )
+        cls.staff = User.objects.create_user(email='staff@example.com', password='testpass123', is_staff=True)
+        cls.wifi = Amenity.objects.create(name='WiFi')
+        for name in IMAGES:
+            MediaBlob.objects.create(name=name, sha256='0' * 64, size=1)
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def post(self, content, user=None):
+        request = APIRequestFactory().post('/api/v1/files/', {
+            'file': SimpleUploadedFile('feed.xml', content, content_type='application/xml'),
+        }, format='multipart')
+        if user is not None:
+            force_authenticate(request, user=user)
+        return FileUploadView.as_view()(request)
+
+    def upload(self, content, user=None):
+        response = self.post(content, user=user or self.staff)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return UploadedFile.objects.get(pk=response.data['id'])
+
+
+class FeedIngestionTestCase(FeedTestCase):
+
+    def test_upload_imports_listings_in_batches(self):
+        with mock.patch.object(feeds, 'BATCH_SIZE', 2):
+            uploaded = self.upload(feed(*(listing(f'A-{n}') for n in range(5))))
+
+        self.assertTrue(uploaded.processed)
+        self.assertIsNone(uploaded.processing_errors)
+        imported = Property.objects.filter(city='Arusha').order_by('id')
+        self.assertEqual(imported.count(), 5)
+        self.assertEqual(len({p.slug for p in imported}), 5)
+
+        first = imported[0]
+        self.assertEqual(first.owner, self.agent)
+        self.assertEqual(str(first.area), '75.50')
+        self.assertIsNotNone(first.geo_cell)
+        self.assertEqual({a.name for a in first.amenities.all()}, {'WiFi', 'Solar Power'})
+        self.assertEqual(first.amenities.get(name='WiFi'), self.wifi)
+        self.assertNotEqual(first.amenity_mask, 0)
+        self.assertEqual(first.images.count(), 2)
+        self.assertEqual(first.images.get(is_primary=True).image.name, IMAGES[0])
+        # Bulk-written rows reach the search index too
+        self.assertEqual(search_properties(Property.objects.all(), ['cottage']).count(), 5)
+
+    def test_invalid_records_are_reported_and_skipped(self):
+        uploaded = self.upload(feed(
+            listing('B-1'),
+            listing('B-2', property_type='castle'),
+            listing('B-3', price='lots'),
+            listing('B-4', price='-5'),
+            '<listing><title>No owner</title><owner_email>nobody@example.com</owner_email></listing>',
+        ))
+        self.assertTrue(uploaded.processed)
+        errors = uploaded.processing_errors.splitlines()
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(errors[0].startswith('listing 2 (B-2): property_type:'))
+        self.assertTrue(errors[1].startswith('listing 3 (B-3): price:'))
+        self.assertEqual(errors[2], 'listing 4 (B-4): Price cannot be negative')
+        self.assertIn('no user with email nobody@example.com', errors[3])
+        self.assertEqual(Property.objects.filter(city='Arusha').count(), 1)
+
+    def test_malformed_feed_keeps_finished_batches(self):
+        # Cut off inside the second listing
+        truncated = feed(listing('C-1'), listing('C-2'))[:-40]
+        importer = feeds.FeedImporter(batch_size=1)
+        with self.assertRaises(Exception):
+            importer.run(io.BytesIO(truncated))
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual(Property.objects.filter(city='Arusha').count(), 1)
+
+        with mock.patch.object(feeds, 'BATCH_SIZE', 1):
+            uploaded = self.upload(truncated)
+        self.assertTrue(uploaded.processed)
+        self.assertTrue(uploaded.processing_errors.startswith('feed:'))
+        self.assertEqual(Property.objects.filter(city='Arusha').count(), 2)
+
+    def test_parsed_listings_are_detached(self):
+        source = io.BytesIO(feed(*(listing(f'D-{n}') for n in range(3))))
+        seen = []
+        for element in feeds.iter_listings(source):
+            seen.append(element.get('id'))
+        self.assertEqual(seen, ['D-0', 'D-1', 'D-2'])
+        self.assertEqual(element.text, None)
+        self.assertEqual(len(element), 0)
+
+
+class FeedSyncTestCase(FeedTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        FeedSource.objects.create(slug='acme', partner=cls.staff)
+
+    def sync(self, *listings, **attributes):
+        uploaded = self.upload(feed(*listings, source='acme', **attributes))
+        self.assertTrue(uploaded.processed)
+        return uploaded
+
+    def synced(self):
+        return {
+            property.external_id: property
+            for property in Property.objects.filter(feed_source='acme')
+        }
+
+    def test_first_sync_creates_keyed_rows(self):
+        uploaded = self.sync(listing('S-1'), listing('S-2'))
+        self.assertEqual(uploaded.feed_summary, {
+            'created': 2, 'updated': 0, 'unchanged': 0, 'unpublished': 0,
+            'deleted': 0, 'failed': 0, 'source': 'acme',
+        })
+        rows = self.synced()
+        self.assertEqual(set(rows), {'S-1', 'S-2'})
+        self.assertEqual(len(rows['S-1'].feed_hash), 64)
+
+    def test_resent_feed_writes_only_changes(self):
+        self.sync(listing('S-1'), listing('S-2'), listing('S-3'))
+        before = self.synced()
+
+        changed = listing('S-2', title='Garden Cottage Renovated', price='1350.00').replace(
+            '<amenity>Solar Power</amenity>', '<amenity>Pool</amenity>'
+        )
+        uploaded = self.sync(listing('S-1'), changed, listing('S-3'))
+        self.assertEqual(uploaded.feed_summary['unchanged'], 2)
+        self.assertEqual(uploaded.feed_summary['updated'], 1)
+        self.assertIsNone(uploaded.processing_errors)
+
+        after = self.synced()
+        for reference in ('S-1', 'S-3'):
+            self.assertEqual(after[reference].updated_at, before[reference].updated_at)
+        updated = after['S-2']
+        self.assertGreater(updated.updated_at, before['S-2'].updated_at)
+        self.assertEqual(str(updated.price), '1350.00')
+        self.assertEqual(updated.title, 'Garden Cottage Renovated')
+        # The slug is kept so existing links keep working
+        self.assertEqual(updated.slug, before['S-2'].slug)
+        self.assertEqual({a.name for a in updated.amenities.all()}, {'WiFi', 'Pool'})
+        pool = Amenity.objects.get(name='Pool')
+        self.assertEqual(updated.amenity_mask, (1 << self.wifi.bit) | (1 << pool.bit))
+        self.assertEqual(updated.images.count(), 2)
+        self.assertEqual(search_properties(Property.objects.all(), ['renovated']).get(), updated)
+
+    def test_missing_listings_are_unpublished_and_come_back(self):
+        self.sync(listing('S-1'), listing('S-2'))
+        uploaded = self.sync(listing('S-1'))
+        self.assertEqual(uploaded.feed_summary['unpublished'], 1)
+        self.assertFalse(self.synced()['S-2'].is_published)
+
+        uploaded = self.sync(listing('S-1'), listing('S-2'))
+        self.assertEqual(uploaded.feed_summary['updated'], 1)
+        self.assertTrue(self.synced()['S-2'].is_published)
+
+    def test_missing_listings_can_be_deleted(self):
+        self.sync(listing('S-1'), listing('S-2'))
+        uploaded = self.sync(listing('S-1'), missing='delete')
+        self.assertEqual(uploaded.feed_summary['deleted'], 1)
+        self.assertEqual(set(self.synced()), {'S-1'})
+
+    def test_failed_records_and_feeds_remove_nothing(self):
+        self.sync(listing('S-1'), listing('S-2'))
+
+        uploaded = self.sync(listing('S-1'), listing('S-2', price='lots'))
+        self.assertEqual(uploaded.feed_summary['failed'], 1)
+        self.assertEqual(uploaded.feed_summary['unpublished'], 0)
+
+        uploaded = self.upload(feed(listing('S-1'), source='acme')[:-40])
+        self.assertTrue(uploaded.processing_errors.startswith('feed:'))
+        self.assertTrue(all(row.is_published for row in self.synced().values()))
+
+    def test_listings_need_unique_ids(self):
+        uploaded = self.sync(listing('S-1'), listing('S-1'), listing(''))
+        self.assertEqual(uploaded.feed_summary['created'], 1)
+        self.assertEqual(uploaded.processing_errors.splitlines(), [
+            'listing 2 (S-1): id: S-1 appears more than once',
+            'listing 3: id: listings of a synced feed need an id',
+        ])
+
+
+class FeedPermissionTestCase(FeedTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.partner = User.objects.create_user(email='partner@example.com', password='testpass123')
+        cls.partner.user_permissions.add(Permission.objects.get(codename='upload_feed'))
+        Amenity.objects.create(name='Solar Power')
+
+    def test_only_staff_and_partners_upload(self):
+        content = feed(listing('P-1', images=()))
+        self.assertIn(self.post(content).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertEqual(self.post(content, user=self.agent).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Property.objects.exists())
+
+        uploaded = self.upload(content, user=User.objects.get(pk=self.partner.pk))
+        self.assertEqual(uploaded.uploaded_by, self.partner)
+        self.assertEqual(Property.objects.get().owner, self.partner)
+
+    def test_partner_listings_are_their_own(self):
+        uploaded = self.upload(feed(
+            listing('P-2', images=()),
+            listing('P-3', images=()).replace('</listing>', '<owner_email>feeds@example.com</owner_email></listing>'),
+            listing('P-4', images=()).replace('</listing>', '<owner_email>Partner@example.com</owner_email></listing>'),
+        ), user=User.objects.get(pk=self.partner.pk))
+        self.assertEqual(len(uploaded.processing_errors.splitlines()), 1)
+        self.assertIn('listing 2 (P-3): owner_email:', uploaded.processing_errors)
+        self.assertEqual(set(Property.objects.values_list('owner', flat=True)), {self.partner.pk})
+
+    def test_file_views_show_partners_their_own_uploads(self):
+        own = self.upload(feed(listing('P-5', images=())), user=User.objects.get(pk=self.partner.pk))
+        other = self.upload(feed(listing('P-6')))
+
+        def get(view, user=None, **kwargs):
+            request = APIRequestFactory().get('/api/v1/files/')
+            if user is not None:
+                force_authenticate(request, user=user)
+            return view.as_view()(request, **kwargs)
+
+        self.assertIn(get(FileListView).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertEqual(get(FileListView, user=self.agent).status_code, status.HTTP_403_FORBIDDEN)
+
+        response = get(FileListView, user=self.partner)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row['id'] for row in results], [own.pk])
+        self.assertEqual(get(FileDetailView, user=self.partner, id=other.pk).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(get(FileDetailView, user=self.staff, id=other.pk).status_code, status.HTTP_200_OK)
+
+    def test_sources_are_bound_to_their_partner(self):
+        partner = User.objects.get(pk=self.partner.pk)
+        FeedSource.objects.create(slug='partner-realty', partner=partner)
+        FeedSource.objects.create(slug='rival-realty', partner=self.staff)
+        self.upload(feed(listing('R-1', images=()), listing('R-2', images=()), source='partner-realty'), user=partner)
+        self.upload(feed(listing('R-3'), source='rival-realty'))
+
+        refused = [
+            # Unregistered, another partner's, and a delete from staff who do not own the source
+            (feed(source='unknown'), partner),
+            (feed(source='rival-realty', missing='delete'), partner),
+            (feed(source='partner-realty', missing='delete'), self.staff),
+        ]
+        for content, user in refused:
+            uploaded = self.upload(content, user=user)
+            self.assertTrue(uploaded.processing_errors.startswith('feed:'), uploaded.processing_errors)
+        self.assertEqual(Property.objects.filter(is_published=True).count(), 3)
+
+        uploaded = self.upload(feed(listing('R-1', images=()), source='partner-realty', missing='delete'), user=partner)
+        self.assertIsNone(uploaded.processing_errors)
+        self.assertEqual(uploaded.feed_summary['deleted'], 1)
+        self.assertEqual(set(Property.objects.values_list('external_id', flat=True)), {'R-1', 'R-3'})
+
+    def test_partner_feeds_use_existing_media_and_amenities(self):
+        partner = User.objects.get(pk=self.partner.pk)
+        own = Property.objects.create(
+            owner=partner, title='Partner Home', description='Own listing', property_type='house',
+            listing_type='sale', price=100_000, bedrooms=2, bathrooms=1, area=80,
+            address='Partner road', city='Moshi', country='Tanzania',
+        )
+        PropertyImage.objects.create(property=own, image=IMAGES[0])
+        MediaBlob.objects.create(name='rooms/suite.jpg', sha256='1' * 64, size=1)
+
+        uploaded = self.upload(feed(
+            listing('M-1', images=IMAGES[:1]),
+            listing('M-2', images=IMAGES[1:]),
+            listing('M-3', images=('properties/unknown.jpg',)),
+            listing('M-4', images=('rooms/suite.jpg',)),
+            listing('M-5', images=()).replace('<amenity>WiFi</amenity>', '<amenity>Helipad</amenity>'),
+        ), user=partner)
+        self.assertEqual(uploaded.processing_errors.splitlines(), [
+            f'listing 2 (M-2): image: not an image of your own listings ({IMAGES[1]})',
+            'listing 3 (M-3): image: not an uploaded property image (properties/unknown.jpg)',
+            'listing 4 (M-4): image: not an uploaded property image (rooms/suite.jpg)',
+            'listing 5 (M-5): amenities: no amenity named Helipad',
+        ])
+        self.assertFalse(Amenity.objects.filter(name='Helipad').exists())
+        self.assertEqual(Property.objects.get(city='Arusha').images.get().image.name, IMAGES[0])
+
+        # Staff may name any stored property image, and add amenities
+        uploaded = self.upload(feed(
+            listing('M-6').replace('<amenity>WiFi</amenity>', '<amenity>Helipad</amenity>'),
+            listing('M-7', images=('rooms/suite.jpg',)),
+        ))
+        self.assertEqual(len(uploaded.processing_errors.splitlines()), 1)
+        self.assertTrue(Amenity.objects.filter(name='Helipad').exists())
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Hotel, RoomType, Booking
+
+User = get_user_model()
+
+
+class HotelAvailabilityTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(
+            email='manager@example.com',
+            password='testpass123',
+            first_name='Hotel',
+            last_name='Manager'
+        )
+        cls.check_in = timezone.now().date() + timedelta(days=14)
+        cls.hotels = {}
+        for name, rooms in {
+            'Beach Lodge': [('Single', 1, '40.00', 1), ('Family', 4, '150.00', 3)],
+            'City Inn': [('Double', 2, '90.00', 1), ('Twin', 2, '70.00', 1)],
+            'Hill Camp': [('Tent', 2, '25.00', 3)],
+        }.items():
+            hotel = Hotel.objects.create(
+                name=name, slug=name.lower().replace(' ', '-'), description='Test hotel',
+                address='Test road', city='Arusha', country='Tanzania', star_rating=3, manager=cls.manager,
+            )
+            cls.hotels[name] = hotel
+            for room_name, max_guests, price, quantity in rooms:
+                RoomType.objects.create(
+                    hotel=hotel, name=room_name, description='Test room', max_guests=max_guests,
+                    price_per_night=price, quantity=quantity,
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def book(self, hotel, room_name, offset=0, nights=1, guests=1):
+        check_in = self.check_in + timedelta(days=offset)
+        return Booking.objects.create(
+            user=self.manager, room_type=RoomType.objects.get(hotel=hotel, name=room_name),
+            check_in_date=check_in, check_out_date=check_in + timedelta(days=nights),
+            total_price='100.00', guest_count=guests,
+        )
+
+    def search(self, nights=2, guests=None, offset=0, **params):
+        check_in = self.check_in + timedelta(days=offset)
+        params.update({'check_in': check_in, 'check_out': check_in + timedelta(days=nights)})
+        if guests is not None:
+            params['guests'] = guests
+        response = self.client.get(reverse('hotel-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return {row['name']: row['cheapest_price'] for row in rows}
+
+    def test_hotels_with_a_free_room_and_cheapest_price(self):
+        self.assertEqual(self.search(), {'Beach Lodge': '40.00', 'City Inn': '70.00', 'Hill Camp': '25.00'})
+        # Each guest takes a unit, and City Inn has one room of each type
+        self.assertEqual(self.search(guests=2), {'Beach Lodge': '150.00', 'Hill Camp': '25.00'})
+        self.assertEqual(self.search(guests=3), {'Beach Lodge': '150.00'})
+
+    def test_booked_nights_are_excluded(self):
+        # The Twin is taken on the second night only: the stay needs every night
+        self.book(self.hotels['City Inn'], 'Twin', offset=1)
+        self.book(self.hotels['Beach Lodge'], 'Single')
+        self.assertEqual(self.search(), {'Beach Lodge': '150.00', 'City Inn': '90.00', 'Hill Camp': '25.00'})
+        # Outside the booked night the Twin is free again
+        self.assertEqual(self.search(nights=1)['City Inn'], '70.00')
+
+        # Two of three tents gone leaves room for one guest, not two
+        self.book(self.hotels['Hill Camp'], 'Tent', guests=2)
+        self.assertIn('Hill Camp', self.search(guests=1))
+        self.assertNotIn('Hill Camp', self.search(guests=2))
+
+        booking = self.book(self.hotels['City Inn'], 'Double')
+        self.assertNotIn('City Inn', self.search())
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(self.search()['City Inn'], '90.00')
+
+    def test_search_is_one_query_whatever_the_hotel_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search(pagination='cursor', fields='name,cheapest_price')
+        self.assertEqual(len(queries), 1)
+
+    def test_combines_with_other_filters(self):
+        self.assertEqual(set(self.search(search='inn')), {'City Inn'})
+        response = self.client.get(reverse('hotel-list'))
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertNotIn('cheapest_price', rows[0])
+
+    def test_invalid_stays_are_rejected(self):
+        url = reverse('hotel-list')
+        today = timezone.now().date()
+        for params, field in (
+            ({'check_in': 'soon', 'check_out': self.check_in}, 'check_in'),
+            ({'check_in': self.check_in}, 'check_out'),
+            ({'check_in': self.check_in, 'check_out': self.check_in}, 'check_out'),
+            ({'check_in': today - timedelta(days=1), 'check_out': today}, 'check_in'),
+            ({'check_in': self.check_in, 'check_out': self.check_in + timedelta(days=1), 'guests': 0}, 'guests'),
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn(field, response.data)
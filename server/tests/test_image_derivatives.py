@@ -0,0 +1,148 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties import derivatives
+from properties.models import Property, PropertyImage, BlogPost
+from tests.factories import image_file
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ImageDerivativesTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='photos@example.com',
+            password='testpass123',
+            first_name='Photo',
+            last_name='Owner'
+        )
+        cls.property = Property.objects.create(
+            owner=cls.owner, title='Hill House', description='Test listing',
+            property_type='house', listing_type='sale', price=250000, bedrooms=3,
+            bathrooms=2, area=120, address='Test address', city='Kigali', country='Rwanda',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def add_image(self, upload=None, **kwargs):
+        upload = upload or image_file(size=(2400, 1800))
+        image = PropertyImage.objects.create(property=self.property, image=upload, **kwargs)
+        image.refresh_from_db()
+        return image
+
+    def assertRendition(self, entry, size):
+        self.assertEqual((entry['width'], entry['height']), size)
+        for key, image_format in (('jpeg', 'JPEG'), ('webp', 'WEBP')):
+            with default_storage.open(entry[key], 'rb') as stored, Image.open(stored) as image:
+                self.assertEqual(image.format, image_format)
+                self.assertEqual(image.size, size)
+
+    def test_upload_renders_every_size_and_format(self):
+        image = self.add_image(is_primary=True)
+        self.assertEqual(image.derivatives['source'], image.image.name)
+        renditions = image.derivatives['renditions']
+        self.assertRendition(renditions['full'], (1920, 1440))
+        self.assertRendition(renditions['card'], (800, 600))
+        self.assertRendition(renditions['thumb'], (320, 240))
+        self.assertTrue(renditions['card']['webp'].startswith('derivatives/properties/'))
+
+    def test_small_images_are_not_upscaled(self):
+        image = self.add_image(image_file(size=(400, 300)))
+        renditions = image.derivatives['renditions']
+        self.assertRendition(renditions['full'], (400, 300))
+        self.assertRendition(renditions['card'], (400, 300))
+        self.assertRendition(renditions['thumb'], (320, 240))
+
+    def test_exif_rotation_and_transparency(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees
+        image = self.add_image(image_file(size=(600, 400), exif=exif))
+        self.assertRendition(image.derivatives['renditions']['full'], (400, 600))
+
+        image = self.add_image(image_file('logo.png', size=(900, 600), image_format='PNG', mode='RGBA'))
+        renditions = image.derivatives['renditions']
+        self.assertRendition(renditions['full'], (900, 600))
+        self.assertRendition(renditions['card'], (800, 600))
+
+    def test_serializers_expose_renditions(self):
+        image = self.add_image(is_primary=True)
+        response = self.client.get(reverse('property-detail', kwargs={'slug': self.property.slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        srcset = response.data['images'][0]['srcset']
+        self.assertEqual(set(srcset), {'full', 'card', 'thumb'})
+        self.assertEqual(srcset['thumb']['width'], 320)
+        self.assertTrue(srcset['card']['webp'].endswith('/card.webp'))
+        self.assertTrue(response.data['primary_image'].endswith(
+            image.derivatives['renditions']['card']['jpeg']
+        ))
+
+    def test_derivatives_are_reused(self):
+        image = self.add_image()
+        first = image.derivatives
+        PropertyImage.objects.filter(pk=image.pk).update(derivatives=None)
+        with mock.patch.object(derivatives, 'render') as render:
+            self.assertTrue(derivatives.generate(PropertyImage._meta.label, image.pk))
+            render.assert_not_called()
+            # Current derivatives are left alone
+            self.assertFalse(derivatives.generate(PropertyImage._meta.label, image.pk))
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives, first)
+
+    def test_replaced_image_is_rendered_again(self):
+        image = self.add_image()
+        image.image = image_file('other.jpg', size=(1000, 1000))
+        image.save()
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives['source'], image.image.name)
+        self.assertEqual(image.derivatives['renditions']['full']['width'], 1000)
+
+    def test_unreadable_images_fall_back_to_the_original(self):
+        upload = SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+        image = self.add_image(upload, is_primary=True)
+        self.assertIn('error', image.derivatives)
+        response = self.client.get(reverse('property-detail', kwargs={'slug': self.property.slug}))
+        self.assertIsNone(response.data['images'][0]['srcset'])
+        self.assertTrue(response.data['primary_image'].endswith(image.image.name))
+
+    def test_blog_post_featured_image(self):
+        post = BlogPost.objects.create(
+            title='Market update', slug='market-update', content='Text', excerpt='Short',
+            author=self.owner, is_published=True, featured_image=image_file('cover.jpg', size=(2400, 1800)),
+        )
+        post.refresh_from_db()
+        self.assertRendition(post.featured_image_derivatives['renditions']['card'], (800, 600))
+        response = self.client.get(reverse('blogpost-detail', kwargs={'slug': post.slug}))
+        self.assertEqual(response.data['featured_image_srcset']['thumb']['height'], 240)
+
+    def test_backfill_command(self):
+        with self.settings(BACKGROUND_TASKS_EAGER=False):
+            image = self.add_image()
+        self.assertIsNone(image.derivatives)
+        out = io.StringIO()
+        call_command('generate_image_derivatives', '--workers', '1', stdout=out)
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives['source'], image.image.name)
+        self.assertIn('properties.PropertyImage: 1 of 1', out.getvalue())
@@ -0,0 +1,176 @@
+import importlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory, force_authenticate
+from api.models import UploadedFile
+from api.views import FileUploadView
+from properties import blobs
+from properties.models import Property, PropertyImage, MediaBlob
+from tests.factories import image_file
+
+User = get_user_model()
+
+
+class MediaBlobTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = User.objects.create_user(
+            email='agent@example.com',
+            password='testpass123',
+            first_name='Agent',
+            last_name='User'
+        )
+        cls.listings = [
+            Property.objects.create(
+                owner=cls.agent, title=f'Listing {index}', description='Test listing',
+                property_type='house', listing_type='sale', price=100_000, bedrooms=2,
+                bathrooms=1, area=80, address='Test address', city='Nairobi', country='Kenya',
+            )
+            for index in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.agent)
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def stored_files(self, directory):
+        root = os.path.join(self.media_root, directory)
+        return sorted(
+            os.path.relpath(os.path.join(path, name), self.media_root)
+            for path, _, names in os.walk(root) for name in names
+        )
+
+    def upload(self, listing, upload):
+        url = reverse('property-upload-image', kwargs={'slug': listing.slug})
+        response = self.client.post(url, {'image': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return PropertyImage.objects.get(pk=response.data['id'])
+
+    def test_duplicate_uploads_share_one_blob(self):
+        with mock.patch.object(blobs, 'file_digest', wraps=blobs.file_digest) as digest:
+            first = self.upload(self.listings[0], image_file('front.jpg'))
+            second = self.upload(self.listings[1], image_file('FRONT-copy.JPG'))
+        # Hashed by the upload handler while the body was read
+        self.assertTrue(all(call.args[0].content_hash for call in digest.call_args_list))
+
+        self.assertEqual(first.image.name, second.image.name)
+        digest = first.image.name.rsplit('/', 1)[1].split('.')[0]
+        self.assertEqual(first.image.name, f'properties/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(self.stored_files('properties'), [first.image.name])
+        blob = MediaBlob.objects.get(name=first.image.name)
+        self.assertEqual((blob.sha256, blob.references), (digest, 2))
+
+        different = self.upload(self.listings[1], image_file('back.jpg', color=(10, 10, 10)))
+        self.assertNotEqual(different.image.name, first.image.name)
+        self.assertEqual(len(self.stored_files('properties')), 2)
+
+    def test_duplicates_are_not_written_again(self):
+        self.upload(self.listings[0], image_file())
+        storage = PropertyImage._meta.get_field('image').storage
+        with mock.patch.object(storage.__class__, '_save') as write:
+            self.upload(self.listings[1], image_file())
+        write.assert_not_called()
+
+    def test_files_are_deleted_with_their_last_reference(self):
+        first = self.upload(self.listings[0], image_file())
+        second = self.upload(self.listings[1], image_file())
+        name = first.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.stored_files('properties'), [name])
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.stored_files('properties'), [])
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_storage_counts_the_reference_it_hands_out(self):
+        image = self.upload(self.listings[0], image_file())
+        storage = PropertyImage._meta.get_field('image').storage
+        # A second row's save stores the same content, then the first row goes
+        # before the second row is written
+        name = storage.save('properties/copy.jpg', image_file())
+        self.assertEqual(name, image.image.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertEqual(self.stored_files('properties'), [name])
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+
+        # Saving the same content to a row again leaves its count alone
+        again = PropertyImage.objects.create(property=self.listings[1], image=image_file('again.jpg'))
+        again.image = image_file('again.jpg')
+        again.save()
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 2)
+
+    def test_files_stored_before_blobs_are_counted(self):
+        backfill = importlib.import_module('properties.migrations.0016_media_blob_backfill').backfill_media_blobs
+        name = default_storage.save('properties/legacy.jpg', image_file())
+        images = [PropertyImage.objects.create(property=listing, image=name) for listing in self.listings]
+        backfill(apps, None)
+        blob = MediaBlob.objects.get(name=name)
+        self.assertEqual((blob.references, blob.size), (2, default_storage.size(name)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            images[0].delete()
+        self.assertEqual(self.stored_files('properties'), [name])
+        with self.captureOnCommitCallbacks(execute=True):
+            images[1].delete()
+        self.assertEqual(self.stored_files('properties'), [])
+
+    def test_renditions_go_with_the_last_reference(self):
+        with self.settings(BACKGROUND_TASKS_EAGER=True), self.captureOnCommitCallbacks(execute=True):
+            first = self.upload(self.listings[0], image_file())
+            second = self.upload(self.listings[1], image_file())
+        self.assertEqual(len(self.stored_files('derivatives')), 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(len(self.stored_files('derivatives')), 6)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.stored_files('derivatives'), [])
+
+    def test_replacing_a_file_releases_the_old_blob(self):
+        image = self.upload(self.listings[0], image_file())
+        old_name = image.image.name
+        image.image = image_file('new.jpg', color=(0, 0, 255))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertEqual(self.stored_files('properties'), [image.image.name])
+        self.assertFalse(MediaBlob.objects.filter(name=old_name).exists())
+        self.assertEqual(MediaBlob.objects.get(name=image.image.name).references, 1)
+
+    def test_identical_feed_uploads_are_stored_once(self):
+        staff = User.objects.create_user(email='staff@example.com', password='testpass123', is_staff=True)
+        names = []
+        for _ in range(2):
+            upload = SimpleUploadedFile('feed.xml', b'<feed><listings/></feed>', content_type='application/xml')
+            request = APIRequestFactory().post('/api/v1/files/', {'file': upload}, format='multipart')
+            force_authenticate(request, user=staff)
+            response = FileUploadView.as_view()(request)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            names.append(UploadedFile.objects.get(pk=response.data['id']).file.name)
+        self.assertEqual(names[0], names[1])
+        self.assertEqual(len(self.stored_files('uploads')), 1)
+        self.assertEqual(MediaBlob.objects.get(name=names[0]).references, 2)
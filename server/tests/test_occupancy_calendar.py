@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from dashboard.serializers import get_hotel_manager_dashboard_data
+from properties.models import Hotel, RoomType, Booking
+from properties.occupancy import build_calendar
+
+User = get_user_model()
+
+
+class OccupancyCalendarTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(
+            email='manager@example.com',
+            password='testpass123',
+            first_name='Hotel',
+            last_name='Manager',
+            user_type=User.UserType.HOTEL_MANAGER,
+        )
+        cls.other = User.objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+            first_name='Other',
+            last_name='User'
+        )
+        cls.hotel = Hotel.objects.create(
+            name='Lake View', slug='lake-view', description='Test hotel', address='Lake road',
+            city='Kisumu', country='Kenya', star_rating=3, manager=cls.manager,
+        )
+        cls.single = RoomType.objects.create(
+            hotel=cls.hotel, name='Single', description='Test room', max_guests=1,
+            price_per_night='50.00', quantity=2,
+        )
+        cls.suite = RoomType.objects.create(
+            hotel=cls.hotel, name='Suite', description='Test room', max_guests=4,
+            price_per_night='200.00', quantity=4,
+        )
+        cls.today = timezone.now().date()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def book(self, room_type, offset, nights, guests=1, status='confirmed'):
+        check_in = self.today + timedelta(days=offset)
+        return Booking.objects.create(
+            user=self.other, room_type=room_type, check_in_date=check_in,
+            check_out_date=check_in + timedelta(days=nights), total_price='100.00',
+            guest_count=guests, status=status,
+        )
+
+    def test_calendar_counts_every_overlapping_booking(self):
+        # Starts before the window, runs to its second day
+        self.book(self.single, offset=0, nights=3)
+        self.book(self.suite, offset=3, nights=4, guests=3)
+        self.book(self.suite, offset=5, nights=1)
+        self.book(self.suite, offset=4, nights=2, status='cancelled')
+        start = self.today + timedelta(days=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            calendar = build_calendar([self.single, self.suite], start, start + timedelta(days=5))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(calendar.booked.tolist(), [[1, 1, 0, 0, 0], [0, 0, 3, 3, 4]])
+        self.assertEqual(calendar.available.tolist(), [[1, 1, 2, 2, 2], [4, 4, 1, 1, 0]])
+        self.assertEqual(calendar.occupancy_rate(), round(12 * 100 / 30, 2))
+        self.assertEqual(calendar.occupancy_rate(slice(0, 1)), 20.0)
+
+    def test_calendar_endpoint_is_for_the_manager(self):
+        self.book(self.suite, offset=1, nights=2, guests=2)
+        url = reverse('hotel-calendar', args=[self.hotel.slug])
+        params = {'start': self.today, 'days': 3}
+
+        response = self.client.get(url, params)
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(url, params).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['hotel'], 'lake-view')
+        self.assertEqual(len(response.data['dates']), 3)
+        suite = response.data['room_types'][1]
+        self.assertEqual((suite['name'], suite['booked'], suite['available']), ('Suite', [0, 2, 2], [4, 2, 2]))
+        self.assertEqual(response.data['room_types'][0]['occupancy_rate'], 0.0)
+
+    def test_invalid_windows_are_rejected(self):
+        self.client.force_authenticate(user=self.manager)
+        url = reverse('hotel-calendar', args=[self.hotel.slug])
+        for params, field in (
+            ({'start': 'today'}, 'start'),
+            ({'days': 'many'}, 'days'),
+            ({'days': 0}, 'end'),
+            ({'days': 400}, 'end'),
+            ({'days': 99999999999}, 'end'),
+            ({'start': '9999-12-30', 'days': 5}, 'end'),
+            ({'start': self.today, 'end': self.today - timedelta(days=1)}, 'end'),
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn(field, response.data)
+
+    def test_dashboard_occupancy_counts_all_bookings(self):
+        # More bookings than the ten the dashboard lists
+        for offset in range(12):
+            self.book(self.suite, offset=offset, nights=2)
+        self.book(self.single, offset=0, nights=30, guests=2, status='pending')
+
+        data = get_hotel_manager_dashboard_data(self.manager)
+        self.assertEqual(len(data['upcoming_bookings']), 10)
+        self.assertEqual(data['total_rooms'], 6)
+        self.assertEqual(data['total_bookings'], 13)
+        self.assertEqual(data['total_properties'], 1)
+        # Pending holds are not occupancy: 24 suite nights out of 6 units x 30 days
+        self.assertEqual(data['occupancy_rate'], round(24 * 100 / 180, 2))
+        self.assertEqual(data['available_rooms'], 5)
@@ -0,0 +1,105 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Property
+
+User = get_user_model()
+
+
+class KeysetPaginationTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='pages@example.com',
+            password='testpass123',
+            first_name='Page',
+            last_name='User'
+        )
+        for index in range(25):
+            Property.objects.create(
+                owner=cls.user,
+                title=f'Listing {index}',
+                description='Test listing',
+                property_type='house',
+                listing_type='sale',
+                # Repeated prices exercise the id tie-breaker
+                price=1000 * (index % 5),
+                bedrooms=3,
+                bathrooms=2,
+                area=100 + index,
+                address='Test address',
+                city='Lagos',
+                country='Nigeria',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def walk(self, params):
+        """Follow next links from the first page, returning ids and per-page responses."""
+        response = self.client.get(reverse('property-list'), {'pagination': 'cursor', 'page_size': 10, **params})
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append(response)
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        ids = [row['id'] for page in pages for row in page.data['results']]
+        return ids, pages
+
+    def test_walks_every_row_once_in_order(self):
+        ids, pages = self.walk({})
+        expected = list(Property.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(page.data['results']) for page in pages], [10, 10, 5])
+        self.assertIsNone(pages[0].data['previous'])
+
+    def test_ordering_fields(self):
+        ids, _ = self.walk({'ordering': 'price'})
+        expected = list(Property.objects.order_by('price', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+        ids, _ = self.walk({'ordering': '-area'})
+        expected = list(Property.objects.order_by('-area', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_link(self):
+        _, pages = self.walk({'ordering': 'price'})
+        response = self.client.get(pages[2].data['previous'])
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [row['id'] for row in pages[1].data['results']]
+        )
+
+    def test_deep_page_issues_no_count(self):
+        _, pages = self.walk({})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(pages[1].data['next'])
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('COUNT(', sql.upper())
+        self.assertNotIn('OFFSET', sql.upper())
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('property-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Well-formed cursors on fields the view does not order by, or with values of the wrong type
+        for data in (
+            {'f': 'nope', 'd': True, 'v': '1', 'i': 1},
+            {'f': 'bedrooms', 'd': True, 'v': '3', 'i': 1},
+            {'f': 'created_at', 'd': True, 'v': [1], 'i': 1},
+            {'f': 'created_at', 'd': True, 'v': None, 'i': 1},
+        ):
+            cursor = base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+            response = self.client.get(reverse('property-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, data)
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.http import QueryDict
+from django.utils.http import urlencode
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties import facets
+from properties.models import Property, Amenity
+
+User = get_user_model()
+
+
+class PropertyFacetsTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='facets@example.com',
+            password='testpass123',
+            first_name='Facet',
+            last_name='User'
+        )
+        cls.wifi = Amenity.objects.create(name='WiFi')
+        cls.pool = Amenity.objects.create(name='Pool')
+        listings = [
+            ('house', 'sale', 3, 'Lagos', [cls.wifi, cls.pool]),
+            ('house', 'rent', 2, 'Lagos', [cls.wifi]),
+            ('apartment', 'rent', 2, 'Nairobi', []),
+            ('villa', 'sale', 5, 'Nairobi', [cls.pool]),
+        ]
+        cls.properties = []
+        for index, (property_type, listing_type, bedrooms, city, amenities) in enumerate(listings):
+            property = Property.objects.create(
+                owner=cls.user, title=f'Listing {index}', description='Test listing',
+                property_type=property_type, listing_type=listing_type, price=1000,
+                bedrooms=bedrooms, bathrooms=1, area=90, address='Test address',
+                city=city, country='Kenya',
+            )
+            property.amenities.set(amenities)
+            cls.properties.append(property)
+        Property.objects.create(
+            owner=cls.user, title='Draft', description='Unpublished', property_type='land',
+            listing_type='sale', price=1, bedrooms=0, bathrooms=0, area=1, address='x',
+            city='Lagos', country='Nigeria', is_published=False,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_facets(self, params=None):
+        response = self.client.get(reverse('property-facets'), params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_counts(self):
+        data = self.get_facets()
+        self.assertEqual(data['total'], 4)
+        self.assertEqual(data['property_type'], {'house': 2, 'apartment': 1, 'villa': 1})
+        self.assertEqual(data['listing_type'], {'sale': 2, 'rent': 2})
+        self.assertEqual(data['bedrooms'], {'2': 2, '3': 1, '5': 1})
+        self.assertEqual(data['city'], {'Lagos': 2, 'Nairobi': 2})
+        self.assertEqual(data['amenities'], {str(self.wifi.id): 2, str(self.pool.id): 2})
+
+    def test_counts_follow_filters(self):
+        data = self.get_facets({'city': 'lagos', 'listing_type': 'rent'})
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['amenities'], {str(self.wifi.id): 1})
+
+    def test_cached_entries_are_patched_incrementally(self):
+        """Warm entries stay equal to a fresh computation after changes"""
+        cases = [{}, {'property_type': 'house'}, {'property_type': 'villa'}, {'bedrooms': '2'}]
+        for params in cases:
+            self.get_facets(params)
+
+        moved = self.properties[0]
+        moved.property_type = 'villa'
+        moved.bedrooms = 2
+        moved.save()
+        moved.amenities.remove(self.pool)
+        self.pool.properties.add(self.properties[2])
+        self.properties[1].is_published = False
+        self.properties[1].save()
+        self.properties[3].delete()
+
+        for params in cases:
+            key = facets.cache_key_for_params(QueryDict(urlencode(params)))
+            cached = cache.get(key)
+            self.assertIsNotNone(cached)
+            cache.delete(key)
+            self.assertEqual(cached, self.get_facets(params), params)
+
+    def test_save_reads_the_previous_row_once(self):
+        property = Property.objects.get(pk=self.properties[0].pk)
+        property.price = 123
+        with CaptureQueriesContext(connection) as context:
+            property.save()
+        reads = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "properties_property" WHERE' in query['sql']
+        ]
+        self.assertEqual(len(reads), 1, reads)
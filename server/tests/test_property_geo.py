@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties import geo
+from properties.models import Property
+
+User = get_user_model()
+
+
+class PropertyGeoSearchTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='geo@example.com',
+            password='testpass123',
+            first_name='Geo',
+            last_name='User'
+        )
+        defaults = {
+            'owner': cls.user,
+            'description': 'Test listing',
+            'property_type': 'apartment',
+            'listing_type': 'rent',
+            'price': 1000,
+            'bedrooms': 2,
+            'bathrooms': 1,
+            'area': 80,
+            'address': 'Test address',
+            'country': 'Kenya',
+        }
+        # Nairobi CBD, Westlands (~4 km away), Mombasa (~440 km away)
+        cls.cbd = Property.objects.create(
+            title='CBD Flat', city='Nairobi', latitude=-1.2864, longitude=36.8172, **defaults
+        )
+        cls.westlands = Property.objects.create(
+            title='Westlands Flat', city='Nairobi', latitude=-1.2657, longitude=36.8025, **defaults
+        )
+        cls.mombasa = Property.objects.create(
+            title='Mombasa Flat', city='Mombasa', latitude=-4.0435, longitude=39.6682, **defaults
+        )
+        cls.unplaced = Property.objects.create(title='No Coordinates', city='Nairobi', **defaults)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_ids(self, params):
+        response = self.client.get(reverse('property-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [row['id'] for row in rows], rows
+
+    def test_geo_cell_is_maintained_on_save(self):
+        """The grid cell follows coordinate changes"""
+        self.assertEqual(self.cbd.geo_cell, geo.cell_for(-1.2864, 36.8172))
+        self.assertIsNone(self.unplaced.geo_cell)
+        self.unplaced.latitude, self.unplaced.longitude = -4.05, 39.67
+        self.unplaced.save()
+        self.assertEqual(self.unplaced.geo_cell, self.mombasa.geo_cell)
+
+    def test_near_filters_and_orders_by_distance(self):
+        """Radius search returns nearby rows nearest first"""
+        ids, rows = self.get_ids({'near': '-1.2660,36.8030', 'radius_km': 10})
+        self.assertEqual(ids, [self.westlands.id, self.cbd.id])
+        self.assertLess(rows[0]['distance'], 0.2)
+        self.assertAlmostEqual(rows[1]['distance'], 3.1, delta=0.5)
+
+        ids, _ = self.get_ids({'near': '-1.2660,36.8030', 'radius_km': 10, 'ordering': '-distance'})
+        self.assertEqual(ids, [self.cbd.id, self.westlands.id])
+
+    def test_bbox_filter(self):
+        """Only rows inside the viewport are returned"""
+        ids, _ = self.get_ids({'bbox': '36.5,-1.5,37.0,-1.0'})
+        self.assertCountEqual(ids, [self.cbd.id, self.westlands.id])
+        ids, _ = self.get_ids({'bbox': '30,-5,40,0'})
+        self.assertCountEqual(ids, [self.cbd.id, self.westlands.id, self.mombasa.id])
+
+    def test_invalid_coordinates(self):
+        """Malformed spatial parameters are rejected"""
+        response = self.client.get(reverse('property-list'), {'near': 'nowhere'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('property-list'), {'bbox': '1,2,3'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_distance_ordering_ignored_without_near(self):
+        ids, rows = self.get_ids({'ordering': 'distance'})
+        self.assertEqual(len(ids), 4)
+        self.assertNotIn('distance', rows[0])
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Property, PropertyImage, Amenity
+
+User = get_user_model()
+
+
+class PropertyListQueryCountTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Create owners in different groups and some amenities."""
+        agents = Group.objects.create(name='Agents')
+        managers = Group.objects.create(name='Hotel Managers')
+        cls.owners = []
+        for index, group in enumerate([agents, managers, None]):
+            owner = User.objects.create_user(
+                email=f'owner{index}@example.com',
+                password='testpass123',
+                first_name='Owner',
+                last_name=str(index)
+            )
+            if group:
+                owner.groups.add(group)
+            cls.owners.append(owner)
+        cls.amenities = [
+            Amenity.objects.create(name='WiFi'),
+            Amenity.objects.create(name='Parking'),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def create_properties(self, count):
+        for index in range(count):
+            property = Property.objects.create(
+                owner=self.owners[index % len(self.owners)],
+                title=f'Listing {Property.objects.count()}',
+                description='A test listing',
+                property_type='apartment',
+                listing_type='rent',
+                price=1000 + index,
+                bedrooms=2,
+                bathrooms=1,
+                area=80,
+                address='1 Test Street',
+                city='Lagos',
+                country='Nigeria',
+            )
+            property.amenities.set(self.amenities)
+            PropertyImage.objects.create(property=property, image='properties/a.jpg', is_primary=True)
+            PropertyImage.objects.create(property=property, image='properties/b.jpg')
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('property-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_query_count_is_constant_as_page_grows(self):
+        """Serializing more rows must not issue more queries"""
+        self.create_properties(2)
+        small_page_queries, _ = self.count_list_queries()
+
+        self.create_properties(10)
+        large_page_queries, response = self.count_list_queries()
+
+        self.assertEqual(small_page_queries, large_page_queries)
+        self.assertLessEqual(large_page_queries, 5)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(rows), 12)
+
+    def test_batched_fields_match_row_data(self):
+        """Primary image and owner role are resolved from the prefetched rows"""
+        self.create_properties(3)
+        _, response = self.count_list_queries()
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        roles = {row['owner']['email']: row['owner']['role'] for row in rows}
+
+        self.assertEqual(roles['owner0@example.com'], 'agent')
+        self.assertEqual(roles['owner1@example.com'], 'hotel_manager')
+        self.assertEqual(roles['owner2@example.com'], 'buyer')
+        for row in rows:
+            self.assertTrue(row['primary_image'].endswith('/media/properties/a.jpg'))
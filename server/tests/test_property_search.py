@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Property
+
+User = get_user_model()
+
+
+class PropertySearchTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='search@example.com',
+            password='testpass123',
+            first_name='Search',
+            last_name='User'
+        )
+        defaults = {
+            'owner': cls.user,
+            'property_type': 'villa',
+            'listing_type': 'sale',
+            'price': 100000,
+            'bedrooms': 3,
+            'bathrooms': 2,
+            'area': 200,
+            'country': 'Kenya',
+        }
+        cls.title_hit = Property.objects.create(
+            title='Lekki Ocean Villa', description='Quiet home', address='1 Beach Road',
+            city='Lagos', **defaults
+        )
+        cls.description_hit = Property.objects.create(
+            title='Family Home', description='Close to the villa district', address='2 Main Street',
+            city='Nairobi', **defaults
+        )
+        cls.miss = Property.objects.create(
+            title='City Apartment', description='Downtown flat', address='3 Market Street',
+            city='Nairobi', **defaults
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, term):
+        response = self.client.get(reverse('property-list'), {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [row['id'] for row in rows]
+
+    def test_results_are_ranked(self):
+        """A title match ranks above a description-only match"""
+        self.assertEqual(self.search('villa'), [self.title_hit.id, self.description_hit.id])
+
+    def test_prefix_matching(self):
+        """Partial words match and every word is required"""
+        self.assertEqual(self.search('lek vil'), [self.title_hit.id])
+        self.assertEqual(self.search('nairo apart'), [self.miss.id])
+
+    def test_index_follows_save_and_delete(self):
+        """Edits and deletions are reflected in the index"""
+        self.miss.title = 'Garden Villa'
+        self.miss.save()
+        self.assertIn(self.miss.id, self.search('garden'))
+
+        self.title_hit.delete()
+        self.assertNotIn(self.title_hit.id, self.search('lekki'))
+
+    def test_search_syntax_is_escaped(self):
+        """FTS operators in user input do not raise"""
+        self.assertEqual(self.search('"villa" OR NEAR('), [])
@@ -0,0 +1,119 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Property, Amenity, SimilarProperty
+from properties import similarity
+from properties.similarity import build_similarity_index
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class PropertySimilarityTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='similar@example.com',
+            password='testpass123',
+            first_name='Similar',
+            last_name='User'
+        )
+        self.pool = Amenity.objects.create(name='Pool')
+        self.wifi = Amenity.objects.create(name='WiFi')
+
+    def create(self, title, property_type='villa', listing_type='sale', price=500000,
+               bedrooms=4, area=300, city='Malindi', amenities=()):
+        property = Property.objects.create(
+            owner=self.user, title=title, description='Test listing',
+            property_type=property_type, listing_type=listing_type, price=price,
+            bedrooms=bedrooms, bathrooms=2, area=area, address='Test address',
+            city=city, country='Kenya',
+        )
+        property.amenities.set(amenities)
+        return property
+
+    def similar_ids(self, property):
+        self.client.force_authenticate(user=User.objects.create_superuser(
+            email=f'admin-{property.pk}@example.com', password='adminpass123'
+        ))
+        response = self.client.get(reverse('property-similar', kwargs={'slug': property.slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [row['id'] for row in rows]
+
+    def stored_lists(self):
+        # Compared by score: equally similar neighbours may legitimately swap
+        return sorted(
+            (property_id, rank, round(score, 5))
+            for property_id, rank, score in SimilarProperty.objects.values_list('property_id', 'rank', 'score')
+        )
+
+    def test_neighbours_are_ranked(self):
+        target = self.create('Beach Villa', amenities=[self.pool])
+        twin = self.create('Beach Villa Twin', price=520000, amenities=[self.pool])
+        cousin = self.create('Inland Villa', price=450000, city='Nairobi')
+        self.create('Studio', property_type='apartment', listing_type='rent', price=900,
+                    bedrooms=0, area=30, city='Nairobi', amenities=[self.wifi])
+
+        ids = self.similar_ids(target)
+        self.assertEqual(ids[:2], [twin.id, cousin.id])
+        self.assertEqual(len(ids), 3)
+
+    def test_incremental_refresh_matches_full_build(self):
+        properties = [
+            self.create(f'Listing {index}', property_type=['villa', 'house', 'apartment'][index % 3],
+                        price=100000 * (index + 1), bedrooms=index % 5,
+                        city=['Malindi', 'Nairobi'][index % 2],
+                        amenities=[self.pool] if index % 2 else [self.wifi])
+            for index in range(16)
+        ]
+        # Changes that move rows into and out of other lists
+        properties[0].price = 1600000
+        properties[0].save()
+        properties[3].amenities.add(self.pool)
+        properties[5].is_published = False
+        properties[5].save()
+        properties[7].delete()
+
+        incremental = self.stored_lists()
+        build_similarity_index()
+        self.assertEqual(incremental, self.stored_lists())
+        self.assertFalse(SimilarProperty.objects.filter(neighbour=properties[5]).exists())
+
+    def test_refresh_skips_saves_that_keep_the_features(self):
+        property = self.create('Beach Villa')
+        self.create('Inland Villa', city='Nairobi')
+        with mock.patch.object(similarity, 'build_feature_matrix', wraps=similarity.build_feature_matrix) as build:
+            property.description = 'Repainted'
+            property.save()
+            build.assert_not_called()
+            property.price = 510000
+            property.save()
+            build.assert_called_once()
+
+    def test_refreshes_are_queued_once_until_they_start(self):
+        property = self.create('Beach Villa')
+        with mock.patch.object(similarity.tasks, 'enqueue') as enqueue:
+            for price in (1, 2, 3):
+                property.price = price
+                property.save()
+        enqueue.assert_called_once_with(similarity.refresh_stale)
+
+        similarity.refresh_stale()
+        with mock.patch.object(similarity.tasks, 'enqueue') as enqueue:
+            property.price = 4
+            property.save()
+        enqueue.assert_called_once_with(similarity.refresh_stale)
+
+    def test_unknown_property_types_are_encoded(self):
+        known = self.create('Beach Villa')
+        imported = self.create('Houseboat')
+        Property.objects.filter(pk=imported.pk).update(property_type='houseboat')
+        self.assertEqual(build_similarity_index(), 2)
+        self.assertEqual(self.similar_ids(known), [imported.id])
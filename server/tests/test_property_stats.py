@@ -0,0 +1,107 @@
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties import stats
+from properties.models import Property
+
+User = get_user_model()
+
+
+class PropertyStatsTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='stats@example.com',
+            password='testpass123',
+            first_name='Stats',
+            last_name='User'
+        )
+        cls.prices = [100_000, 150_000, 200_000, 400_000, 1_000_000, 55_000]
+        cls.properties = []
+        for index, price in enumerate(cls.prices):
+            cls.properties.append(Property.objects.create(
+                owner=cls.user, title=f'Listing {index}', description='Test listing',
+                property_type='house' if index % 2 else 'apartment', listing_type='sale',
+                price=price, bedrooms=2, bathrooms=1, area=50 + 10 * index, address='Test address',
+                city='Nairobi' if index < 4 else 'Mombasa', country='Kenya',
+            ))
+        Property.objects.create(
+            owner=cls.user, title='Draft', description='Unpublished', property_type='land',
+            listing_type='sale', price=99_000_000, bedrooms=0, bathrooms=0, area=1, address='x',
+            city='Nairobi', country='Kenya', is_published=False,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_stats(self, params=None):
+        response = self.client.get(reverse('property-stats'), params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_summary_matches_numpy(self):
+        data = self.get_stats({'bins': 4})
+        prices = np.array(self.prices, dtype=float)
+        self.assertEqual(data['count'], 6)
+        self.assertEqual(data['price']['min'], 55_000)
+        self.assertEqual(data['price']['max'], 1_000_000)
+        self.assertEqual(data['price']['percentiles']['p50'], float(np.percentile(prices, 50)))
+        self.assertEqual(sum(data['price']['histogram']['counts']), 6)
+        self.assertEqual(len(data['price']['histogram']['edges']), 5)
+        self.assertEqual(data['area']['min'], 50)
+
+    def test_filters_and_empty_result(self):
+        data = self.get_stats({'city': 'mombasa', 'min_price': 60_000})
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['price']['min'], 1_000_000)
+
+        data = self.get_stats({'city': 'Kisumu'})
+        self.assertEqual(data, {'count': 0, 'price': None, 'area': None})
+
+    def test_cached_combination_is_invalidated_on_price_change(self):
+        self.get_stats({'city': 'nair', 'property_type': 'house'})
+        with CaptureQueriesContext(connection) as context:
+            cached = self.get_stats({'property_type': 'HOUSE', 'city': 'nair'})
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(cached['price']['max'], 400_000)
+
+        # A change outside the combination keeps the entry
+        other = self.properties[4]
+        other.price = 10
+        other.save()
+        with CaptureQueriesContext(connection) as context:
+            self.get_stats({'property_type': 'house', 'city': 'nair'})
+        self.assertEqual(len(context.captured_queries), 0)
+
+        listing = self.properties[3]
+        listing.price = 2_000_000
+        listing.save()
+        self.assertEqual(self.get_stats({'property_type': 'house', 'city': 'nair'})['price']['max'], 2_000_000)
+
+        listing.delete()
+        self.assertEqual(self.get_stats({'property_type': 'house', 'city': 'nair'})['count'], 1)
+
+    def test_index_is_bounded(self):
+        with mock.patch.object(stats, 'STATS_INDEX_MAX_KEYS', 3):
+            for city in ('a', 'b', 'c', 'd', 'e'):
+                self.get_stats({'city': city})
+        index = cache.get(stats.STATS_INDEX_KEY)
+        self.assertEqual([combination[2] for combination, _ in index.values()], ['c', 'd', 'e'])
+        # Evicted entries are dropped with their key, so none outlives its invalidation
+        self.assertIsNone(cache.get(stats.cache_key(('', '', 'a'), stats.DEFAULT_BINS)))
+
+        with mock.patch.object(stats.time, 'time', return_value=stats.time.time() + stats.STATS_CACHE_TIMEOUT + 1):
+            self.get_stats({'city': 'f'})
+        self.assertEqual([combination[2] for combination, _ in cache.get(stats.STATS_INDEX_KEY).values()], ['f'])
+
+    def test_invalid_bins(self):
+        response = self.client.get(reverse('property-stats'), {'bins': 'many'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Property, PropertyImage, Amenity
+
+User = get_user_model()
+
+
+class PropertyResponseCacheTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cache@example.com',
+            password='testpass123',
+            first_name='Cache',
+            last_name='User'
+        )
+        cls.admin = User.objects.create_superuser(
+            email='cache-admin@example.com',
+            password='adminpass123'
+        )
+        cls.wifi = Amenity.objects.create(name='WiFi')
+        cls.property = Property.objects.create(
+            owner=cls.user, title='Cached Villa', description='Test listing',
+            property_type='villa', listing_type='sale', price=1000, bedrooms=3,
+            bathrooms=2, area=120, address='Test address', city='Mombasa', country='Kenya',
+        )
+        cls.other = Property.objects.create(
+            owner=cls.user, title='Other House', description='Test listing',
+            property_type='house', listing_type='sale', price=2000, bedrooms=3,
+            bathrooms=2, area=120, address='Test address', city='Mombasa', country='Kenya',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.detail_url = reverse('property-detail', kwargs={'slug': self.property.slug})
+
+    def rows(self, response):
+        return response.data['results'] if isinstance(response.data, dict) else response.data
+
+    def test_hits_skip_the_database(self):
+        self.client.get(reverse('property-list'), {'city': 'Mombasa', 'ordering': 'price'})
+        with CaptureQueriesContext(connection) as context:
+            # Same parameters in a different order
+            response = self.client.get(reverse('property-list'), {'ordering': 'price', 'city': 'Mombasa'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.rows(response)), 2)
+        self.assertEqual(len(context.captured_queries), 0)
+
+        self.client.force_authenticate(user=self.admin)
+        stats = self.client.get(reverse('property-cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_property_change_invalidates(self):
+        self.client.get(self.detail_url)
+        self.client.get(reverse('property-list'))
+        self.property.title = 'Renamed Villa'
+        self.property.save()
+
+        self.assertEqual(self.client.get(self.detail_url).data['title'], 'Renamed Villa')
+        titles = [row['title'] for row in self.rows(self.client.get(reverse('property-list')))]
+        self.assertIn('Renamed Villa', titles)
+
+    def test_image_and_amenity_changes_invalidate(self):
+        self.client.get(self.detail_url)
+        other_url = reverse('property-detail', kwargs={'slug': self.other.slug})
+        self.client.get(other_url)
+
+        PropertyImage.objects.create(property=self.property, image='properties/a.jpg', is_primary=True)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(len(response.data['images']), 1)
+
+        self.wifi.properties.add(self.property)
+        self.assertEqual(len(self.client.get(self.detail_url).data['amenities']), 1)
+
+        # The untouched property's entry survives
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(other_url)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.get(self.detail_url)
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.detail_url)
+        self.assertGreater(len(context.captured_queries), 0)
@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from properties.models import Property, PropertyImage, Amenity, BlogPost, Tag
+
+User = get_user_model()
+
+
+class SparseFieldsetTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='fields@example.com',
+            password='testpass123',
+            first_name='Field',
+            last_name='Owner'
+        )
+        cls.amenities = [Amenity.objects.create(name='WiFi'), Amenity.objects.create(name='Pool')]
+        for index in range(3):
+            property = Property.objects.create(
+                owner=cls.owner, title=f'Listing {index}', description='A long description ' * 50,
+                property_type='apartment', listing_type='rent', price=1000 + index, bedrooms=2,
+                bathrooms=1, area=80, address='1 Test Street', city='Accra', country='Ghana',
+            )
+            property.amenities.set(cls.amenities)
+            PropertyImage.objects.create(property=property, image='properties/a.jpg', is_primary=True)
+        cls.property = property
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_list(self, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('property-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return rows, context.captured_queries
+
+    def test_default_shape_is_unchanged(self):
+        rows, _ = self.get_list({})
+        self.assertIn('description', rows[0])
+        self.assertEqual(rows[0]['owner']['email'], 'fields@example.com')
+        self.assertEqual(len(rows[0]['amenities'][0]), 3)
+
+    def test_card_fields_trim_output_and_queries(self):
+        rows, queries = self.get_list({'fields': 'title,price,city,primary_image'})
+        self.assertEqual(set(rows[0]), {'title', 'price', 'city', 'primary_image'})
+        self.assertTrue(rows[0]['primary_image'].endswith('/media/properties/a.jpg'))
+
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('accounts_user', sql)
+        self.assertNotIn('properties_amenity', sql)
+
+    def test_relations_render_as_ids_unless_expanded(self):
+        rows, _ = self.get_list({'fields': 'title,owner,amenities'})
+        self.assertEqual(rows[0]['owner'], self.owner.pk)
+        self.assertEqual(sorted(rows[0]['amenities']), sorted(a.pk for a in self.amenities))
+
+        rows, _ = self.get_list({'fields': 'title', 'expand': 'owner'})
+        self.assertEqual(set(rows[0]), {'title', 'owner'})
+        self.assertEqual(rows[0]['owner']['email'], 'fields@example.com')
+        self.assertEqual(rows[0]['owner']['role'], 'buyer')
+
+    def test_query_count_is_constant(self):
+        _, small = self.get_list({'fields': 'title,amenities,primary_image', 'page_size': 1})
+        _, large = self.get_list({'fields': 'title,amenities,primary_image'})
+        self.assertEqual(len(small), len(large))
+
+    def test_detail_and_unknown_fields(self):
+        url = reverse('property-detail', kwargs={'slug': self.property.slug})
+        response = self.client.get(url, {'fields': 'title,slug'})
+        self.assertEqual(response.data, {'title': self.property.title, 'slug': self.property.slug})
+
+        response = self.client.get(reverse('property-list'), {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('property-list'), {'expand': 'title'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_blog_posts(self):
+        post = BlogPost.objects.create(
+            title='Market update', content='Body ' * 100, author=self.owner, is_published=True
+        )
+        post.tags.add(Tag.objects.create(name='market'))
+        response = self.client.get(reverse('blogpost-list'), {'fields': 'title,tags', 'expand': 'tags'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(rows[0]['title'], 'Market update')
+        self.assertEqual(rows[0]['tags'][0]['name'], 'market')
+        self.assertNotIn('content', rows[0])